@@ -1,6 +1,8 @@
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
+import asyncio
 import sys
 import os
 
@@ -9,7 +11,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Importar la configuración de la base de datos desde config.py
 from app.core.config import DATABASE_URL
-from app.db.database import Base  # Importa la base para reflejar modelos
+from app.db.database import opciones_motor
+from app.db.models import Base  # Importa la base para reflejar modelos
 
 # Cargar la configuración de logging desde alembic.ini
 config = context.config
@@ -29,15 +32,29 @@ def run_migrations_offline():
     with context.begin_transaction():
         context.run_migrations()
 
+def do_run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
 # Función para ejecutar migraciones en modo online
-def run_migrations_online():
-    """Ejecuta las migraciones en 'modo online' creando un engine de SQLAlchemy."""
-    connectable = engine_from_config(config.get_section(config.config_ini_section), prefix="sqlalchemy.", poolclass=pool.NullPool)
+async def run_async_migrations():
+    """Ejecuta las migraciones en 'modo online' con el engine asíncrono (driver asyncpg)."""
+    # Las mismas opciones de asyncpg que la aplicación, por si se migra a través de PgBouncer
+    connectable = async_engine_from_config(
+        config.get_section(config.config_ini_section),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+        connect_args=opciones_motor()["connect_args"],
+    )
 
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-        with context.begin_transaction():
-            context.run_migrations()
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+def run_migrations_online():
+    asyncio.run(run_async_migrations())
 
 # Determinar si ejecutamos en modo online u offline
 if context.is_offline_mode():
@@ -0,0 +1,116 @@
+"""Índices por reporte_nomina_id y restricciones únicas en las tablas hijas de reportes_nominas
+
+Revision ID: 5b7e2c9a1d43
+Revises: 434006b39d35
+Create Date: 2026-10-17 12:00:00.000000
+
+Los índices se crean con CREATE INDEX CONCURRENTLY, fuera de la transacción de la
+migración, para no bloquear las escrituras en producción. Las restricciones únicas se
+agregan después sobre los índices ya construidos (ADD CONSTRAINT ... USING INDEX), lo que
+solo requiere un bloqueo breve y no vuelve a recorrer la tabla.
+
+Antes se resuelven las filas repetidas sin perder montos: las líneas de quincena_valores de un
+mismo recargo se fusionan sumando días y valores (el total pagado del reporte sigue cuadrando con
+sus líneas) y los enlaces repetidos a un recargo, que no llevan montos, se eliminan. Un descuento
+o subsidio repetido se aplicó dos veces en el total guardado; la migración se detiene y lista
+esos reportes para corregirlos a mano.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c9a1d43'
+down_revision: Union[str, None] = '434006b39d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (tabla, columna del catálogo, nombre de la restricción única)
+UNICAS = [
+    ('quincena_valores', 'tipo_recargo_id', 'uq_quincena_valores_reporte_recargo'),
+    ('reportes_nominas_recargos', 'tipo_recargo_id', 'uq_reportes_nominas_recargos_reporte_recargo'),
+    ('reportes_nominas_descuentos', 'tipo_descuento_id', 'uq_reportes_nominas_descuentos_reporte_descuento'),
+    ('reportes_nominas_subsidios', 'tipo_subsidio_id', 'uq_reportes_nominas_subsidios_reporte_subsidio'),
+]
+
+# (nombre del índice, columnas) sobre reportes_nominas
+INDICES = [
+    ('ix_reportes_nominas_empleado_id_fecha_inicio', ['empleado_id', 'fecha_inicio']),
+    ('ix_reportes_nominas_fecha_inicio_id', ['fecha_inicio', 'id']),
+]
+
+
+# Enlaces cuyos repetidos cambiaron el total pagado y no se pueden fusionar
+SIN_FUSION = ('reportes_nominas_descuentos', 'reportes_nominas_subsidios')
+# Reportes con repetidos que se listan en el error
+MAX_REPORTES_LISTADOS = 50
+
+FUSIONAR_QUINCENAS = """
+    WITH grupos AS (
+        -- Se conserva la fila de menor id, la misma que deja ELIMINAR_REPETIDOS
+        SELECT reporte_nomina_id, tipo_recargo_id, (ARRAY_AGG(id ORDER BY id))[1] AS conservar,
+               SUM(cantidad_dias) AS cantidad_dias, SUM(valor_quincena) AS valor_quincena
+        FROM quincena_valores
+        GROUP BY reporte_nomina_id, tipo_recargo_id
+        HAVING COUNT(*) > 1
+    )
+    UPDATE quincena_valores qv
+    SET cantidad_dias = g.cantidad_dias, valor_quincena = g.valor_quincena
+    FROM grupos g
+    WHERE qv.id = g.conservar
+"""
+
+ELIMINAR_REPETIDOS = """
+    DELETE FROM {tabla} a
+    USING {tabla} b
+    WHERE a.reporte_nomina_id = b.reporte_nomina_id
+      AND a.{columna} = b.{columna}
+      AND a.id > b.id
+"""
+
+
+def _verificar_enlaces_repetidos() -> None:
+    conexion = op.get_bind()
+    for tabla, columna, _ in UNICAS:
+        if tabla not in SIN_FUSION:
+            continue
+        reportes = conexion.execute(sa.text(f"""
+            SELECT DISTINCT reporte_nomina_id FROM {tabla}
+            GROUP BY reporte_nomina_id, {columna}
+            HAVING COUNT(*) > 1
+        """)).scalars().all()
+        if reportes:
+            listados = ", ".join(str(reporte) for reporte in reportes[:MAX_REPORTES_LISTADOS])
+            raise RuntimeError(
+                f"{len(reportes)} reportes tienen filas repetidas en {tabla} ({columna}); se aplicaron "
+                f"dos veces en su total pagado y deben corregirse antes de migrar: {listados}"
+            )
+
+
+def upgrade() -> None:
+    _verificar_enlaces_repetidos()
+    op.execute(FUSIONAR_QUINCENAS)
+    for tabla, columna, _ in UNICAS:
+        if tabla not in SIN_FUSION:
+            op.execute(ELIMINAR_REPETIDOS.format(tabla=tabla, columna=columna))
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        for nombre, columnas in INDICES:
+            op.create_index(nombre, 'reportes_nominas', columnas, postgresql_concurrently=True, if_not_exists=True)
+        for tabla, columna, nombre in UNICAS:
+            op.create_index(nombre, tabla, ['reporte_nomina_id', columna], unique=True, postgresql_concurrently=True, if_not_exists=True)
+
+    for tabla, _, nombre in UNICAS:
+        op.execute(f"ALTER TABLE {tabla} ADD CONSTRAINT {nombre} UNIQUE USING INDEX {nombre}")
+
+
+def downgrade() -> None:
+    for tabla, _, nombre in UNICAS:
+        op.drop_constraint(nombre, tabla, type_='unique')
+
+    with op.get_context().autocommit_block():
+        for nombre, _ in INDICES:
+            op.drop_index(nombre, table_name='reportes_nominas', postgresql_concurrently=True, if_exists=True)
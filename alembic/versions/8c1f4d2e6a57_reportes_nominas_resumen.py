@@ -0,0 +1,91 @@
+"""Tabla reportes_nominas_resumen para el listado de nóminas
+
+Revision ID: 8c1f4d2e6a57
+Revises: 5b7e2c9a1d43
+Create Date: 2026-10-17 13:00:00.000000
+
+La tabla se llena a partir de los reportes existentes. Más adelante se puede reconstruir con
+``python -m app.services.resumen_nominas``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4d2e6a57'
+down_revision: Union[str, None] = '5b7e2c9a1d43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RELLENAR = """
+INSERT INTO reportes_nominas_resumen (
+    id, empleado_id, cedula, nombres, apellidos, telefono, puesto_trabajo,
+    fecha_inicio, fecha_fin, descuentos_aplicados, subsidios_aplicados, recargos_y_valores, total_pagado
+)
+WITH descuentos AS (
+    SELECT rnd.reporte_nomina_id, STRING_AGG(DISTINCT td.tipo, E'\\n') AS descuentos_aplicados
+    FROM reportes_nominas_descuentos rnd
+    INNER JOIN tipos_descuentos td ON td.id = rnd.tipo_descuento_id
+    GROUP BY rnd.reporte_nomina_id
+),
+subsidios AS (
+    SELECT rns.reporte_nomina_id, STRING_AGG(DISTINCT ts.tipo, E'\\n') AS subsidios_aplicados
+    FROM reportes_nominas_subsidios rns
+    INNER JOIN tipos_subsidios ts ON ts.id = rns.tipo_subsidio_id
+    GROUP BY rns.reporte_nomina_id
+),
+recargos AS (
+    SELECT
+        rnr.reporte_nomina_id,
+        STRING_AGG(DISTINCT tr.tipo_hora || ' ' || qv.cantidad_dias::text || ' días $ ' || qv.valor_quincena::text, E'\\n') AS recargos_y_valores
+    FROM reportes_nominas_recargos rnr
+    INNER JOIN tipos_recargos tr ON tr.id = rnr.tipo_recargo_id
+    LEFT JOIN quincena_valores qv ON qv.reporte_nomina_id = rnr.reporte_nomina_id AND qv.tipo_recargo_id = tr.id
+    GROUP BY rnr.reporte_nomina_id
+)
+SELECT
+    rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos, e.telefono, e.puesto_trabajo,
+    rn.fecha_inicio, rn.fecha_fin,
+    COALESCE(d.descuentos_aplicados, 'Sin descuentos'),
+    COALESCE(s.subsidios_aplicados, 'Sin subsidios'),
+    COALESCE(r.recargos_y_valores, 'Sin recargos'),
+    rn.total_pagado
+FROM reportes_nominas rn
+INNER JOIN empleados e ON e.id = rn.empleado_id
+LEFT JOIN descuentos d ON d.reporte_nomina_id = rn.id
+LEFT JOIN subsidios s ON s.reporte_nomina_id = rn.id
+LEFT JOIN recargos r ON r.reporte_nomina_id = rn.id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reportes_nominas_resumen',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('empleado_id', sa.UUID(), nullable=False),
+    sa.Column('cedula', sa.String(), nullable=False),
+    sa.Column('nombres', sa.String(), nullable=False),
+    sa.Column('apellidos', sa.String(), nullable=False),
+    sa.Column('telefono', sa.String(), nullable=True),
+    sa.Column('puesto_trabajo', sa.String(), nullable=True),
+    sa.Column('fecha_inicio', sa.Date(), nullable=False),
+    sa.Column('fecha_fin', sa.Date(), nullable=False),
+    sa.Column('descuentos_aplicados', sa.String(), nullable=False),
+    sa.Column('subsidios_aplicados', sa.String(), nullable=False),
+    sa.Column('recargos_y_valores', sa.String(), nullable=False),
+    sa.Column('total_pagado', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['reportes_nominas.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(RELLENAR)
+    op.create_index('ix_reportes_nominas_resumen_fecha_inicio_id', 'reportes_nominas_resumen', ['fecha_inicio', 'id'], unique=False)
+    op.create_index('ix_reportes_nominas_resumen_empleado_id_fecha_inicio', 'reportes_nominas_resumen', ['empleado_id', 'fecha_inicio'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reportes_nominas_resumen_empleado_id_fecha_inicio', table_name='reportes_nominas_resumen')
+    op.drop_index('ix_reportes_nominas_resumen_fecha_inicio_id', table_name='reportes_nominas_resumen')
+    op.drop_table('reportes_nominas_resumen')
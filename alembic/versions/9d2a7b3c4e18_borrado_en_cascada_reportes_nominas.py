@@ -0,0 +1,69 @@
+"""Borrado en cascada de las tablas hijas de reportes_nominas
+
+Revision ID: 9d2a7b3c4e18
+Revises: 8c1f4d2e6a57
+Create Date: 2026-10-17 14:00:00.000000
+
+Las llaves foráneas hacia reportes_nominas se vuelven a crear con ON DELETE CASCADE. Se
+agregan como NOT VALID y se validan después en transacciones propias: el bloqueo exclusivo de
+ALTER TABLE se libera al confirmar el reemplazo y la validación solo toma SHARE UPDATE EXCLUSIVE,
+que no bloquea las escrituras.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2a7b3c4e18'
+down_revision: Union[str, None] = '8c1f4d2e6a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLAS = [
+    'quincena_valores',
+    'reportes_nominas_recargos',
+    'reportes_nominas_descuentos',
+    'reportes_nominas_subsidios',
+]
+
+
+def _reemplazar_llave(tabla: str, al_borrar: str) -> None:
+    # Las tablas no se crearon con migraciones, así que el nombre actual se busca en el catálogo
+    nombre_actual = op.get_bind().execute(sa.text("""
+        SELECT conname FROM pg_constraint
+        WHERE contype = 'f'
+          AND conrelid = CAST(:tabla AS regclass)
+          AND confrelid = CAST('reportes_nominas' AS regclass)
+    """), {"tabla": tabla}).scalar()
+    nombre = f'{tabla}_reporte_nomina_id_fkey'
+
+    if nombre_actual is not None:
+        op.execute(f'ALTER TABLE {tabla} DROP CONSTRAINT {nombre_actual}')
+    op.execute(
+        f'ALTER TABLE {tabla} ADD CONSTRAINT {nombre} FOREIGN KEY (reporte_nomina_id) '
+        f'REFERENCES reportes_nominas (id) {al_borrar} NOT VALID'
+    )
+
+
+def _validar_llaves() -> None:
+    # autocommit_block confirma antes la transacción de la migración, que tiene los bloqueos
+    # exclusivos del reemplazo; cada VALIDATE corre entonces en su propia transacción
+    with op.get_context().autocommit_block():
+        for tabla in TABLAS:
+            op.execute(f'ALTER TABLE {tabla} VALIDATE CONSTRAINT {tabla}_reporte_nomina_id_fkey')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for tabla in TABLAS:
+        _reemplazar_llave(tabla, 'ON DELETE CASCADE')
+    _validar_llaves()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in TABLAS:
+        _reemplazar_llave(tabla, '')
+    _validar_llaves()
@@ -0,0 +1,52 @@
+"""Índices de paginación y búsqueda de empleados
+
+Revision ID: a3e5f1c7b920
+Revises: 9d2a7b3c4e18
+Create Date: 2026-10-17 15:00:00.000000
+
+El prefijo de cédula usa un btree con text_pattern_ops, válido con cualquier collation. La
+búsqueda por nombre usa un GIN de trigramas, que solo se crea si la extensión pg_trgm está
+disponible en el servidor; sin él la búsqueda funciona igual, recorriendo la tabla.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e5f1c7b920'
+down_revision: Union[str, None] = '9d2a7b3c4e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAMAS = 'ix_empleados_nombre_completo_trgm'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    hay_trigramas = op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+    ).scalar()
+    if hay_trigramas:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        op.create_index('ix_empleados_apellidos_nombres_id', 'empleados', ['apellidos', 'nombres', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_empleados_cedula_patron', 'empleados', ['cedula'],
+                        postgresql_ops={'cedula': 'text_pattern_ops'}, postgresql_concurrently=True, if_not_exists=True)
+        if hay_trigramas:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TRIGRAMAS} ON empleados "
+                "USING gin ((nombres || ' ' || apellidos) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {TRIGRAMAS}')
+        op.drop_index('ix_empleados_cedula_patron', table_name='empleados', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_empleados_apellidos_nombres_id', table_name='empleados', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,62 @@
+"""Cola de trabajos de nómina en segundo plano
+
+Revision ID: b7d4e2f9c316
+Revises: a3e5f1c7b920
+Create Date: 2026-10-17 16:00:00.000000
+
+trabajos_nominas guarda cada trabajo encolado y trabajos_nominas_bloques el resultado de cada
+bloque terminado. Los procesos de ``python -m app.services.trabajos_nomina`` toman los trabajos
+con SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4e2f9c316'
+down_revision: Union[str, None] = 'a3e5f1c7b920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('trabajos_nominas',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('tipo', sa.String(), nullable=False),
+    sa.Column('estado', sa.String(), server_default='pendiente', nullable=False),
+    sa.Column('parametros', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('intentos', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('trabajador', sa.String(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('iniciado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('terminado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('latido_en', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_trabajos_nominas_pendientes', 'trabajos_nominas', ['creado_en'], unique=False,
+                    postgresql_where=sa.text("estado IN ('pendiente', 'en_proceso')"))
+    op.create_table('trabajos_nominas_bloques',
+    sa.Column('trabajo_id', sa.UUID(), nullable=False),
+    sa.Column('bloque', sa.Integer(), nullable=False),
+    sa.Column('procesados', sa.Integer(), nullable=False),
+    sa.Column('exitosos', sa.Integer(), nullable=False),
+    sa.Column('fallidos', sa.Integer(), nullable=False),
+    sa.Column('errores', postgresql.JSONB(astext_type=sa.Text()), server_default='[]', nullable=False),
+    sa.Column('terminado_en', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['trabajo_id'], ['trabajos_nominas.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('trabajo_id', 'bloque')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('trabajos_nominas_bloques')
+    op.drop_index('ix_trabajos_nominas_pendientes', table_name='trabajos_nominas',
+                  postgresql_where=sa.text("estado IN ('pendiente', 'en_proceso')"))
+    op.drop_table('trabajos_nominas')
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Vigencias de la configuración de salario y de las tarifas
+
+Revision ID: c4f8a2d6e913
+Revises: b7d4e2f9c316
+Create Date: 2026-10-17 18:00:00.000000
+
+config_salarios.vigente_desde se llena con el 1 de enero de cada año, así las nóminas ya
+guardadas siguen resolviendo la misma configuración. Las tablas *_vigencias guardan los cambios
+de tarifa de recargos, subsidios y descuentos desde una fecha.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f8a2d6e913'
+down_revision: Union[str, None] = 'b7d4e2f9c316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('config_salarios', sa.Column('vigente_desde', sa.Date(), nullable=True))
+    op.execute("UPDATE config_salarios SET vigente_desde = make_date(\"año\"::int, 1, 1)")
+    op.alter_column('config_salarios', 'vigente_desde', nullable=False)
+    op.create_unique_constraint('config_salarios_vigente_desde_key', 'config_salarios', ['vigente_desde'])
+
+    op.create_table('tipos_recargos_vigencias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo_recargo_id', sa.Integer(), nullable=False),
+    sa.Column('vigente_desde', sa.Date(), nullable=False),
+    sa.Column('porcentaje', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('valor_hora', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['tipo_recargo_id'], ['tipos_recargos.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tipo_recargo_id', 'vigente_desde', name='uq_tipos_recargos_vigencias_tipo_fecha')
+    )
+    op.create_index(op.f('ix_tipos_recargos_vigencias_id'), 'tipos_recargos_vigencias', ['id'], unique=False)
+    op.create_table('tipos_subsidios_vigencias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo_subsidio_id', sa.Integer(), nullable=False),
+    sa.Column('vigente_desde', sa.Date(), nullable=False),
+    sa.Column('valor', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['tipo_subsidio_id'], ['tipos_subsidios.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tipo_subsidio_id', 'vigente_desde', name='uq_tipos_subsidios_vigencias_tipo_fecha')
+    )
+    op.create_index(op.f('ix_tipos_subsidios_vigencias_id'), 'tipos_subsidios_vigencias', ['id'], unique=False)
+    op.create_table('tipos_descuentos_vigencias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo_descuento_id', sa.Integer(), nullable=False),
+    sa.Column('vigente_desde', sa.Date(), nullable=False),
+    sa.Column('valor', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['tipo_descuento_id'], ['tipos_descuentos.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tipo_descuento_id', 'vigente_desde', name='uq_tipos_descuentos_vigencias_tipo_fecha')
+    )
+    op.create_index(op.f('ix_tipos_descuentos_vigencias_id'), 'tipos_descuentos_vigencias', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tipos_descuentos_vigencias_id'), table_name='tipos_descuentos_vigencias')
+    op.drop_table('tipos_descuentos_vigencias')
+    op.drop_index(op.f('ix_tipos_subsidios_vigencias_id'), table_name='tipos_subsidios_vigencias')
+    op.drop_table('tipos_subsidios_vigencias')
+    op.drop_index(op.f('ix_tipos_recargos_vigencias_id'), table_name='tipos_recargos_vigencias')
+    op.drop_table('tipos_recargos_vigencias')
+    op.drop_constraint('config_salarios_vigente_desde_key', 'config_salarios', type_='unique')
+    op.drop_column('config_salarios', 'vigente_desde')
\ No newline at end of file
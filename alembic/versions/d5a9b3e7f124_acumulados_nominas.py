@@ -0,0 +1,91 @@
+"""Totales por reporte y acumulados del año por empleado
+
+Revision ID: d5a9b3e7f124
+Revises: c4f8a2d6e913
+Create Date: 2026-10-17 20:00:00.000000
+
+reportes_nominas guarda el devengado, los subsidios y los descuentos de cada cálculo. En los
+reportes existentes se deducen de lo guardado: subsidios con la tarifa vigente en la fecha de
+inicio, devengado como la suma de las líneas más los subsidios y descuentos como la diferencia
+con el total pagado. nominas_acumulados_anuales se llena a partir de esos totales.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a9b3e7f124'
+down_revision: Union[str, None] = 'c4f8a2d6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TOTALES = ('total_devengado', 'total_subsidios', 'total_descuentos')
+
+RELLENAR_TOTALES = """
+WITH subsidios AS (
+    SELECT rns.reporte_nomina_id, SUM(COALESCE(v.valor, ts.valor)) AS total
+    FROM reportes_nominas_subsidios rns
+    INNER JOIN reportes_nominas rn ON rn.id = rns.reporte_nomina_id
+    INNER JOIN tipos_subsidios ts ON ts.id = rns.tipo_subsidio_id
+    LEFT JOIN LATERAL (
+        SELECT tsv.valor FROM tipos_subsidios_vigencias tsv
+        WHERE tsv.tipo_subsidio_id = ts.id AND tsv.vigente_desde <= rn.fecha_inicio
+        ORDER BY tsv.vigente_desde DESC LIMIT 1
+    ) v ON true
+    GROUP BY rns.reporte_nomina_id
+), lineas AS (
+    SELECT reporte_nomina_id, SUM(valor_quincena) AS total
+    FROM quincena_valores
+    GROUP BY reporte_nomina_id
+), totales AS (
+    SELECT rn.id,
+           COALESCE(s.total, 0) AS subsidios,
+           COALESCE(l.total, 0) + COALESCE(s.total, 0) AS devengado
+    FROM reportes_nominas rn
+    LEFT JOIN subsidios s ON s.reporte_nomina_id = rn.id
+    LEFT JOIN lineas l ON l.reporte_nomina_id = rn.id
+)
+UPDATE reportes_nominas rn
+SET total_subsidios = t.subsidios,
+    total_devengado = t.devengado,
+    total_descuentos = t.devengado - rn.total_pagado
+FROM totales t
+WHERE t.id = rn.id
+"""
+
+RELLENAR_ACUMULADOS = """
+INSERT INTO nominas_acumulados_anuales
+    (empleado_id, "año", reportes, total_devengado, total_subsidios, total_descuentos, total_pagado)
+SELECT empleado_id, EXTRACT(YEAR FROM fecha_inicio)::int, count(*),
+       sum(total_devengado), sum(total_subsidios), sum(total_descuentos), sum(total_pagado)
+FROM reportes_nominas
+GROUP BY 1, 2
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for columna in TOTALES:
+        op.add_column('reportes_nominas', sa.Column(columna, sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+    op.execute(RELLENAR_TOTALES)
+    op.create_table('nominas_acumulados_anuales',
+    sa.Column('empleado_id', sa.UUID(), nullable=False),
+    sa.Column('año', sa.Integer(), nullable=False),
+    sa.Column('reportes', sa.Integer(), nullable=False),
+    sa.Column('total_devengado', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('total_subsidios', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('total_descuentos', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('total_pagado', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['empleado_id'], ['empleados.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('empleado_id', 'año')
+    )
+    op.execute(RELLENAR_ACUMULADOS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('nominas_acumulados_anuales')
+    for columna in reversed(TOTALES):
+        op.drop_column('reportes_nominas', columna)
\ No newline at end of file
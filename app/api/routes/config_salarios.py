@@ -1,17 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from app.db import models, schemas
 from app.db.database import get_db
+from app.services.cache_backend import cache_backend
+from app.services.cache_respuestas import respuesta_cacheada
 
 router = APIRouter()
 
 # Ruta para leer las configuraciones de salarios
 @router.get("/", response_model=List[schemas.ConfigSalario])
-async def leer_config_salarios(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.ConfigSalario))
-    return result.scalars().all()
+async def leer_config_salarios(request: Request, db: AsyncSession = Depends(get_db)):
+    async def consultar():
+        result = await db.execute(select(models.ConfigSalario))
+        return result.scalars().all()
+    return await respuesta_cacheada(request, "config_salarios", List[schemas.ConfigSalario], consultar)
 
 # Ruta para leer una configuración de salario por su ID
 @router.get("/{config_salario_id}", response_model=schemas.ConfigSalario)
@@ -24,12 +28,29 @@ async def leer_config_salario(config_salario_id: int, db: AsyncSession = Depends
         raise HTTPException(status_code=404, detail="Configuración de salario no encontrada")
     return config_salario
 
+def _columnas(datos: dict) -> dict:
+    """La columna año es texto; el esquema la valida como número."""
+    if "año" in datos:
+        datos["año"] = str(datos["año"])
+    return datos
+
+async def _verificar_vigencia_libre(db: AsyncSession, vigente_desde, config_salario_id: int | None = None):
+    """Cada configuración rige desde una fecha distinta."""
+    consulta = select(models.ConfigSalario.id).where(models.ConfigSalario.vigente_desde == vigente_desde)
+    if config_salario_id is not None:
+        consulta = consulta.where(models.ConfigSalario.id != config_salario_id)
+    result = await db.execute(consulta)
+    if result.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=400, detail=f"Ya existe una configuración de salario vigente desde {vigente_desde}")
+
 # Ruta para crear una configuración de salario
 @router.post("/", status_code=201, response_model=schemas.ConfigSalario)
 async def crear_config_salario(config_salario: schemas.ConfigSalarioCreate, db: AsyncSession = Depends(get_db)):
-    nueva_config_salario = models.ConfigSalario(**config_salario.model_dump())
+    await _verificar_vigencia_libre(db, config_salario.vigente_desde)
+    nueva_config_salario = models.ConfigSalario(**_columnas(config_salario.model_dump()))
     db.add(nueva_config_salario)
     await db.commit()
+    await cache_backend.invalidar("config_salarios")
     await db.refresh(nueva_config_salario)
     return nueva_config_salario
 
@@ -42,9 +63,16 @@ async def actualizar_config_salario(config_salario_id: int, config_salario: sche
     db_config_salario = result.scalar_one_or_none()
     if db_config_salario is None:
         raise HTTPException(status_code=404, detail="Configuración de salario no encontrada")
-    for key, value in config_salario.model_dump(exclude_unset=True).items():
+    cambios = config_salario.model_dump(exclude_unset=True)
+    # Sin fecha (o con null) se conserva la vigencia guardada
+    if cambios.get("vigente_desde") is None:
+        cambios.pop("vigente_desde", None)
+    else:
+        await _verificar_vigencia_libre(db, cambios["vigente_desde"], config_salario_id)
+    for key, value in _columnas(cambios).items():
         setattr(db_config_salario, key, value)
     await db.commit()
+    await cache_backend.invalidar("config_salarios")
     await db.refresh(db_config_salario)
     return db_config_salario
 
@@ -59,4 +87,5 @@ async def eliminar_config_salario(config_salario_id: int, db: AsyncSession = Dep
         raise HTTPException(status_code=404, detail="Configuración de salario no encontrada")
     await db.delete(db_config_salario)
     await db.commit()
+    await cache_backend.invalidar("config_salarios")
     return {"message": "Configuración de salario eliminada exitosamente", "config_salario": db_config_salario}
\ No newline at end of file
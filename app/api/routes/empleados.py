@@ -1,18 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import Optional
+from datetime import date
 from app.db import models, schemas
 from app.db.database import get_db
+from app.services.resumen_nominas import refrescar_resumen_empleado
+from app.services.cache_backend import cache_backend
+from app.services.empleados import obtener_empleados, campos_solicitados
+from app.services.importacion_empleados import importar_empleados
+from app.services.reporte_payroll import obtener_reporte_nominas
+from app.services.acumulados_nominas import obtener_acumulados
+from app.services.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
 from uuid import UUID
 
 router = APIRouter()
 
-# Ruta para leer todos los empleados
-@router.get("/", response_model=List[schemas.Empleado])
-async def leer_empleados(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Empleado))
-    return result.scalars().all()
+# Ruta para leer los empleados paginados por cursor. La respuesta se arma sin response_model
+# porque sus elementos traen solo los campos pedidos; responses= la documenta en OpenAPI
+@router.get("/", response_model=None, response_class=Response, responses={
+    200: {"model": schemas.EmpleadoPagina, "content": {"application/json": {}}}
+})
+async def leer_empleados(
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    cedula: Optional[str] = Query(None, description="Prefijo de la cédula"),
+    nombre: Optional[str] = Query(None, description="Texto contenido en nombres o apellidos"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. id,nombres,apellidos"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Lista los empleados por apellidos y nombres; next_cursor pide la página siguiente"""
+    pagina = await obtener_empleados(db, limite, cursor, cedula, nombre, campos_solicitados(fields))
+    # Las filas ya vienen con los tipos de la tabla; se serializan sin validarlas una a una
+    return Response(content=to_json(pagina), media_type="application/json")
+
+# Ruta para crear o actualizar empleados en bloque desde un archivo CSV o NDJSON
+@router.post("/import", response_model=schemas.EmpleadoImportacionResultado)
+async def importar_empleados_archivo(
+    request: Request,
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Importa empleados por cédula: los nuevos se crean y los existentes se actualizan.
+
+    El cuerpo es el archivo completo (CSV con encabezado o un objeto JSON por línea) y se
+    procesa a medida que llega. Las filas inválidas se informan en errores sin detener la carga.
+    """
+    return await importar_empleados(db, formato, request.stream())
 
 # Ruta para leer un empleado por su ID
 @router.get("/{empleado_id}", response_model=schemas.Empleado)
@@ -25,6 +60,27 @@ async def leer_empleado(empleado_id: UUID, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
     return empleado
 
+# Ruta para leer el historial de nóminas de un empleado con sus acumulados por año
+@router.get("/{empleado_id}/nominas", response_model=schemas.EmpleadoNominasPagina)
+async def leer_nominas_empleado(
+    empleado_id: UUID,
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Nóminas del empleado de la más reciente a la más antigua y sus acumulados de cada año.
+
+    La página se lee por el índice (empleado_id, fecha_inicio) del resumen y los acumulados se
+    mantienen al escribir las nóminas, así el costo no crece con el histórico del empleado.
+    """
+    pagina = await obtener_reporte_nominas(db, limite, cursor, empleado_id, fecha_desde, fecha_hasta)
+    # El empleado solo se busca cuando no tiene nóminas que mostrar
+    if not pagina["items"] and await db.get(models.Empleado, empleado_id) is None:
+        raise HTTPException(status_code=404, detail="Empleado no encontrado")
+    return {**pagina, "acumulados": await obtener_acumulados(db, empleado_id)}
+
 # Ruta para crear un empleado
 @router.post("/", status_code=201, response_model=schemas.Empleado)
 async def crear_empleado(empleado: schemas.EmpleadoCreate, db: AsyncSession = Depends(get_db)):
@@ -45,7 +101,12 @@ async def actualizar_empleado(empleado_id: UUID, empleado: schemas.EmpleadoUpdat
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
     for key, value in empleado.model_dump(exclude_unset=True).items():
         setattr(db_empleado, key, value)
+    # Los datos del empleado están copiados en el resumen de sus nóminas
+    await db.flush()
+    await refrescar_resumen_empleado(db, empleado_id)
     await db.commit()
+    # El detalle de las nóminas incluye los datos del empleado
+    await cache_backend.invalidar("nominas")
     await db.refresh(db_empleado)
     return db_empleado
 
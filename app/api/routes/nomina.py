@@ -1,29 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
+from datetime import date
+from dataclasses import asdict
 from app.db import models, schemas
-from app.db.database import get_db
-from app.db.crud import crear_reporte_nomina, actualizar_reporte_nomina, eliminar_reporte_nomina
-from app.services.payroll import calcular_nomina
-from app.services.reporte_payroll import obtener_reporte_nominas, obtener_reporte_nomina
+from app.db.database import get_db, AsyncSessionLocal
+from app.core.config import SIMULACION_MAX_ESCENARIOS
+from app.db.crud import (
+    crear_reporte_nomina, crear_reportes_nomina_lote, actualizar_reporte_nomina, eliminar_reporte_nomina,
+    eliminar_reportes_nomina
+)
+from app.services.payroll import calcular_nomina, calcular_nominas_lote, simular_nominas
+from app.services.recalculo import recalcular_nominas
+from app.services.trabajos_nomina import encolar_trabajo, obtener_trabajo
+from app.services.reporte_payroll import (
+    obtener_reporte_nominas, obtener_reporte_nomina, exportar_reporte_nominas, FORMATOS_EXPORTACION
+)
+from app.services.cache_backend import cache_backend
+from app.services.cache_respuestas import respuesta_cacheada
+from app.services.paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO
 from app.db.schemas import ReporteNominaResponse, ReporteNominaUpdateForm
 from uuid import UUID
 
 router = APIRouter()
 
-# Ruta para leer todas las nóminas
-@router.get("/", response_model=List[ReporteNominaResponse])
-async def leer_nominas(db: AsyncSession = Depends(get_db)):
-    return await obtener_reporte_nominas(db)
+# Ruta para leer las nóminas paginadas por cursor
+@router.get("/", response_model=schemas.ReporteNominaPagina)
+async def leer_nominas(
+    limite: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    empleado_id: Optional[UUID] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    puesto_trabajo: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Lista las nóminas de la más reciente a la más antigua; next_cursor pide la página siguiente"""
+    return await obtener_reporte_nominas(
+        db, limite, cursor, empleado_id, fecha_desde, fecha_hasta, puesto_trabajo
+    )
+
+# Ruta para exportar todas las nóminas filtradas
+@router.get("/export")
+async def exportar_nominas(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    empleado_id: Optional[UUID] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    puesto_trabajo: Optional[str] = None,
+):
+    """Descarga el listado de nóminas en CSV o NDJSON sin cargarlo completo en memoria"""
+    return StreamingResponse(
+        exportar_reporte_nominas(
+            AsyncSessionLocal, formato, empleado_id, fecha_desde, fecha_hasta, puesto_trabajo
+        ),
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f'attachment; filename="nominas.{formato}"'}
+    )
 
 # Ruta para leer una nómina por su ID
 @router.get("/{nomina_id}", response_model=ReporteNominaUpdateForm)
-async def leer_nomina(nomina_id: UUID, db: AsyncSession = Depends(get_db)):
-    nomina = await obtener_reporte_nomina(db, nomina_id)
-    if nomina is None:
-        raise HTTPException(status_code=404, detail="Nómina no encontrada")
-    return nomina
+async def leer_nomina(nomina_id: UUID, request: Request, db: AsyncSession = Depends(get_db)):
+    async def consultar():
+        nomina = await obtener_reporte_nomina(db, nomina_id)
+        if nomina is None:
+            raise HTTPException(status_code=404, detail="Nómina no encontrada")
+        return nomina
+    return await respuesta_cacheada(request, "nominas", ReporteNominaUpdateForm, consultar, clave=str(nomina_id))
 
 # Ruta para crear una nómina
 @router.post("/", status_code=201, response_model=schemas.ReporteNomina)
@@ -34,11 +79,95 @@ async def crear_nomina(nomina: schemas.ReporteNominaCreate, db: AsyncSession = D
     # Guardar en base de datos
     return await crear_reporte_nomina(db, nomina_calculada)
 
+# Ruta para calcular y crear las nóminas de una quincena completa
+@router.post("/batch", status_code=201, response_model=schemas.ReporteNominaLoteResponse)
+async def crear_nominas_lote(nominas: List[schemas.ReporteNominaCreate], db: AsyncSession = Depends(get_db)):
+    """Calcula y crea un lote de nóminas en una sola transacción, informando el resultado de cada una"""
+    calculadas = await calcular_nominas_lote(db, nominas)
+    validas = [nomina for nomina, error in calculadas if error is None]
+    guardadas = iter(await crear_reportes_nomina_lote(db, validas))
+
+    resultados = []
+    for indice, (nomina, error) in enumerate(calculadas):
+        if error is None:
+            resultados.append(schemas.ReporteNominaLoteResultado(indice=indice, exito=True, nomina=next(guardadas)))
+        else:
+            resultados.append(schemas.ReporteNominaLoteResultado(indice=indice, exito=False, error=error))
+
+    return schemas.ReporteNominaLoteResponse(
+        creadas=len(validas),
+        fallidas=len(calculadas) - len(validas),
+        resultados=resultados
+    )
+
+# Ruta para comparar escenarios de nómina (p. ej. más horas nocturnas o más dominicales) sin guardarlos
+@router.post("/simular", response_model=schemas.SimulacionNominaResponse)
+async def simular_nominas_escenarios(escenarios: List[schemas.EscenarioNomina], db: AsyncSession = Depends(get_db)):
+    """Calcula cada escenario en memoria, con tarifas opcionales que reemplazan a las vigentes; no escribe nada"""
+    if len(escenarios) > SIMULACION_MAX_ESCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Se admiten hasta {SIMULACION_MAX_ESCENARIOS} escenarios por petición")
+    calculados = await simular_nominas(db, escenarios)
+
+    resultados = []
+    for indice, (escenario, (resultado, error)) in enumerate(zip(escenarios, calculados)):
+        if error is not None:
+            resultados.append(schemas.EscenarioNominaResultado(indice=indice, nombre=escenario.nombre, exito=False, error=error))
+            continue
+        resultados.append(schemas.EscenarioNominaResultado(
+            indice=indice,
+            nombre=escenario.nombre,
+            exito=True,
+            lineas=[schemas.LineaSimulada(**asdict(linea)) for linea in resultado.lineas],
+            total_devengado=resultado.total_devengado,
+            total_subsidios=resultado.total_subsidios,
+            total_descuentos=resultado.total_descuentos,
+            total_pagado=resultado.total_pagado
+        ))
+
+    exitosos = sum(resultado.exito for resultado in resultados)
+    return schemas.SimulacionNominaResponse(exitosos=exitosos, fallidos=len(resultados) - exitosos, resultados=resultados)
+
+# Ruta para recalcular en bloque las nóminas guardadas tras corregir un recargo o la configuración
+@router.post("/recalcular", response_model=schemas.RecalculoNominaResultado)
+async def recalcular_nominas_guardadas(parametros: schemas.RecalculoNominaRequest, db: AsyncSession = Depends(get_db)):
+    """Recalcula los reportes afectados; con dry_run solo devuelve las diferencias"""
+    return await recalcular_nominas(db, parametros)
+
+# Ruta para encolar una corrida de nómina o un recálculo que se procesa en segundo plano
+@router.post("/jobs", status_code=202, response_model=schemas.TrabajoNomina)
+async def encolar_trabajo_nomina(trabajo: schemas.TrabajoNominaCreate, db: AsyncSession = Depends(get_db)):
+    """Encola el trabajo; lo ejecutan los procesos de python -m app.services.trabajos_nomina"""
+    # Los trabajadores no arrancan sin caché compartido: el trabajo quedaría pendiente para siempre
+    if not cache_backend.compartido:
+        raise HTTPException(status_code=503, detail="Los trabajos de nómina necesitan CACHE_BACKEND_URL con Redis")
+    return await encolar_trabajo(db, trabajo)
+
+# Ruta para consultar el avance de un trabajo en segundo plano
+@router.get("/jobs/{trabajo_id}", response_model=schemas.TrabajoNomina)
+async def leer_trabajo_nomina(trabajo_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Estado, avance, nóminas por segundo y errores por empleado del trabajo"""
+    trabajo = await obtener_trabajo(db, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
 # Ruta para actualizar una nómina
 @router.put("/{nomina_id}", response_model=schemas.ReporteNomina)
 async def actualizar_nomina(nomina_id: UUID, nomina: schemas.ReporteNominaUpdate, db: AsyncSession = Depends(get_db)):
     return await actualizar_reporte_nomina(db, nomina_id, nomina)
 
+# Ruta para eliminar varias nóminas por ID o por rango de fechas
+@router.delete("/", response_model=schemas.ReporteNominaEliminacionResultado)
+async def eliminar_nominas(
+    ids: Optional[List[UUID]] = Query(None),
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    empleado_id: Optional[UUID] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Elimina de una vez las nóminas indicadas, p. ej. una corrida de quincena errónea"""
+    return await eliminar_reportes_nomina(db, ids, fecha_desde, fecha_hasta, empleado_id)
+
 # Ruta para eliminar una nómina
 @router.delete("/{nomina_id}")
 async def eliminar_nomina(nomina_id: UUID, db: AsyncSession = Depends(get_db)):
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from app.db import models, schemas
 from app.db.database import get_db
+from app.services.cache_backend import cache_backend
+from app.services.cache_respuestas import respuesta_cacheada
+from app.services.resumen_nominas import refrescar_resumen_por_tipo
 
 router = APIRouter()
 
 # Ruta para leer todos los tipos de descuentos
 @router.get("/", response_model=List[schemas.TipoDescuento])
-async def leer_tipos_descuentos(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.TipoDescuento))
-    return result.scalars().all()
+async def leer_tipos_descuentos(request: Request, db: AsyncSession = Depends(get_db)):
+    async def consultar():
+        result = await db.execute(select(models.TipoDescuento))
+        return result.scalars().all()
+    return await respuesta_cacheada(request, "tipos_descuentos", List[schemas.TipoDescuento], consultar)
 
 # Ruta para leer un tipo de descuento por su ID
 @router.get("/{tipo_descuento_id}", response_model=schemas.TipoDescuento)
@@ -30,6 +35,7 @@ async def crear_tipo_descuento(tipo_descuento: schemas.TipoDescuentoCreate, db:
     nuevo_tipo_descuento = models.TipoDescuento(**tipo_descuento.model_dump())
     db.add(nuevo_tipo_descuento)
     await db.commit()
+    await cache_backend.invalidar("tipos_descuentos")
     await db.refresh(nuevo_tipo_descuento)
     return nuevo_tipo_descuento
 
@@ -42,9 +48,18 @@ async def actualizar_tipo_descuento(tipo_descuento_id: int, tipo_descuento: sche
     db_tipo_descuento = result.scalar_one_or_none()
     if db_tipo_descuento is None:
         raise HTTPException(status_code=404, detail="Tipo de descuento no encontrado")
+    nombre_anterior = db_tipo_descuento.tipo
     for key, value in tipo_descuento.model_dump(exclude_unset=True).items():
         setattr(db_tipo_descuento, key, value)
+    # El nombre está copiado en el resumen del listado de nóminas y en sus respuestas en caché
+    renombrado = db_tipo_descuento.tipo != nombre_anterior
+    if renombrado:
+        await db.flush()
+        await refrescar_resumen_por_tipo(db, "tipos_descuentos", tipo_descuento_id)
     await db.commit()
+    await cache_backend.invalidar("tipos_descuentos")
+    if renombrado:
+        await cache_backend.invalidar("nominas")
     await db.refresh(db_tipo_descuento)
     return db_tipo_descuento
 
@@ -59,4 +74,46 @@ async def eliminar_tipo_descuento(tipo_descuento_id: int, db: AsyncSession = Dep
         raise HTTPException(status_code=404, detail="Tipo de descuento no encontrado")
     await db.delete(db_tipo_descuento)
     await db.commit()
-    return {"message": "Tipo de descuento eliminado exitosamente", "tipo_descuento": db_tipo_descuento}
\ No newline at end of file
+    await cache_backend.invalidar("tipos_descuentos")
+    return {"message": "Tipo de descuento eliminado exitosamente", "tipo_descuento": db_tipo_descuento}
+
+# Ruta para leer las vigencias de un tipo de descuento
+@router.get("/{tipo_descuento_id}/vigencias", response_model=List[schemas.TipoDescuentoVigencia])
+async def leer_vigencias_tipo_descuento(tipo_descuento_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(models.TipoDescuentoVigencia)
+        .where(models.TipoDescuentoVigencia.tipo_descuento_id == tipo_descuento_id)
+        .order_by(models.TipoDescuentoVigencia.vigente_desde)
+    )
+    return result.scalars().all()
+
+# Ruta para registrar un porcentaje de descuento desde una fecha; los periodos anteriores conservan el valor previo
+@router.post("/{tipo_descuento_id}/vigencias", status_code=201, response_model=schemas.TipoDescuentoVigencia)
+async def crear_vigencia_tipo_descuento(tipo_descuento_id: int, vigencia: schemas.TipoDescuentoVigenciaCreate, db: AsyncSession = Depends(get_db)):
+    if await db.get(models.TipoDescuento, tipo_descuento_id) is None:
+        raise HTTPException(status_code=404, detail="Tipo de descuento no encontrado")
+    existente = await db.execute(
+        select(models.TipoDescuentoVigencia.id).where(
+            models.TipoDescuentoVigencia.tipo_descuento_id == tipo_descuento_id,
+            models.TipoDescuentoVigencia.vigente_desde == vigencia.vigente_desde
+        )
+    )
+    if existente.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=400, detail=f"Ya existe una vigencia desde {vigencia.vigente_desde}")
+    db_vigencia = models.TipoDescuentoVigencia(tipo_descuento_id=tipo_descuento_id, **vigencia.model_dump())
+    db.add(db_vigencia)
+    await db.commit()
+    await cache_backend.invalidar("tipos_descuentos")
+    await db.refresh(db_vigencia)
+    return db_vigencia
+
+# Ruta para eliminar una vigencia de un tipo de descuento
+@router.delete("/{tipo_descuento_id}/vigencias/{vigencia_id}")
+async def eliminar_vigencia_tipo_descuento(tipo_descuento_id: int, vigencia_id: int, db: AsyncSession = Depends(get_db)):
+    db_vigencia = await db.get(models.TipoDescuentoVigencia, vigencia_id)
+    if db_vigencia is None or db_vigencia.tipo_descuento_id != tipo_descuento_id:
+        raise HTTPException(status_code=404, detail="Vigencia no encontrada")
+    await db.delete(db_vigencia)
+    await db.commit()
+    await cache_backend.invalidar("tipos_descuentos")
+    return {"message": "Vigencia eliminada", "vigencia": db_vigencia}
\ No newline at end of file
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from app.db import models, schemas
 from app.db.database import get_db
+from app.services.cache_backend import cache_backend
+from app.services.cache_respuestas import respuesta_cacheada
+from app.services.resumen_nominas import refrescar_resumen_por_tipo
 
 router = APIRouter()
 
 # Ruta para leer los tipos de recargos
 @router.get("/", response_model=List[schemas.TipoRecargoBase])
-async def leer_tipos_recargos(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.TipoRecargo))
-    return result.scalars().all()
+async def leer_tipos_recargos(request: Request, db: AsyncSession = Depends(get_db)):
+    async def consultar():
+        result = await db.execute(select(models.TipoRecargo))
+        return result.scalars().all()
+    return await respuesta_cacheada(request, "tipos_recargos", List[schemas.TipoRecargoBase], consultar)
 
 # Ruta para leer un tipo de recargo por su ID
 @router.get("/{tipo_recargo_id}", response_model=schemas.TipoRecargoBase)
@@ -30,6 +35,7 @@ async def crear_tipo_recargo(tipo_recargo: schemas.TipoRecargoCreate, db: AsyncS
     db_tipo_recargo = models.TipoRecargo(**tipo_recargo.model_dump())
     db.add(db_tipo_recargo)
     await db.commit()
+    await cache_backend.invalidar("tipos_recargos")
     await db.refresh(db_tipo_recargo)
     return db_tipo_recargo
 
@@ -42,9 +48,18 @@ async def actualizar_tipo_recargo(tipo_recargo_id: int, tipo_recargo: schemas.Ti
     db_tipo_recargo = result.scalar_one_or_none()
     if db_tipo_recargo is None:
         raise HTTPException(status_code=404, detail="Tipo de recargo no encontrado")
+    nombre_anterior = db_tipo_recargo.tipo_hora
     for key, value in tipo_recargo.model_dump().items():
         setattr(db_tipo_recargo, key, value)
+    # El nombre está copiado en el resumen del listado de nóminas y en sus respuestas en caché
+    renombrado = db_tipo_recargo.tipo_hora != nombre_anterior
+    if renombrado:
+        await db.flush()
+        await refrescar_resumen_por_tipo(db, "tipos_recargos", tipo_recargo_id)
     await db.commit()
+    await cache_backend.invalidar("tipos_recargos")
+    if renombrado:
+        await cache_backend.invalidar("nominas")
     await db.refresh(db_tipo_recargo)
     return db_tipo_recargo
 
@@ -59,4 +74,46 @@ async def eliminar_tipo_recargo(tipo_recargo_id: int, db: AsyncSession = Depends
         raise HTTPException(status_code=404, detail="Tipo de recargo no encontrado")
     await db.delete(db_tipo_recargo)
     await db.commit()
-    return {"message": "Tipo de recargo eliminado", "tipo_recargo": db_tipo_recargo}
\ No newline at end of file
+    await cache_backend.invalidar("tipos_recargos")
+    return {"message": "Tipo de recargo eliminado", "tipo_recargo": db_tipo_recargo}
+
+# Ruta para leer las vigencias de un tipo de recargo
+@router.get("/{tipo_recargo_id}/vigencias", response_model=List[schemas.TipoRecargoVigencia])
+async def leer_vigencias_tipo_recargo(tipo_recargo_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(models.TipoRecargoVigencia)
+        .where(models.TipoRecargoVigencia.tipo_recargo_id == tipo_recargo_id)
+        .order_by(models.TipoRecargoVigencia.vigente_desde)
+    )
+    return result.scalars().all()
+
+# Ruta para registrar una tarifa de recargo desde una fecha; los periodos anteriores conservan el valor previo
+@router.post("/{tipo_recargo_id}/vigencias", status_code=201, response_model=schemas.TipoRecargoVigencia)
+async def crear_vigencia_tipo_recargo(tipo_recargo_id: int, vigencia: schemas.TipoRecargoVigenciaCreate, db: AsyncSession = Depends(get_db)):
+    if await db.get(models.TipoRecargo, tipo_recargo_id) is None:
+        raise HTTPException(status_code=404, detail="Tipo de recargo no encontrado")
+    existente = await db.execute(
+        select(models.TipoRecargoVigencia.id).where(
+            models.TipoRecargoVigencia.tipo_recargo_id == tipo_recargo_id,
+            models.TipoRecargoVigencia.vigente_desde == vigencia.vigente_desde
+        )
+    )
+    if existente.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=400, detail=f"Ya existe una vigencia desde {vigencia.vigente_desde}")
+    db_vigencia = models.TipoRecargoVigencia(tipo_recargo_id=tipo_recargo_id, **vigencia.model_dump())
+    db.add(db_vigencia)
+    await db.commit()
+    await cache_backend.invalidar("tipos_recargos")
+    await db.refresh(db_vigencia)
+    return db_vigencia
+
+# Ruta para eliminar una vigencia de un tipo de recargo
+@router.delete("/{tipo_recargo_id}/vigencias/{vigencia_id}")
+async def eliminar_vigencia_tipo_recargo(tipo_recargo_id: int, vigencia_id: int, db: AsyncSession = Depends(get_db)):
+    db_vigencia = await db.get(models.TipoRecargoVigencia, vigencia_id)
+    if db_vigencia is None or db_vigencia.tipo_recargo_id != tipo_recargo_id:
+        raise HTTPException(status_code=404, detail="Vigencia no encontrada")
+    await db.delete(db_vigencia)
+    await db.commit()
+    await cache_backend.invalidar("tipos_recargos")
+    return {"message": "Vigencia eliminada", "vigencia": db_vigencia}
\ No newline at end of file
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from app.db import models, schemas
 from app.db.database import get_db
+from app.services.cache_backend import cache_backend
+from app.services.cache_respuestas import respuesta_cacheada
+from app.services.resumen_nominas import refrescar_resumen_por_tipo
 
 router = APIRouter()
 
 # Ruta para leer todos los tipos de subsidios
 @router.get("/", response_model=List[schemas.TipoSubsidio])
-async def leer_tipos_subsidios(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.TipoSubsidio))
-    return result.scalars().all()
+async def leer_tipos_subsidios(request: Request, db: AsyncSession = Depends(get_db)):
+    async def consultar():
+        result = await db.execute(select(models.TipoSubsidio))
+        return result.scalars().all()
+    return await respuesta_cacheada(request, "tipos_subsidios", List[schemas.TipoSubsidio], consultar)
 
 # Ruta para leer un tipo de subsidio por ID
 @router.get("/{tipo_subsidio_id}", response_model=schemas.TipoSubsidio)
@@ -30,6 +35,7 @@ async def crear_tipo_subsidio(tipo_subsidio: schemas.TipoSubsidioCreate, db: Asy
     db_tipo_subsidio = models.TipoSubsidio(**tipo_subsidio.model_dump())
     db.add(db_tipo_subsidio)
     await db.commit()
+    await cache_backend.invalidar("tipos_subsidios")
     await db.refresh(db_tipo_subsidio)
     return db_tipo_subsidio
 
@@ -42,9 +48,18 @@ async def actualizar_tipo_subsidio(tipo_subsidio_id: int, tipo_subsidio: schemas
     db_tipo_subsidio = result.scalar_one_or_none()
     if db_tipo_subsidio is None:
         raise HTTPException(status_code=404, detail="Tipo de subsidio no encontrado")
+    nombre_anterior = db_tipo_subsidio.tipo
     for key, value in tipo_subsidio.model_dump().items():
         setattr(db_tipo_subsidio, key, value)
+    # El nombre está copiado en el resumen del listado de nóminas y en sus respuestas en caché
+    renombrado = db_tipo_subsidio.tipo != nombre_anterior
+    if renombrado:
+        await db.flush()
+        await refrescar_resumen_por_tipo(db, "tipos_subsidios", tipo_subsidio_id)
     await db.commit()
+    await cache_backend.invalidar("tipos_subsidios")
+    if renombrado:
+        await cache_backend.invalidar("nominas")
     await db.refresh(db_tipo_subsidio)
     return db_tipo_subsidio
 
@@ -59,4 +74,46 @@ async def eliminar_tipo_subsidio(tipo_subsidio_id: int, db: AsyncSession = Depen
         raise HTTPException(status_code=404, detail="Tipo de subsidio no encontrado")
     await db.delete(db_tipo_subsidio)
     await db.commit()
-    return {"message": "Tipo de subsidio eliminado", "tipo_subsidio": db_tipo_subsidio}
\ No newline at end of file
+    await cache_backend.invalidar("tipos_subsidios")
+    return {"message": "Tipo de subsidio eliminado", "tipo_subsidio": db_tipo_subsidio}
+
+# Ruta para leer las vigencias de un tipo de subsidio
+@router.get("/{tipo_subsidio_id}/vigencias", response_model=List[schemas.TipoSubsidioVigencia])
+async def leer_vigencias_tipo_subsidio(tipo_subsidio_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(models.TipoSubsidioVigencia)
+        .where(models.TipoSubsidioVigencia.tipo_subsidio_id == tipo_subsidio_id)
+        .order_by(models.TipoSubsidioVigencia.vigente_desde)
+    )
+    return result.scalars().all()
+
+# Ruta para registrar un valor de subsidio desde una fecha; los periodos anteriores conservan el valor previo
+@router.post("/{tipo_subsidio_id}/vigencias", status_code=201, response_model=schemas.TipoSubsidioVigencia)
+async def crear_vigencia_tipo_subsidio(tipo_subsidio_id: int, vigencia: schemas.TipoSubsidioVigenciaCreate, db: AsyncSession = Depends(get_db)):
+    if await db.get(models.TipoSubsidio, tipo_subsidio_id) is None:
+        raise HTTPException(status_code=404, detail="Tipo de subsidio no encontrado")
+    existente = await db.execute(
+        select(models.TipoSubsidioVigencia.id).where(
+            models.TipoSubsidioVigencia.tipo_subsidio_id == tipo_subsidio_id,
+            models.TipoSubsidioVigencia.vigente_desde == vigencia.vigente_desde
+        )
+    )
+    if existente.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=400, detail=f"Ya existe una vigencia desde {vigencia.vigente_desde}")
+    db_vigencia = models.TipoSubsidioVigencia(tipo_subsidio_id=tipo_subsidio_id, **vigencia.model_dump())
+    db.add(db_vigencia)
+    await db.commit()
+    await cache_backend.invalidar("tipos_subsidios")
+    await db.refresh(db_vigencia)
+    return db_vigencia
+
+# Ruta para eliminar una vigencia de un tipo de subsidio
+@router.delete("/{tipo_subsidio_id}/vigencias/{vigencia_id}")
+async def eliminar_vigencia_tipo_subsidio(tipo_subsidio_id: int, vigencia_id: int, db: AsyncSession = Depends(get_db)):
+    db_vigencia = await db.get(models.TipoSubsidioVigencia, vigencia_id)
+    if db_vigencia is None or db_vigencia.tipo_subsidio_id != tipo_subsidio_id:
+        raise HTTPException(status_code=404, detail="Vigencia no encontrada")
+    await db.delete(db_vigencia)
+    await db.commit()
+    await cache_backend.invalidar("tipos_subsidios")
+    return {"message": "Vigencia eliminada", "vigencia": db_vigencia}
\ No newline at end of file
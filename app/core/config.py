@@ -1,11 +1,5 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import MetaData
 from dotenv import dotenv_values
-
-# Configuración de la base de datos
-metadata = MetaData()
-Base = declarative_base()
+import os
 
 # Obtener variables de entorno del archivo .env
 config = dotenv_values("./.env")
@@ -15,34 +9,55 @@ dbname = config.get("DATABASE_NAME")
 port = config.get("DATABASE_PORT")
 host = config.get("DATABASE_HOST")
 
+def _booleano(valor, por_defecto: bool) -> bool:
+    if valor is None or valor == "":
+        return por_defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
 # URL de conexión usando el driver asíncrono de postgresql
 DATABASE_URL = f"postgresql+asyncpg://{username}:{password}@{host}:{port}/{dbname}"
 
-async def db_connect():
-    # Crear conexión a la base de datos
-    engine = create_async_engine(DATABASE_URL, echo=True)
-    async with engine.begin() as conn:
-        return engine, conn
-
-async def create_tables(engine):
-    # Crear tablas usando metadata
-    async with engine.begin() as conn:
-        await conn.run_sync(metadata.drop_all)
-        await conn.run_sync(metadata.create_all)
-
-async def create_tables_orm(engine):
-    # Crear tablas usando ORM
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
-
-def get_session():
-    # Configurar sesión asíncrona
-    engine = create_async_engine(DATABASE_URL)
-    AsyncSessionLocal = AsyncSession(
-        engine, class_=AsyncSession, expire_on_commit=False
-    )
-    return AsyncSessionLocal
-
-# Para usar en main.py
-AsyncSessionLocal = get_session()
\ No newline at end of file
+# Pool de conexiones del motor asíncrono
+DATABASE_POOL_SIZE = int(config.get("DATABASE_POOL_SIZE") or 5)
+DATABASE_MAX_OVERFLOW = int(config.get("DATABASE_MAX_OVERFLOW") or 10)
+# Segundos de espera por una conexión libre antes de fallar
+DATABASE_POOL_TIMEOUT = float(config.get("DATABASE_POOL_TIMEOUT") or 30)
+# Segundos tras los que una conexión se recicla (-1 las conserva indefinidamente)
+DATABASE_POOL_RECYCLE = int(config.get("DATABASE_POOL_RECYCLE") or 1800)
+DATABASE_POOL_PRE_PING = _booleano(config.get("DATABASE_POOL_PRE_PING"), True)
+
+# Sentencias preparadas que asyncpg guarda por conexión
+DATABASE_STATEMENT_CACHE_SIZE = int(config.get("DATABASE_STATEMENT_CACHE_SIZE") or 100)
+# Detrás de PgBouncer en modo transacción las sentencias preparadas no sobreviven entre
+# transacciones, así que se desactivan sus cachés
+DATABASE_PGBOUNCER = _booleano(config.get("DATABASE_PGBOUNCER"), False)
+
+# Tiempo de vida en segundos del caché de catálogos de nómina (0 lo desactiva)
+CATALOGO_CACHE_TTL = float(config.get("CATALOGO_CACHE_TTL") or 300)
+
+# Backend de caché compartido: vacío para la memoria del proceso o redis://host:puerto/db
+CACHE_BACKEND_URL = config.get("CACHE_BACKEND_URL") or ""
+# Procesos de la aplicación; uvicorn y gunicorn leen WEB_CONCURRENCY del entorno como número de workers
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY") or config.get("WEB_CONCURRENCY") or 1)
+# Prefijo de las claves y canales en Redis
+CACHE_PREFIJO = config.get("CACHE_PREFIJO") or "frijolito"
+# Memoria máxima en bytes del caché de respuestas HTTP en memoria del proceso
+RESPUESTAS_CACHE_MAX_BYTES = int(config.get("RESPUESTAS_CACHE_MAX_BYTES") or 16 * 1024 * 1024)
+# Segundos que Redis conserva cada respuesta serializada
+RESPUESTAS_CACHE_TTL = int(config.get("RESPUESTAS_CACHE_TTL") or 3600)
+# Las peticiones cuya sentencia más lenta supere estos milisegundos se registran como advertencia
+SQL_SENTENCIA_LENTA_MS = float(config.get("SQL_SENTENCIA_LENTA_MS") or 200)
+# Escenarios admitidos por petición en POST /nominas/simular
+SIMULACION_MAX_ESCENARIOS = int(config.get("SIMULACION_MAX_ESCENARIOS") or 1000)
+
+# Trabajos de nómina en segundo plano (python -m app.services.trabajos_nomina)
+# Nóminas (lote) o empleados (recalculo) por bloque; cada bloque se confirma en su propia transacción
+TRABAJOS_TAMANO_BLOQUE = int(config.get("TRABAJOS_TAMANO_BLOQUE") or 200)
+# Bloques de un mismo trabajo procesados a la vez; cada uno usa una conexión del pool
+TRABAJOS_CONCURRENCIA = int(config.get("TRABAJOS_CONCURRENCIA") or 4)
+# Segundos entre consultas a la cola cuando no hay trabajos pendientes
+TRABAJOS_INTERVALO = float(config.get("TRABAJOS_INTERVALO") or 2)
+# Segundos sin latido tras los cuales otro proceso retoma un trabajo en proceso
+TRABAJOS_VENCIMIENTO = int(config.get("TRABAJOS_VENCIMIENTO") or 300)
+# Veces que se toma un trabajo antes de darlo por fallido
+TRABAJOS_MAX_INTENTOS = int(config.get("TRABAJOS_MAX_INTENTOS") or 3)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""Instrumentación de las sentencias SQL por petición.
+
+Los eventos del motor suman a los recolectores activos en el contexto actual (una petición HTTP
+o un bloque ``contar_consultas`` en las pruebas): número de sentencias, tiempo en la base de
+datos, la sentencia más lenta y la espera por una conexión del pool.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+from .config import SQL_SENTENCIA_LENTA_MS
+from .metricas import peticiones_duracion, peticiones_total
+
+logger = logging.getLogger(__name__)
+
+# Largo máximo del texto de la sentencia más lenta en los registros
+MAX_LARGO_SENTENCIA = 300
+
+class MetricasConsultas:
+    """Acumula las sentencias ejecutadas mientras el recolector está activo."""
+
+    def __init__(self, guardar_sentencias: bool = False):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.espera_pool = 0.0
+        self.sentencia_lenta = None
+        self.tiempo_sentencia_lenta = 0.0
+        # Solo las pruebas guardan el texto de cada sentencia, para explicar un presupuesto excedido
+        self.sentencias = [] if guardar_sentencias else None
+
+    def registrar(self, sentencia: str, duracion: float):
+        self.consultas += 1
+        self.tiempo_db += duracion
+        if duracion >= self.tiempo_sentencia_lenta:
+            self.sentencia_lenta = sentencia
+            self.tiempo_sentencia_lenta = duracion
+        if self.sentencias is not None:
+            self.sentencias.append(sentencia)
+
+    def server_timing(self, total: float) -> str:
+        """Valor de la cabecera Server-Timing (duraciones en milisegundos)."""
+        return ", ".join([
+            f'db;dur={self.tiempo_db * 1000:.2f};desc="{self.consultas} consultas"',
+            f"db-lenta;dur={self.tiempo_sentencia_lenta * 1000:.2f}",
+            f"pool;dur={self.espera_pool * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+    def como_dict(self) -> dict:
+        sentencia = " ".join((self.sentencia_lenta or "").split())
+        return {
+            "consultas": self.consultas,
+            "tiempo_db_ms": round(self.tiempo_db * 1000, 3),
+            "espera_pool_ms": round(self.espera_pool * 1000, 3),
+            "sentencia_lenta_ms": round(self.tiempo_sentencia_lenta * 1000, 3),
+            "sentencia_lenta": sentencia[:MAX_LARGO_SENTENCIA] or None,
+        }
+
+# Recolectores activos; son varios cuando una prueba mide una petición que a su vez se mide sola
+_recolectores: ContextVar[tuple[MetricasConsultas, ...]] = ContextVar("recolectores_sql", default=())
+
+@contextmanager
+def contar_consultas(guardar_sentencias: bool = False):
+    """Recolecta las sentencias ejecutadas dentro del bloque, en esta tarea y las que cree."""
+    metricas = MetricasConsultas(guardar_sentencias)
+    token = _recolectores.set(_recolectores.get() + (metricas,))
+    try:
+        yield metricas
+    finally:
+        _recolectores.reset(token)
+
+@contextmanager
+def presupuesto_consultas(maximo: int):
+    """Falla con AssertionError si el bloque ejecuta más de ``maximo`` sentencias.
+
+    Uso en pruebas::
+
+        with presupuesto_consultas(5):
+            await cliente.put(f"/nominas/{nomina_id}", json=datos)
+    """
+    with contar_consultas(guardar_sentencias=True) as metricas:
+        yield metricas
+    if metricas.consultas > maximo:
+        detalle = "\n".join(" ".join(sentencia.split())[:MAX_LARGO_SENTENCIA] for sentencia in metricas.sentencias)
+        raise AssertionError(f"Se ejecutaron {metricas.consultas} sentencias con un presupuesto de {maximo}:\n{detalle}")
+
+# Los eventos se registran sobre la clase Engine para medir todos los motores (aplicación, pruebas y benchmarks)
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if _recolectores.get():
+        context._inicio_instrumentacion = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_inicio_instrumentacion", None)
+    if inicio is None:
+        return
+    duracion = time.perf_counter() - inicio
+    for metricas in _recolectores.get():
+        metricas.registrar(statement, duracion)
+
+class PoolInstrumentado(AsyncAdaptedQueuePool):
+    """Pool de la aplicación que suma a las métricas el tiempo que se espera por una conexión.
+
+    La espera incluye abrir una conexión nueva cuando el pool no tiene una libre.
+    """
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = time.perf_counter() - inicio
+            for metricas in _recolectores.get():
+                metricas.espera_pool += espera
+
+def plantilla_ruta(scope) -> str:
+    """Ruta de la petición con los parámetros reemplazados por su nombre (/nominas/{nomina_id}).
+
+    Se arma desde path_params para no depender de cómo cada versión de FastAPI expone la ruta
+    de los routers incluidos; "sin_ruta" cuando ninguna ruta coincidió.
+    """
+    if "endpoint" not in scope:
+        return "sin_ruta"
+    nombres = {str(valor).lower(): nombre for nombre, valor in scope.get("path_params", {}).items()}
+    return "/".join(
+        f"{{{nombres[parte.lower()]}}}" if parte.lower() in nombres else parte
+        for parte in scope["path"].split("/")
+    )
+
+class MiddlewareInstrumentacion:
+    """Middleware ASGI que mide las sentencias de cada petición.
+
+    Añade la cabecera Server-Timing, escribe un registro JSON por petición y alimenta las
+    métricas de latencia por ruta de /metrics. En las respuestas
+    en streaming la cabecera solo cubre lo ejecutado antes de empezar a enviar el cuerpo; el
+    registro cubre la petición completa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = 500
+        with contar_consultas() as metricas:
+            async def enviar(mensaje):
+                nonlocal estado
+                if mensaje["type"] == "http.response.start":
+                    estado = mensaje["status"]
+                    MutableHeaders(scope=mensaje).append("Server-Timing", metricas.server_timing(time.perf_counter() - inicio))
+                await send(mensaje)
+
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                duracion = time.perf_counter() - inicio
+                # Plantilla de la ruta para no crear una serie por cada ID
+                ruta = plantilla_ruta(scope)
+                peticiones_duracion.observar(duracion, scope["method"], ruta)
+                peticiones_total.incrementar(scope["method"], ruta, estado)
+                registro = {
+                    "metodo": scope["method"],
+                    "ruta": scope["path"],
+                    "estado": estado,
+                    "duracion_ms": round(duracion * 1000, 3),
+                    **metricas.como_dict(),
+                }
+                nivel = logging.WARNING if registro["sentencia_lenta_ms"] > SQL_SENTENCIA_LENTA_MS else logging.INFO
+                logger.log(nivel, json.dumps(registro, ensure_ascii=False), extra={"sql": registro})
\ No newline at end of file
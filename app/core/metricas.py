@@ -0,0 +1,149 @@
+"""Métricas de la API y del motor de nómina en el formato de texto de Prometheus.
+
+Contadores e histogramas mínimos, sin dependencias: se actualizan sumando sobre diccionarios
+en el hilo del bucle de eventos, sin candados, y el texto se arma solo cuando se consulta
+``/metrics``. Cada proceso de la API publica sus propias series; Prometheus las agrega.
+"""
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Callable
+
+# Límites de los histogramas en segundos
+CUBETAS_PETICIONES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBETAS_LOTES = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _etiquetas(nombres: tuple[str, ...], valores: tuple, extra: str = "") -> str:
+    partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+class Contador:
+    """Valor que solo crece, con una serie por combinación de etiquetas."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.valores: dict[tuple, float] = {}
+
+    def incrementar(self, *etiquetas, cantidad: float = 1):
+        self.valores[etiquetas] = self.valores.get(etiquetas, 0) + cantidad
+
+    def muestras(self):
+        for etiquetas, valor in self.valores.items():
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}"
+
+class Histograma:
+    """Distribución de duraciones en cubetas fijas; cada observación suma en una sola cubeta."""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple[str, ...] = (), cubetas: tuple[float, ...] = CUBETAS_PETICIONES):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.cubetas = cubetas
+        # Por serie: [conteos por cubeta (no acumulados, el último es +Inf), suma]
+        self.series: dict[tuple, list] = {}
+
+    def observar(self, valor: float, *etiquetas):
+        serie = self.series.get(etiquetas)
+        if serie is None:
+            serie = self.series[etiquetas] = [[0] * (len(self.cubetas) + 1), 0.0]
+        serie[0][bisect_left(self.cubetas, valor)] += 1
+        serie[1] += valor
+
+    def muestras(self):
+        for etiquetas, (conteos, suma) in self.series.items():
+            acumulado = 0
+            for limite, conteo in zip((*self.cubetas, "+Inf"), conteos):
+                acumulado += conteo
+                le = 'le="+Inf"' if limite == "+Inf" else f'le="{_numero(limite)}"'
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(suma)}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {acumulado}"
+
+class Indicador:
+    """Valor instantáneo que se lee al consultar /metrics (p. ej. el estado del pool)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, leer: Callable[[], float]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.leer = leer
+
+    def muestras(self):
+        yield f"{self.nombre} {_numero(self.leer())}"
+
+class Registro:
+    def __init__(self):
+        self.metricas = {}
+
+    def registrar(self, metrica):
+        self.metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exponer(self) -> str:
+        lineas = []
+        for metrica in self.metricas.values():
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.muestras())
+        return "\n".join(lineas) + "\n"
+
+registro = Registro()
+
+peticiones_duracion = registro.registrar(Histograma(
+    "http_peticiones_duracion_segundos", "Duración de las peticiones HTTP por ruta.", ("metodo", "ruta")
+))
+peticiones_total = registro.registrar(Contador(
+    "http_peticiones_total", "Peticiones HTTP atendidas por ruta y código de estado.", ("metodo", "ruta", "estado")
+))
+nominas_calculadas = registro.registrar(Contador(
+    "nomina_calculos_total", "Nóminas calculadas por el motor de nómina; rate() da los cálculos por segundo.", ("origen",)
+))
+catalogo_cache_consultas = registro.registrar(Contador(
+    "catalogo_cache_consultas_total", "Consultas al caché de catálogos de nómina por resultado (acierto o fallo).", ("resultado",)
+))
+respuestas_cache_consultas = registro.registrar(Contador(
+    "respuestas_cache_consultas_total", "Respuestas GET en caché por recurso y resultado (no_modificado, acierto o fallo).",
+    ("recurso", "resultado")
+))
+lotes_duracion = registro.registrar(Histograma(
+    "nomina_lotes_duracion_segundos", "Duración de los trabajos por lotes por operación.", ("operacion",), CUBETAS_LOTES
+))
+
+def cronometrar_lote(operacion: str):
+    """Decorador de corrutinas que registra su duración en nomina_lotes_duracion_segundos."""
+    def decorador(funcion):
+        @wraps(funcion)
+        async def cronometrada(*args, **kwargs):
+            inicio = perf_counter()
+            try:
+                return await funcion(*args, **kwargs)
+            finally:
+                lotes_duracion.observar(perf_counter() - inicio, operacion)
+        return cronometrada
+    return decorador
+
+def registrar_pool(engine):
+    """Publica el estado del pool de conexiones del motor como indicadores."""
+    # El pool se lee en cada consulta porque engine.dispose() lo reemplaza
+    for nombre, ayuda, metodo in (
+        ("db_pool_tamano", "Conexiones permanentes del pool.", "size"),
+        ("db_pool_en_uso", "Conexiones del pool entregadas en este momento.", "checkedout"),
+        ("db_pool_libres", "Conexiones del pool abiertas y disponibles.", "checkedin"),
+        ("db_pool_desborde", "Conexiones abiertas por encima del tamaño del pool (negativo mientras no se llena).", "overflow"),
+    ):
+        registro.registrar(Indicador(nombre, ayuda, lambda metodo=metodo: getattr(engine.sync_engine.pool, metodo)()))
\ No newline at end of file
@@ -1,62 +1,232 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
+from sqlalchemy import select, delete, update, insert, text, bindparam, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.services.payroll import calcular_nomina
+from app.services.payroll_engine import CENTAVO
+from app.services.resumen_nominas import refrescar_resumen
+from app.services.acumulados_nominas import sumar_acumulados, movimiento, TOTALES
+from app.services.cache_backend import cache_backend
+from app.core.metricas import cronometrar_lote
 from .models import ReporteNomina, QuincenaValor, ReporteNominaRecargo, ReporteNominaDescuento, ReporteNominaSubsidio, Empleado
 from .schemas import ReporteNominaCreate, ReporteNominaUpdate
 from fastapi import HTTPException
-from uuid import UUID
+from uuid import UUID, uuid4
+from typing import Optional
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+# A partir de este número de filas una tabla se carga con COPY en lugar de INSERT
+UMBRAL_COPY = 1000
+# Límite de parámetros por sentencia del protocolo de Postgres
+MAX_PARAMETROS = 32767
+
+async def _insertar_filas(db: AsyncSession, modelo, filas: list[dict]):
+    """Inserta las filas de una tabla con INSERT de varias filas o COPY, en la transacción actual."""
+    if not filas:
+        return
+    if len(filas) < UMBRAL_COPY:
+        # INSERT ... VALUES (...), (...) con tantas filas como admita el límite de parámetros
+        tamaño = MAX_PARAMETROS // len(filas[0])
+        for inicio in range(0, len(filas), tamaño):
+            await db.execute(insert(modelo).values(filas[inicio:inicio + tamaño]))
+        return
+
+    # Lotes grandes: protocolo COPY de asyncpg sobre la misma conexión de la sesión
+    columnas = list(filas[0])
+    conexion = await db.connection()
+    conexion_cruda = await conexion.get_raw_connection()
+    await conexion_cruda.driver_connection.copy_records_to_table(
+        modelo.__tablename__,
+        records=[tuple(fila[columna] for columna in columnas) for fila in filas],
+        columns=columnas
+    )
+
+def _filas_detalle(nomina_id: UUID, nomina_data: ReporteNominaCreate):
+    """Filas de quincena_valores, recargos, descuentos y subsidios de una nómina."""
+    quincenas = [{
+        "id": uuid4(),
+        "reporte_nomina_id": nomina_id,
+        "tipo_recargo_id": valor.tipo_recargo_id,
+        "cantidad_dias": valor.cantidad_dias,
+        "valor_quincena": valor.valor_quincena
+    } for valor in nomina_data.quincena_valores]
+    recargos = [
+        {"reporte_nomina_id": nomina_id, "tipo_recargo_id": recargo_id}
+        for recargo_id in nomina_data.recargos or []
+    ]
+    descuentos = [
+        {"reporte_nomina_id": nomina_id, "tipo_descuento_id": descuento_id}
+        for descuento_id in nomina_data.descuentos or []
+    ]
+    subsidios = [
+        {"reporte_nomina_id": nomina_id, "tipo_subsidio_id": subsidio_id}
+        for subsidio_id in nomina_data.subsidios or []
+    ]
+    return quincenas, recargos, descuentos, subsidios
+
+MODELOS_DETALLE = (QuincenaValor, ReporteNominaRecargo, ReporteNominaDescuento, ReporteNominaSubsidio)
 
 async def crear_reporte_nomina(db: AsyncSession, nomina_data: ReporteNominaCreate):
-    """Guarda en la base de datos una nómina ya calculada."""
+    """Guarda en la base de datos una nómina ya calculada.
+
+    Usa un número fijo de sentencias sin importar cuántas líneas tenga la nómina: el reporte
+    con RETURNING, una inserción por colección hija, el resumen del listado y los acumulados.
+    """
     try:
-        nueva_nomina = ReporteNomina(
-            empleado_id=nomina_data.empleado_id,
-            fecha_inicio=nomina_data.fecha_inicio,
-            fecha_fin=nomina_data.fecha_fin,
-            total_pagado=nomina_data.total_pagado  # Ya calculado
+        result = await db.execute(
+            insert(ReporteNomina)
+            .values(
+                empleado_id=nomina_data.empleado_id,
+                fecha_inicio=nomina_data.fecha_inicio,
+                fecha_fin=nomina_data.fecha_fin,
+                # Ya calculados
+                total_pagado=nomina_data.total_pagado,
+                total_devengado=nomina_data.total_devengado,
+                total_subsidios=nomina_data.total_subsidios,
+                total_descuentos=nomina_data.total_descuentos
+            )
+            .returning(ReporteNomina)
         )
-
-        db.add(nueva_nomina)
-        await db.flush()  # Asegurar que tiene ID antes de relacionar otros datos
+        nueva_nomina = result.scalar_one()
 
         # Guardar detalles de quincena, recargos, descuentos y subsidios
-        for valor in nomina_data.quincena_valores:
-            db.add(QuincenaValor(
-                reporte_nomina_id=nueva_nomina.id,
-                tipo_recargo_id=valor.tipo_recargo_id,
-                cantidad_dias=valor.cantidad_dias,
-                valor_quincena=valor.valor_quincena
-            ))
-
-        for recargo_id in nomina_data.recargos:
-            db.add(ReporteNominaRecargo(
-                reporte_nomina_id=nueva_nomina.id,
-                tipo_recargo_id=recargo_id
-            ))
-
-        for descuento_id in nomina_data.descuentos:
-            db.add(ReporteNominaDescuento(
-                reporte_nomina_id=nueva_nomina.id,
-                tipo_descuento_id=descuento_id
-            ))
-
-        for subsidio_id in nomina_data.subsidios:
-            db.add(ReporteNominaSubsidio(
-                reporte_nomina_id=nueva_nomina.id,
-                tipo_subsidio_id=subsidio_id
-            ))
+        for modelo, filas in zip(MODELOS_DETALLE, _filas_detalle(nueva_nomina.id, nomina_data)):
+            await _insertar_filas(db, modelo, filas)
+
+        # El resumen del listado y los acumulados del año se escriben en la misma transacción
+        await refrescar_resumen(db, [nueva_nomina.id])
+        await sumar_acumulados(db, [movimiento(nueva_nomina)])
 
+        # RETURNING ya trajo el reporte completo, no hace falta refrescarlo
         await db.commit()
-        await db.refresh(nueva_nomina)
+        await cache_backend.invalidar("nominas")
         return nueva_nomina
 
     except Exception as e:
         await db.rollback()
         raise e
 
+@cronometrar_lote("crear_reportes_nomina_lote")
+async def crear_reportes_nomina_lote(db: AsyncSession, nominas: list[ReporteNominaCreate]):
+    """Guarda un lote de nóminas ya calculadas con inserciones masivas en una sola transacción."""
+    try:
+        reportes, quincenas, recargos, descuentos, subsidios = [], [], [], [], []
+
+        for nomina_data in nominas:
+            # Los IDs se generan aquí para poder relacionar los detalles sin consultar la base de datos
+            nomina_id = uuid4()
+            reportes.append({
+                "id": nomina_id,
+                "empleado_id": nomina_data.empleado_id,
+                "fecha_inicio": nomina_data.fecha_inicio,
+                "fecha_fin": nomina_data.fecha_fin,
+                **{campo: getattr(nomina_data, campo) for campo in TOTALES}
+            })
+            for filas, nuevas in zip(
+                (quincenas, recargos, descuentos, subsidios), _filas_detalle(nomina_id, nomina_data)
+            ):
+                filas.extend(nuevas)
+
+        # Una inserción masiva por tabla
+        for modelo, filas in (
+            (ReporteNomina, reportes),
+            (QuincenaValor, quincenas),
+            (ReporteNominaRecargo, recargos),
+            (ReporteNominaDescuento, descuentos),
+            (ReporteNominaSubsidio, subsidios),
+        ):
+            await _insertar_filas(db, modelo, filas)
+
+        await refrescar_resumen(db, [reporte["id"] for reporte in reportes])
+        await sumar_acumulados(db, [movimiento(reporte) for reporte in reportes])
+
+        await db.commit()
+        await cache_backend.invalidar("nominas")
+        return reportes
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+# Sentencias de sincronización de cada colección hija, como CTE con RETURNING para contar filas.
+# Los UPSERT solo escriben si algo cambió y los DELETE quitan lo que ya no viene en la petición.
+_CTE_QUINCENA = """
+    qv_borradas AS (
+        DELETE FROM quincena_valores
+        WHERE reporte_nomina_id = :nomina_id AND tipo_recargo_id <> ALL(:qv_recargos)
+        RETURNING 1
+    ),
+    qv_escritas AS (
+        INSERT INTO quincena_valores (id, reporte_nomina_id, tipo_recargo_id, cantidad_dias, valor_quincena)
+        SELECT gen_random_uuid(), :nomina_id, n.tipo_recargo_id, n.cantidad_dias, n.valor_quincena
+        FROM unnest(:qv_recargos, :qv_dias, :qv_valores) AS n(tipo_recargo_id, cantidad_dias, valor_quincena)
+        ON CONFLICT (reporte_nomina_id, tipo_recargo_id) DO UPDATE
+        SET cantidad_dias = EXCLUDED.cantidad_dias, valor_quincena = EXCLUDED.valor_quincena
+        WHERE (quincena_valores.cantidad_dias, quincena_valores.valor_quincena)
+            IS DISTINCT FROM (EXCLUDED.cantidad_dias, EXCLUDED.valor_quincena)
+        RETURNING 1
+    )"""
+
+def _cte_asociacion(prefijo: str, tabla: str, columna: str) -> str:
+    return f"""
+    {prefijo}_borradas AS (
+        DELETE FROM {tabla}
+        WHERE reporte_nomina_id = :nomina_id AND {columna} <> ALL(:{prefijo}_ids)
+        RETURNING 1
+    ),
+    {prefijo}_escritas AS (
+        INSERT INTO {tabla} (reporte_nomina_id, {columna})
+        SELECT :nomina_id, unnest(:{prefijo}_ids)
+        ON CONFLICT (reporte_nomina_id, {columna}) DO NOTHING
+        RETURNING 1
+    )"""
+
+# (atributo de la petición, prefijo de la CTE, tabla, columna del catálogo)
+ASOCIACIONES_DETALLE = (
+    ("recargos", "rec", "reportes_nominas_recargos", "tipo_recargo_id"),
+    ("descuentos", "des", "reportes_nominas_descuentos", "tipo_descuento_id"),
+    ("subsidios", "sub", "reportes_nominas_subsidios", "tipo_subsidio_id"),
+)
+
+async def _sincronizar_detalles(db: AsyncSession, nomina_id: UUID, nomina_data: ReporteNominaUpdate) -> bool:
+    """Deja las colecciones hijas enviadas igual a la petición en una sola sentencia.
+
+    Las colecciones que no vienen en la petición no se tocan. Devuelve si alguna fila cambió.
+    """
+    ctes, prefijos = [], []
+    parametros = [bindparam("nomina_id", nomina_id, type_=PG_UUID(as_uuid=True))]
+
+    if nomina_data.quincena_valores is not None:
+        # El esquema rechaza los recargos repetidos; el diccionario solo los indexa
+        quincena = {qv.tipo_recargo_id: qv for qv in nomina_data.quincena_valores}
+        ctes.append(_CTE_QUINCENA)
+        prefijos.append("qv")
+        parametros += [
+            bindparam("qv_recargos", list(quincena), type_=ARRAY(Integer)),
+            bindparam("qv_dias", [qv.cantidad_dias for qv in quincena.values()], type_=ARRAY(Integer)),
+            bindparam("qv_valores", [qv.valor_quincena for qv in quincena.values()], type_=ARRAY(Numeric(10, 2))),
+        ]
+
+    for atributo, prefijo, tabla, columna in ASOCIACIONES_DETALLE:
+        ids = getattr(nomina_data, atributo)
+        if ids is None:
+            continue
+        ctes.append(_cte_asociacion(prefijo, tabla, columna))
+        prefijos.append(prefijo)
+        parametros.append(bindparam(f"{prefijo}_ids", sorted(set(ids)), type_=ARRAY(Integer)))
+
+    if not ctes:
+        return False
+
+    conteo = " + ".join(
+        f"(SELECT count(*) FROM {prefijo}_{accion})" for prefijo in prefijos for accion in ("borradas", "escritas")
+    )
+    consulta = text(f"WITH {','.join(ctes)}\nSELECT {conteo}").bindparams(*parametros)
+    return (await db.execute(consulta)).scalar() > 0
+
 async def actualizar_reporte_nomina(db: AsyncSession, nomina_id: UUID, nomina_data: ReporteNominaUpdate):
     """Actualiza un reporte de nómina y sus registros relacionados en una transacción de forma asíncrona."""
     try:
@@ -80,141 +250,46 @@ async def actualizar_reporte_nomina(db: AsyncSession, nomina_id: UUID, nomina_da
         if recalcular:
             nomina_data = await calcular_nomina(db, nomina_data)
 
-        # Actualizar solo los campos que han cambiado
-        cambios = False
-
-        if nomina_data.empleado_id is not None and db_nomina.empleado_id != nomina_data.empleado_id:
-            db_nomina.empleado_id = nomina_data.empleado_id
-            cambios = True
-        if nomina_data.fecha_inicio is not None and db_nomina.fecha_inicio != nomina_data.fecha_inicio:
-            db_nomina.fecha_inicio = nomina_data.fecha_inicio
-            cambios = True
-        if nomina_data.fecha_fin is not None and db_nomina.fecha_fin != nomina_data.fecha_fin:
-            db_nomina.fecha_fin = nomina_data.fecha_fin
-            cambios = True
-        if nomina_data.total_pagado is not None and db_nomina.total_pagado != nomina_data.total_pagado:
-            db_nomina.total_pagado = nomina_data.total_pagado
-            cambios = True
-
-        # Optimizar actualización de quincena_valores
-        if nomina_data.quincena_valores is not None:
-            result = await db.execute(select(QuincenaValor).where(QuincenaValor.reporte_nomina_id == nomina_id))
-            quincena_existente = {qv.tipo_recargo_id: qv for qv in result.scalars().all()}
-            quincena_nueva = {qv.tipo_recargo_id: qv for qv in nomina_data.quincena_valores}
-
-            # Identificar cambios
-            actualizar, agregar = [], []
-            for tipo_recargo_id, qv in quincena_nueva.items():
-                if tipo_recargo_id in quincena_existente:
-                    if (
-                        quincena_existente[tipo_recargo_id].cantidad_dias != qv.cantidad_dias or
-                        quincena_existente[tipo_recargo_id].valor_quincena != qv.valor_quincena
-                    ):
-                        # Actualizar individualmente cada registro
-                        await db.execute(
-                            update(QuincenaValor)
-                            .where(
-                                QuincenaValor.reporte_nomina_id == nomina_id,
-                                QuincenaValor.tipo_recargo_id == tipo_recargo_id
-                            )
-                            .values(
-                                cantidad_dias=qv.cantidad_dias,
-                                valor_quincena=qv.valor_quincena
-                            )
-                        )
-                        cambios = True
-                else:
-                    agregar.append(QuincenaValor(
-                        reporte_nomina_id=nomina_id,
-                        tipo_recargo_id=qv.tipo_recargo_id,
-                        cantidad_dias=qv.cantidad_dias,
-                        valor_quincena=qv.valor_quincena
-                    ))
-
-            # Agregar nuevos registros
-            if agregar:
-                db.add_all(agregar)
-                cambios = True
-
-        # Optimizar actualización de recargos
-        if nomina_data.recargos is not None:
-            result = await db.execute(select(ReporteNominaRecargo).where(ReporteNominaRecargo.reporte_nomina_id == nomina_id))
-            recargos_existentes = {r.tipo_recargo_id for r in result.scalars().all()}
-            recargos_nuevos = set(nomina_data.recargos)
-
-            agregar = recargos_nuevos - recargos_existentes
-            eliminar = recargos_existentes - recargos_nuevos
-
-            if eliminar:
-                await db.execute(
-                    delete(ReporteNominaRecargo).where(
-                        ReporteNominaRecargo.reporte_nomina_id == nomina_id,
-                        ReporteNominaRecargo.tipo_recargo_id.in_(eliminar)
-                    )
-                )
-                cambios = True
-
-            if agregar:
-                db.add_all([
-                    ReporteNominaRecargo(reporte_nomina_id=nomina_id, tipo_recargo_id=recargo_id)
-                    for recargo_id in agregar
-                ])
-                cambios = True
-
-        # Optimizar actualización de descuentos
-        if nomina_data.descuentos is not None:
-            result = await db.execute(select(ReporteNominaDescuento).where(ReporteNominaDescuento.reporte_nomina_id == nomina_id))
-            descuentos_existentes = {d.tipo_descuento_id for d in result.scalars().all()}
-            descuentos_nuevos = set(nomina_data.descuentos)
-
-            agregar = descuentos_nuevos - descuentos_existentes
-            eliminar = descuentos_existentes - descuentos_nuevos
-
-            if eliminar:
-                await db.execute(
-                    delete(ReporteNominaDescuento).where(
-                        ReporteNominaDescuento.reporte_nomina_id == nomina_id,
-                        ReporteNominaDescuento.tipo_descuento_id.in_(eliminar)
-                    )
-                )
-                cambios = True
-
-            if agregar:
-                db.add_all([
-                    ReporteNominaDescuento(reporte_nomina_id=nomina_id, tipo_descuento_id=desc_id)
-                    for desc_id in agregar
-                ])
-                cambios = True
-
-        # Optimizar actualización de subsidios
-        if nomina_data.subsidios is not None:
-            result = await db.execute(select(ReporteNominaSubsidio).where(ReporteNominaSubsidio.reporte_nomina_id == nomina_id))
-            subsidios_existentes = {s.tipo_subsidio_id for s in result.scalars().all()}
-            subsidios_nuevos = set(nomina_data.subsidios)
-
-            agregar = subsidios_nuevos - subsidios_existentes
-            eliminar = subsidios_existentes - subsidios_nuevos
-
-            if eliminar:
-                await db.execute(
-                    delete(ReporteNominaSubsidio).where(
-                        ReporteNominaSubsidio.reporte_nomina_id == nomina_id,
-                        ReporteNominaSubsidio.tipo_subsidio_id.in_(eliminar)
-                    )
+        # Actualizar solo los campos que han cambiado; los totales se comparan con la escala de la columna
+        nuevos = {
+            "empleado_id": nomina_data.empleado_id,
+            "fecha_inicio": nomina_data.fecha_inicio,
+            "fecha_fin": nomina_data.fecha_fin,
+            **{
+                campo: (
+                    getattr(nomina_data, campo).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+                    if getattr(nomina_data, campo) is not None else None
                 )
-                cambios = True
-
-            if agregar:
-                db.add_all([
-                    ReporteNominaSubsidio(reporte_nomina_id=nomina_id, tipo_subsidio_id=sub_id)
-                    for sub_id in agregar
-                ])
-                cambios = True
-
-        # Si hubo cambios, commit y refrescar
+                for campo in TOTALES
+            },
+        }
+        valores = {
+            campo: valor for campo, valor in nuevos.items()
+            if valor is not None and getattr(db_nomina, campo) != valor
+        }
+        cambios = bool(valores)
+        if valores:
+            # El aporte anterior se toma antes de que RETURNING reemplace los valores del reporte
+            movimientos = [movimiento(db_nomina, -1)]
+            # RETURNING deja en el reporte los valores tal como quedaron guardados (p. ej. redondeados)
+            result = await db.execute(
+                update(ReporteNomina)
+                .where(ReporteNomina.id == nomina_id)
+                .values(**valores)
+                .returning(ReporteNomina)
+                .execution_options(populate_existing=True)
+            )
+            db_nomina = result.scalar_one()
+            await sumar_acumulados(db, movimientos + [movimiento(db_nomina)])
+
+        # Colecciones hijas: un solo comando con todas las diferencias
+        cambios = await _sincronizar_detalles(db, nomina_id, nomina_data) or cambios
+
+        # Si hubo cambios, actualizar el resumen y commit; el reporte ya tiene sus valores nuevos
         if cambios:
+            await refrescar_resumen(db, [nomina_id])
             await db.commit()
-            await db.refresh(db_nomina)
+            await cache_backend.invalidar("nominas")
 
         return db_nomina
 
@@ -224,28 +299,65 @@ async def actualizar_reporte_nomina(db: AsyncSession, nomina_id: UUID, nomina_da
 
         
 async def eliminar_reporte_nomina(db: AsyncSession, nomina_id: UUID):
-    """Elimina un reporte de nómina y sus registros relacionados en una transacción de forma asíncrona."""
+    """Elimina un reporte de nómina; los detalles y el resumen se borran en cascada y se descuenta de los acumulados."""
     try:
-        # Obtener la nómina existente
         result = await db.execute(
-            select(ReporteNomina).where(ReporteNomina.id == nomina_id)
+            delete(ReporteNomina).where(ReporteNomina.id == nomina_id).returning(ReporteNomina)
         )
         db_nomina = result.scalar_one_or_none()
         if not db_nomina:
             raise HTTPException(status_code=404, detail="Nómina no encontrada")
+        await sumar_acumulados(db, [movimiento(db_nomina, -1)])
 
-        # Eliminar registros relacionados
-        await db.execute(delete(QuincenaValor).where(QuincenaValor.reporte_nomina_id == nomina_id))
-        await db.execute(delete(ReporteNominaRecargo).where(ReporteNominaRecargo.reporte_nomina_id == nomina_id))
-        await db.execute(delete(ReporteNominaDescuento).where(ReporteNominaDescuento.reporte_nomina_id == nomina_id))
-        await db.execute(delete(ReporteNominaSubsidio).where(ReporteNominaSubsidio.reporte_nomina_id == nomina_id))
-
-        # Eliminar la nómina
-        await db.delete(db_nomina)
         await db.commit()
+        await cache_backend.invalidar("nominas")
 
         return {"mensaje": "Nómina eliminada exitosamente", "nomina": db_nomina}
 
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def eliminar_reportes_nomina(
+    db: AsyncSession,
+    ids: Optional[list[UUID]] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    empleado_id: Optional[UUID] = None,
+):
+    """Elimina en una sola sentencia los reportes indicados por ID o por rango de fechas de inicio
+    y los descuenta de los acumulados.
+
+    Sirve para deshacer una corrida de nómina errónea. Exige IDs o un rango de fechas para
+    no vaciar la tabla por accidente.
+    """
+    if not ids and fecha_desde is None and fecha_hasta is None:
+        raise HTTPException(status_code=400, detail="Indique los IDs o un rango de fechas a eliminar")
+    try:
+        condiciones = []
+        if ids:
+            condiciones.append(ReporteNomina.id.in_(ids))
+        if fecha_desde is not None:
+            condiciones.append(ReporteNomina.fecha_inicio >= fecha_desde)
+        if fecha_hasta is not None:
+            condiciones.append(ReporteNomina.fecha_inicio <= fecha_hasta)
+        if empleado_id is not None:
+            condiciones.append(ReporteNomina.empleado_id == empleado_id)
+
+        result = await db.execute(
+            delete(ReporteNomina).where(*condiciones).returning(
+                ReporteNomina.id, ReporteNomina.empleado_id, ReporteNomina.fecha_inicio,
+                *(getattr(ReporteNomina, campo) for campo in TOTALES)
+            )
+        )
+        filas = result.all()
+        await sumar_acumulados(db, [movimiento(fila, -1) for fila in filas])
+        eliminados = [fila.id for fila in filas]
+        await db.commit()
+        await cache_backend.invalidar("nominas")
+
+        return {"mensaje": "Nóminas eliminadas exitosamente", "eliminadas": len(eliminados), "ids": eliminados}
+
     except Exception as e:
         await db.rollback()
         raise e
\ No newline at end of file
@@ -1,9 +1,47 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from ..core.config import DATABASE_URL
+from uuid import uuid4
+from ..core.config import (
+    DATABASE_URL, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_TIMEOUT,
+    DATABASE_POOL_RECYCLE, DATABASE_POOL_PRE_PING, DATABASE_STATEMENT_CACHE_SIZE, DATABASE_PGBOUNCER
+)
+from ..core.instrumentacion import PoolInstrumentado
+
+def opciones_motor(
+    pool_size: int = DATABASE_POOL_SIZE,
+    max_overflow: int = DATABASE_MAX_OVERFLOW,
+    pool_timeout: float = DATABASE_POOL_TIMEOUT,
+    pool_recycle: int = DATABASE_POOL_RECYCLE,
+    pool_pre_ping: bool = DATABASE_POOL_PRE_PING,
+    statement_cache_size: int = DATABASE_STATEMENT_CACHE_SIZE,
+    pgbouncer: bool = DATABASE_PGBOUNCER,
+) -> dict:
+    """Argumentos de create_async_engine según la configuración del pool y de asyncpg."""
+    if pgbouncer:
+        # PgBouncer puede entregar cada transacción a una conexión distinta del servidor:
+        # sin cachés de sentencias y con nombres únicos para no chocar con las de otro cliente
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    else:
+        connect_args = {
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        }
+    return {
+        "poolclass": PoolInstrumentado,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pool_pre_ping,
+        "connect_args": connect_args,
+    }
 
-# Crea el motor de base de datos
-engine = create_async_engine(DATABASE_URL)
+# Crea el único motor de base de datos de la aplicación
+engine = create_async_engine(DATABASE_URL, **opciones_motor())
 
 # Crea una sesión asíncrona
 AsyncSessionLocal = sessionmaker(
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, ForeignKey, Index, UniqueConstraint, func, text
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from datetime import date
 import uuid
 
 Base = declarative_base()
 
+def _inicio_del_año(contexto):
+    # Sin fecha explícita, la configuración rige desde el 1 de enero de su año
+    return date(int(contexto.get_current_parameters()['año']), 1, 1)
+
 # Modelo de empleados
 class Empleado(Base):
     __tablename__ = 'empleados'
@@ -17,6 +22,13 @@ class Empleado(Base):
     puesto_trabajo = Column(String)
     salario_base = Column(Numeric(10, 2), nullable=False)
 
+    # La búsqueda por nombre usa además un índice GIN de trigramas sobre
+    # (nombres || ' ' || apellidos), creado en la migración solo si pg_trgm está disponible
+    __table_args__ = (
+        Index('ix_empleados_apellidos_nombres_id', 'apellidos', 'nombres', 'id'),  # Paginación por cursor
+        Index('ix_empleados_cedula_patron', 'cedula', postgresql_ops={'cedula': 'text_pattern_ops'}),  # Prefijo de cédula
+    )
+
     reporte_nominas = relationship("ReporteNomina", back_populates="empleado")
 
 # Modelo de configuración de salario
@@ -30,6 +42,8 @@ class ConfigSalario(Base):
     horas_mes = Column(Integer, nullable=False)
     valor_hora = Column(Numeric(10, 2), nullable=False)
     horas_salario = Column(Numeric(10, 2), nullable=False)
+    # Rige hasta el día anterior al vigente_desde de la siguiente configuración
+    vigente_desde = Column(Date, unique=True, nullable=False, default=_inicio_del_año)
 
 # Modelo de tipo de recargos
 class TipoRecargo(Base):
@@ -43,6 +57,23 @@ class TipoRecargo(Base):
 
     quincena_valores = relationship("QuincenaValor", back_populates="tipo_recargo")
     reporte_nomina_recargos = relationship("ReporteNominaRecargo", back_populates="tipo_recargo")
+    vigencias = relationship("TipoRecargoVigencia", back_populates="tipo_recargo", cascade="all, delete-orphan", passive_deletes=True)
+
+# Tarifas de un recargo a partir de una fecha; antes de la primera rige la del tipo de recargo
+class TipoRecargoVigencia(Base):
+    __tablename__ = 'tipos_recargos_vigencias'
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo_recargo_id = Column(Integer, ForeignKey('tipos_recargos.id', ondelete='CASCADE'), nullable=False)
+    vigente_desde = Column(Date, nullable=False)
+    porcentaje = Column(Numeric(10, 2), nullable=False)
+    valor_hora = Column(Numeric(10, 2), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('tipo_recargo_id', 'vigente_desde', name='uq_tipos_recargos_vigencias_tipo_fecha'),
+    )
+
+    tipo_recargo = relationship("TipoRecargo", back_populates="vigencias")
 
 # Modelo de subsidios
 class TipoSubsidio(Base):
@@ -53,6 +84,22 @@ class TipoSubsidio(Base):
     valor = Column(Numeric(10, 2), nullable=False)
 
     reporte_nomina_subsidios = relationship("ReporteNominaSubsidio", back_populates="tipo_subsidio")
+    vigencias = relationship("TipoSubsidioVigencia", back_populates="tipo_subsidio", cascade="all, delete-orphan", passive_deletes=True)
+
+# Valor de un subsidio a partir de una fecha; antes del primero rige el del tipo de subsidio
+class TipoSubsidioVigencia(Base):
+    __tablename__ = 'tipos_subsidios_vigencias'
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo_subsidio_id = Column(Integer, ForeignKey('tipos_subsidios.id', ondelete='CASCADE'), nullable=False)
+    vigente_desde = Column(Date, nullable=False)
+    valor = Column(Numeric(10, 2), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('tipo_subsidio_id', 'vigente_desde', name='uq_tipos_subsidios_vigencias_tipo_fecha'),
+    )
+
+    tipo_subsidio = relationship("TipoSubsidio", back_populates="vigencias")
 
 # Modelo de descuentos
 class TipoDescuento(Base):
@@ -63,6 +110,22 @@ class TipoDescuento(Base):
     valor = Column(Numeric(10, 2), nullable=False)
 
     reporte_nomina_descuentos = relationship("ReporteNominaDescuento", back_populates="tipo_descuento")
+    vigencias = relationship("TipoDescuentoVigencia", back_populates="tipo_descuento", cascade="all, delete-orphan", passive_deletes=True)
+
+# Porcentaje de un descuento a partir de una fecha; antes del primero rige el del tipo de descuento
+class TipoDescuentoVigencia(Base):
+    __tablename__ = 'tipos_descuentos_vigencias'
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo_descuento_id = Column(Integer, ForeignKey('tipos_descuentos.id', ondelete='CASCADE'), nullable=False)
+    vigente_desde = Column(Date, nullable=False)
+    valor = Column(Numeric(10, 2), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('tipo_descuento_id', 'vigente_desde', name='uq_tipos_descuentos_vigencias_tipo_fecha'),
+    )
+
+    tipo_descuento = relationship("TipoDescuento", back_populates="vigencias")
 
 # Modelo de Nomina
 class ReporteNomina(Base):
@@ -73,23 +136,37 @@ class ReporteNomina(Base):
     fecha_inicio = Column(Date, nullable=False)
     fecha_fin = Column(Date, nullable=False)
     total_pagado = Column(Numeric(10, 2), nullable=False)
+    # Totales del cálculo; devengado incluye subsidios y total_pagado = devengado - descuentos
+    total_devengado = Column(Numeric(10, 2), nullable=False, server_default='0')
+    total_subsidios = Column(Numeric(10, 2), nullable=False, server_default='0')
+    total_descuentos = Column(Numeric(10, 2), nullable=False, server_default='0')
+
+    __table_args__ = (
+        Index('ix_reportes_nominas_empleado_id_fecha_inicio', 'empleado_id', 'fecha_inicio'),
+        Index('ix_reportes_nominas_fecha_inicio_id', 'fecha_inicio', 'id'),  # Paginación por cursor
+    )
 
     empleado = relationship("Empleado", back_populates="reporte_nominas")
-    quincena_valores = relationship("QuincenaValor", back_populates="reporte_nomina")
-    reporte_nomina_recargos = relationship("ReporteNominaRecargo", back_populates="reporte_nomina")
-    reporte_nomina_descuentos = relationship("ReporteNominaDescuento", back_populates="reporte_nomina")
-    reporte_nomina_subsidios = relationship("ReporteNominaSubsidio", back_populates="reporte_nomina")
+    # La base de datos borra los detalles en cascada; el ORM no los carga para borrarlos
+    quincena_valores = relationship("QuincenaValor", back_populates="reporte_nomina", cascade="all, delete-orphan", passive_deletes=True)
+    reporte_nomina_recargos = relationship("ReporteNominaRecargo", back_populates="reporte_nomina", cascade="all, delete-orphan", passive_deletes=True)
+    reporte_nomina_descuentos = relationship("ReporteNominaDescuento", back_populates="reporte_nomina", cascade="all, delete-orphan", passive_deletes=True)
+    reporte_nomina_subsidios = relationship("ReporteNominaSubsidio", back_populates="reporte_nomina", cascade="all, delete-orphan", passive_deletes=True)
 
 # Modelo de quincena valores
 class QuincenaValor(Base):
     __tablename__ = 'quincena_valores'
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id'), nullable=False)
+    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id', ondelete='CASCADE'), nullable=False)
     tipo_recargo_id = Column(Integer, ForeignKey('tipos_recargos.id'), nullable=False)
     cantidad_dias = Column(Integer, nullable=False)
     valor_quincena = Column(Numeric(10, 2), nullable=False)
 
+    __table_args__ = (
+        UniqueConstraint('reporte_nomina_id', 'tipo_recargo_id', name='uq_quincena_valores_reporte_recargo'),
+    )
+
     reporte_nomina = relationship("ReporteNomina", back_populates="quincena_valores")
     tipo_recargo = relationship("TipoRecargo", back_populates="quincena_valores")
 
@@ -98,8 +175,12 @@ class ReporteNominaRecargo(Base):
     __tablename__ = 'reportes_nominas_recargos'
 
     id = Column(Integer, primary_key=True, index=True)
-    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id'), nullable=False)
+    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id', ondelete='CASCADE'), nullable=False)
     tipo_recargo_id = Column(Integer, ForeignKey('tipos_recargos.id'), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('reporte_nomina_id', 'tipo_recargo_id', name='uq_reportes_nominas_recargos_reporte_recargo'),
+    )
     
     reporte_nomina = relationship("ReporteNomina", back_populates="reporte_nomina_recargos")
     tipo_recargo = relationship("TipoRecargo", back_populates="reporte_nomina_recargos")
@@ -109,9 +190,13 @@ class ReporteNominaDescuento(Base):
     __tablename__ = 'reportes_nominas_descuentos'
 
     id = Column(Integer , primary_key=True, index=True)
-    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id'), nullable=False)
+    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id', ondelete='CASCADE'), nullable=False)
     tipo_descuento_id = Column(Integer, ForeignKey('tipos_descuentos.id'), nullable=False)
 
+    __table_args__ = (
+        UniqueConstraint('reporte_nomina_id', 'tipo_descuento_id', name='uq_reportes_nominas_descuentos_reporte_descuento'),
+    )
+
     reporte_nomina = relationship("ReporteNomina", back_populates="reporte_nomina_descuentos")
     tipo_descuento = relationship("TipoDescuento", back_populates="reporte_nomina_descuentos")
 
@@ -120,8 +205,86 @@ class ReporteNominaSubsidio(Base):
     __tablename__ = 'reportes_nominas_subsidios'
 
     id = Column(Integer, primary_key=True, index=True)
-    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id'), nullable=False)
+    reporte_nomina_id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id', ondelete='CASCADE'), nullable=False)
     tipo_subsidio_id = Column(Integer, ForeignKey('tipos_subsidios.id'), nullable=False)
 
+    __table_args__ = (
+        UniqueConstraint('reporte_nomina_id', 'tipo_subsidio_id', name='uq_reportes_nominas_subsidios_reporte_subsidio'),
+    )
+
     reporte_nomina = relationship("ReporteNomina", back_populates="reporte_nomina_subsidios")
-    tipo_subsidio = relationship("TipoSubsidio", back_populates="reporte_nomina_subsidios")
\ No newline at end of file
+    tipo_subsidio = relationship("TipoSubsidio", back_populates="reporte_nomina_subsidios")
+
+# Modelo de lectura desnormalizado para el listado de nóminas
+class ReporteNominaResumen(Base):
+    __tablename__ = 'reportes_nominas_resumen'
+
+    id = Column(UUID(as_uuid=True), ForeignKey('reportes_nominas.id', ondelete='CASCADE'), primary_key=True)
+    empleado_id = Column(UUID(as_uuid=True), nullable=False)
+    cedula = Column(String, nullable=False)
+    nombres = Column(String, nullable=False)
+    apellidos = Column(String, nullable=False)
+    telefono = Column(String)
+    puesto_trabajo = Column(String)
+    fecha_inicio = Column(Date, nullable=False)
+    fecha_fin = Column(Date, nullable=False)
+    descuentos_aplicados = Column(String, nullable=False)
+    subsidios_aplicados = Column(String, nullable=False)
+    recargos_y_valores = Column(String, nullable=False)
+    total_pagado = Column(Numeric(10, 2), nullable=False)
+
+    __table_args__ = (
+        Index('ix_reportes_nominas_resumen_fecha_inicio_id', 'fecha_inicio', 'id'),
+        Index('ix_reportes_nominas_resumen_empleado_id_fecha_inicio', 'empleado_id', 'fecha_inicio'),
+    )
+
+# Acumulados del año por empleado (año de fecha_inicio); las rutas de escritura de nóminas
+# suman y restan sus diferencias en la misma transacción, así nunca se recorre el histórico
+class NominaAcumuladoAnual(Base):
+    __tablename__ = 'nominas_acumulados_anuales'
+
+    empleado_id = Column(UUID(as_uuid=True), ForeignKey('empleados.id', ondelete='CASCADE'), primary_key=True)
+    año = Column(Integer, primary_key=True)
+    reportes = Column(Integer, nullable=False)
+    total_devengado = Column(Numeric(14, 2), nullable=False)
+    total_subsidios = Column(Numeric(14, 2), nullable=False)
+    total_descuentos = Column(Numeric(14, 2), nullable=False)
+    total_pagado = Column(Numeric(14, 2), nullable=False)
+
+# Cola de trabajos de nómina en segundo plano; los procesos trabajadores la leen con SKIP LOCKED
+class TrabajoNomina(Base):
+    __tablename__ = 'trabajos_nominas'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tipo = Column(String, nullable=False)
+    estado = Column(String, nullable=False, server_default='pendiente')
+    parametros = Column(JSONB, nullable=False)
+    total = Column(Integer)
+    error = Column(String)
+    intentos = Column(Integer, nullable=False, server_default='0')
+    trabajador = Column(String)
+    creado_en = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    iniciado_en = Column(DateTime(timezone=True))
+    terminado_en = Column(DateTime(timezone=True))
+    latido_en = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index('ix_trabajos_nominas_pendientes', 'creado_en', postgresql_where=text("estado IN ('pendiente', 'en_proceso')")),
+    )
+
+    bloques = relationship("TrabajoNominaBloque", back_populates="trabajo", cascade="all, delete-orphan", passive_deletes=True)
+
+# Resultado de cada bloque terminado; se guarda en la misma transacción que las escrituras del
+# bloque, así un trabajo retomado no repite lo que ya se confirmó
+class TrabajoNominaBloque(Base):
+    __tablename__ = 'trabajos_nominas_bloques'
+
+    trabajo_id = Column(UUID(as_uuid=True), ForeignKey('trabajos_nominas.id', ondelete='CASCADE'), primary_key=True)
+    bloque = Column(Integer, primary_key=True)
+    procesados = Column(Integer, nullable=False)
+    exitosos = Column(Integer, nullable=False)
+    fallidos = Column(Integer, nullable=False)
+    errores = Column(JSONB, nullable=False, server_default='[]')
+    terminado_en = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    trabajo = relationship("TrabajoNomina", back_populates="bloques")
\ No newline at end of file
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, condecimal, Field, constr, conint
-from typing import Optional, Annotated, List
+from pydantic import BaseModel, condecimal, Field, constr, conint, model_validator
+from typing import Optional, Annotated, List, Literal
 from decimal import Decimal
-from datetime import date
+from datetime import date, datetime
 from uuid import UUID
 
 # Esquema para la tabla empleados
@@ -25,6 +25,34 @@ class Empleado(EmpleadoBase):
     class Config:
         from_attributes = True
 
+# Elemento del listado de empleados: con fields= solo vienen los campos pedidos
+class EmpleadoParcial(BaseModel):
+    id: Optional[UUID] = None
+    cedula: Optional[str] = None
+    nombres: Optional[str] = None
+    apellidos: Optional[str] = None
+    telefono: Optional[str] = None
+    puesto_trabajo: Optional[str] = None
+    salario_base: Optional[Decimal] = None
+
+# Página del listado de empleados
+class EmpleadoPagina(BaseModel):
+    items: list[EmpleadoParcial]
+    next_cursor: Optional[str] = None
+
+# Resultado de la importación masiva de empleados; fila es el número de línea del archivo
+class EmpleadoImportacionError(BaseModel):
+    fila: int
+    cedula: Optional[str] = None
+    errores: list[str]
+
+class EmpleadoImportacionResultado(BaseModel):
+    creados: int
+    actualizados: int
+    sin_cambios: int
+    fallidos: int
+    errores: list[EmpleadoImportacionError]
+
 # Esquema para la tabla config_salario
 class ConfigSalarioBase(BaseModel):
     año: Annotated[int, Field(gt=0)]  # Validación de formato de año
@@ -33,9 +61,15 @@ class ConfigSalarioBase(BaseModel):
     horas_mes: Annotated[int, Field(ge=0, le=744)]  # Validación de rango (máximo 744 horas en un mes)
     valor_hora: Annotated[Decimal, Field(max_digits=10, decimal_places=2, strict=False, ge=0)]  # Validación de rango
     horas_salario: Annotated[int, Field(ge=0, le=168)]  # Validación de rango (máximo 8 horas diarias)
+    vigente_desde: Optional[date] = None
 
 class ConfigSalarioCreate(ConfigSalarioBase):
-    pass
+    # Al crear, por defecto el 1 de enero del año; al actualizar sin fecha se conserva la guardada
+    @model_validator(mode="after")
+    def validar_vigencia(self):
+        if self.vigente_desde is None:
+            self.vigente_desde = date(self.año, 1, 1)
+        return self
 
 class ConfigSalarioUpdate(ConfigSalarioBase):
     pass
@@ -62,6 +96,19 @@ class TipoRecargo(TipoRecargoBase):
     class Config:
         from_attributes = True
 
+# Tarifa de un recargo a partir de una fecha
+class TipoRecargoVigenciaCreate(BaseModel):
+    vigente_desde: date
+    porcentaje: Annotated[Decimal, Field(max_digits=5, decimal_places=4, strict=False, ge=0, le=2)]
+    valor_hora: Annotated[Decimal, Field(max_digits=10, decimal_places=2, strict=False, ge=0)]
+
+class TipoRecargoVigencia(TipoRecargoVigenciaCreate):
+    id: int
+    tipo_recargo_id: int
+
+    class Config:
+        from_attributes = True
+
 # Esquema para la tabla tipo_subsidios
 class TipoSubsidioBase(BaseModel):
     tipo: Annotated[str, constr(min_length=1, max_length=100)]
@@ -76,6 +123,18 @@ class TipoSubsidio(TipoSubsidioBase):
     class Config:
         from_attributes = True
 
+# Valor de un subsidio a partir de una fecha
+class TipoSubsidioVigenciaCreate(BaseModel):
+    vigente_desde: date
+    valor: Annotated[Decimal, Field(max_digits=10, decimal_places=2, strict=False, ge=0)]
+
+class TipoSubsidioVigencia(TipoSubsidioVigenciaCreate):
+    id: int
+    tipo_subsidio_id: int
+
+    class Config:
+        from_attributes = True
+
 # Esquema para la tabla tipo_descuentos
 class TipoDescuentoBase(BaseModel):
     tipo: Annotated[str, constr(min_length=1, max_length=100)]
@@ -93,6 +152,18 @@ class TipoDescuento(TipoDescuentoBase):
     class Config:
         from_attributes = True
 
+# Porcentaje de un descuento a partir de una fecha
+class TipoDescuentoVigenciaCreate(BaseModel):
+    vigente_desde: date
+    valor: Annotated[Decimal, Field(max_digits=10, decimal_places=2, strict=False, ge=0)]
+
+class TipoDescuentoVigencia(TipoDescuentoVigenciaCreate):
+    id: int
+    tipo_descuento_id: int
+
+    class Config:
+        from_attributes = True
+
 # Esquema para la tabla quincena_valores
 class QuincenaValorBase(BaseModel):
     tipo_recargo_id: int
@@ -115,6 +186,10 @@ class ReporteNominaBase(BaseModel):
     fecha_inicio: date
     fecha_fin: date
     total_pagado: Optional[Decimal] = Decimal('0')  # Validación de rango
+    # Los calcula el servicio de nómina, como total_pagado; lo que envíe el cliente se reemplaza
+    total_devengado: Optional[Decimal] = Decimal('0')
+    total_subsidios: Optional[Decimal] = Decimal('0')
+    total_descuentos: Optional[Decimal] = Decimal('0')
 
 class ReporteNominaResponse(BaseModel):
     id: UUID
@@ -134,6 +209,25 @@ class ReporteNominaResponse(BaseModel):
     class Config:
         from_attributes  = True
 
+# Esquema para una página del listado de nóminas
+class ReporteNominaPagina(BaseModel):
+    items: list[ReporteNominaResponse]
+    next_cursor: Optional[str] = None
+
+def _validar_detalles_sin_repetidos(nomina):
+    """Cada tipo puede aparecer una sola vez por nómina, como exigen las restricciones únicas."""
+    colecciones = {
+        "quincena_valores": [qv.tipo_recargo_id for qv in nomina.quincena_valores or []],
+        "recargos": nomina.recargos or [],
+        "descuentos": nomina.descuentos or [],
+        "subsidios": nomina.subsidios or [],
+    }
+    for campo, ids in colecciones.items():
+        repetidos = sorted({i for i in ids if ids.count(i) > 1})
+        if repetidos:
+            raise ValueError(f"{campo} tiene tipos repetidos: {', '.join(map(str, repetidos))}")
+    return nomina
+
 class ReporteNominaCreate(ReporteNominaBase):
     quincena_valores: list[QuincenaValorCreate]
     recargos: list[int]
@@ -141,12 +235,144 @@ class ReporteNominaCreate(ReporteNominaBase):
     subsidios: Optional[list[int]] = None
     total_pagado: Optional[Decimal] = Decimal('0')
 
+    @model_validator(mode="after")
+    def validar_repetidos(self):
+        return _validar_detalles_sin_repetidos(self)
+
 class ReporteNomina(ReporteNominaBase):
     id: UUID
 
     class Config:
         from_attributes = True
 
+# Acumulados del año de un empleado
+class NominaAcumuladoAnual(BaseModel):
+    año: int
+    reportes: int
+    total_devengado: Decimal
+    total_subsidios: Decimal
+    total_descuentos: Decimal
+    total_pagado: Decimal
+
+    class Config:
+        from_attributes = True
+
+# Historial de nóminas de un empleado con sus acumulados por año
+class EmpleadoNominasPagina(ReporteNominaPagina):
+    acumulados: list[NominaAcumuladoAnual]
+
+# Esquema para el resultado de cada nómina de un lote
+class ReporteNominaLoteResultado(BaseModel):
+    indice: int
+    exito: bool
+    nomina: Optional[ReporteNomina] = None
+    error: Optional[str] = None
+
+# Esquema para la respuesta de una corrida de nómina por lote
+class ReporteNominaLoteResponse(BaseModel):
+    creadas: int
+    fallidas: int
+    resultados: list[ReporteNominaLoteResultado]
+
+# Tarifas que reemplazan a las vigentes solo dentro de un escenario simulado; las claves son IDs de tipo
+class TarifasSimulacion(BaseModel):
+    horas_salario: Optional[Annotated[Decimal, Field(ge=0, le=24)]] = None
+    recargos: Optional[dict[int, Annotated[Decimal, Field(ge=0)]]] = None  # valor_hora por tipo de recargo
+    subsidios: Optional[dict[int, Annotated[Decimal, Field(ge=0)]]] = None
+    descuentos: Optional[dict[int, Annotated[Decimal, Field(ge=0, le=1)]]] = None
+
+# Escenario de POST /nominas/simular: una nómina que se calcula sin guardarse
+class EscenarioNomina(ReporteNominaCreate):
+    nombre: Optional[Annotated[str, Field(max_length=100)]] = None  # Etiqueta para comparar escenarios
+    tarifas: Optional[TarifasSimulacion] = None
+
+class LineaSimulada(BaseModel):
+    tipo_recargo_id: int
+    tipo_hora: str
+    cantidad_dias: int
+    valor_quincena: Decimal
+
+class EscenarioNominaResultado(BaseModel):
+    indice: int
+    nombre: Optional[str] = None
+    exito: bool
+    error: Optional[str] = None
+    lineas: list[LineaSimulada] = []
+    total_devengado: Optional[Decimal] = None
+    total_subsidios: Optional[Decimal] = None
+    total_descuentos: Optional[Decimal] = None
+    total_pagado: Optional[Decimal] = None
+
+class SimulacionNominaResponse(BaseModel):
+    exitosos: int
+    fallidos: int
+    resultados: list[EscenarioNominaResultado]
+
+# Esquema para solicitar el recálculo masivo de nóminas guardadas
+class RecalculoNominaRequest(BaseModel):
+    tipo_recargo_ids: Optional[list[int]] = None  # Solo reportes con alguno de estos recargos
+    empleado_ids: Optional[list[UUID]] = None  # Solo reportes de estos empleados
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    dry_run: bool = True  # Por defecto solo informa las diferencias
+
+class RecalculoNominaDiferencia(BaseModel):
+    reporte_nomina_id: UUID
+    empleado_id: UUID
+    total_anterior: Decimal
+    total_nuevo: Decimal
+    lineas_modificadas: int
+    error: Optional[str] = None
+
+class RecalculoNominaResultado(BaseModel):
+    dry_run: bool
+    reportes_evaluados: int
+    reportes_modificados: int
+    lineas_modificadas: int
+    diferencias: list[RecalculoNominaDiferencia]
+
+# Trabajo en segundo plano: "lote" crea las nóminas recibidas y "recalculo" recalcula las guardadas
+class TrabajoNominaCreate(BaseModel):
+    tipo: Literal["lote", "recalculo"]
+    nominas: Optional[list[ReporteNominaCreate]] = None  # Para tipo "lote"
+    recalculo: Optional[RecalculoNominaRequest] = None  # Para tipo "recalculo"; dry_run se ignora
+
+    @model_validator(mode="after")
+    def validar_parametros(self):
+        if self.tipo == "lote" and not self.nominas:
+            raise ValueError("Un trabajo de tipo lote necesita la lista de nominas")
+        if self.tipo == "recalculo" and self.recalculo is None:
+            self.recalculo = RecalculoNominaRequest()
+        return self
+
+class TrabajoNominaError(BaseModel):
+    empleado_id: Optional[UUID] = None
+    indice: Optional[int] = None  # Posición de la nómina en la lista del trabajo "lote"
+    reporte_nomina_id: Optional[UUID] = None
+    error: str
+
+class TrabajoNomina(BaseModel):
+    id: UUID
+    tipo: str
+    estado: str  # pendiente, en_proceso, completado o fallido
+    total: Optional[int] = None  # Nóminas (lote) o empleados (recalculo); se conoce al empezar
+    procesados: int
+    exitosos: int
+    fallidos: int
+    porcentaje: float
+    por_segundo: Optional[float] = None
+    error: Optional[str] = None
+    errores: list[TrabajoNominaError]
+    creado_en: datetime
+    iniciado_en: Optional[datetime] = None
+    terminado_en: Optional[datetime] = None
+
+# Esquema para la respuesta de una eliminación masiva de nóminas
+class ReporteNominaEliminacionResultado(BaseModel):
+    mensaje: str
+    eliminadas: int
+    ids: list[UUID]
+
 # Esquema para la tabla reporte_nomina_recargos
 class ReporteNominaRecargoBase(BaseModel):
     reporte_nomina_id: UUID
@@ -214,6 +440,10 @@ class ReporteNominaUpdate(ReporteNominaBase):
     subsidios: Optional[list[int]] = None
     total_pagado: Optional[Annotated[Decimal, Field(max_digits=10, decimal_places=2, strict=False, ge=0)]] = Decimal('0')
 
+    @model_validator(mode="after")
+    def validar_repetidos(self):
+        return _validar_detalles_sin_repetidos(self)
+
     class Config:
         from_attributes  = True
 
@@ -1,10 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from .api.routes.api import api_router
-from app.db.database import get_db
+from app.db.database import get_db, engine
+from app.core.instrumentacion import MiddlewareInstrumentacion
+from app.core import metricas
+from app.services.cache_backend import cache_backend
 
-app = FastAPI(title="API de Nómina")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Suscribirse a las invalidaciones de caché de los demás procesos
+    await cache_backend.iniciar()
+    yield
+    await cache_backend.cerrar()
+    # Cerrar las conexiones del pool al apagar la aplicación
+    await engine.dispose()
+
+app = FastAPI(title="API de Nómina", lifespan=lifespan)
 
 # Configurar CORS
 origins = [
@@ -20,8 +34,19 @@ app.add_middleware(
     allow_headers=["*"],         # Permite todas las cabeceras
 )
 
+# Cuenta y cronometra las sentencias SQL de cada petición (cabecera Server-Timing, registro JSON y /metrics)
+app.add_middleware(MiddlewareInstrumentacion)
+
 app.include_router(api_router)
 
 @app.get("/")
 def read_root(db: Session = Depends(get_db)):
-    return {"message": "Bienvenido a la API del restaurante el frijolito"}
\ No newline at end of file
+    return {"message": "Bienvenido a la API del restaurante el frijolito"}
+
+# Estado del pool de conexiones en /metrics
+metricas.registrar_pool(engine)
+
+@app.get("/metrics", include_in_schema=False)
+async def leer_metricas():
+    """Métricas del proceso en el formato de texto de Prometheus"""
+    return PlainTextResponse(metricas.registro.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""Mantenimiento de nominas_acumulados_anuales, los acumulados del año por empleado.
+
+Las rutas de escritura de nóminas llaman a ``sumar_acumulados`` con la diferencia de cada reporte
+creado, modificado o borrado, dentro de su misma transacción: los acumulados se leen sin recorrer
+el histórico. Para reconstruir la tabla completa a partir de los reportes guardados:
+
+    python -m app.services.acumulados_nominas
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, bindparam, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from decimal import Decimal, ROUND_HALF_UP
+from uuid import UUID
+import asyncio
+from ..db.models import NominaAcumuladoAnual
+from .payroll_engine import CENTAVO
+
+# Columnas de reportes_nominas que se acumulan
+TOTALES = ("total_devengado", "total_subsidios", "total_descuentos", "total_pagado")
+
+_SUMAR = text(f"""
+    INSERT INTO nominas_acumulados_anuales AS a (empleado_id, "año", reportes, {", ".join(TOTALES)})
+    SELECT * FROM unnest(:empleado_ids, :periodos, :reportes, :devengado, :subsidios, :descuentos, :pagado)
+    ON CONFLICT (empleado_id, "año") DO UPDATE SET
+        reportes = a.reportes + EXCLUDED.reportes,
+        {", ".join(f"{c} = a.{c} + EXCLUDED.{c}" for c in TOTALES)}
+""").bindparams(
+    bindparam("empleado_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("periodos", type_=ARRAY(Integer)),
+    bindparam("reportes", type_=ARRAY(Integer)),
+    *(bindparam(nombre, type_=ARRAY(Numeric(14, 2))) for nombre in ("devengado", "subsidios", "descuentos", "pagado")),
+)
+
+_RECONSTRUIR = text(f"""
+    INSERT INTO nominas_acumulados_anuales (empleado_id, "año", reportes, {", ".join(TOTALES)})
+    SELECT empleado_id, EXTRACT(YEAR FROM fecha_inicio)::int, count(*), {", ".join(f"sum({c})" for c in TOTALES)}
+    FROM reportes_nominas
+    GROUP BY 1, 2
+""")
+
+def _valor(reporte, campo: str):
+    return reporte[campo] if isinstance(reporte, dict) else getattr(reporte, campo)
+
+def movimiento(reporte, signo: int = 1) -> tuple:
+    """Aporte de un reporte guardado (modelo, fila o diccionario) a sus acumulados.
+
+    Con ``signo`` -1 descuenta el reporte, p. ej. al borrarlo o antes de modificarlo. Los montos se
+    redondean a centavos como al guardarlos en reportes_nominas.
+    """
+    return (
+        _valor(reporte, "empleado_id"),
+        _valor(reporte, "fecha_inicio").year,
+        signo,
+        *(signo * Decimal(_valor(reporte, campo)).quantize(CENTAVO, rounding=ROUND_HALF_UP) for campo in TOTALES),
+    )
+
+async def sumar_acumulados(db: AsyncSession, movimientos):
+    """Suma los movimientos a los acumulados en una sola sentencia. No confirma la transacción.
+
+    Los movimientos de un mismo empleado y año se combinan antes; los que se anulan no se escriben.
+    """
+    combinados: dict[tuple, list] = {}
+    for empleado_id, año, reportes, *totales in movimientos:
+        actual = combinados.setdefault((empleado_id, año), [0] + [Decimal(0)] * len(TOTALES))
+        for i, valor in enumerate((reportes, *totales)):
+            actual[i] += valor
+    filas = [(clave, valores) for clave, valores in combinados.items() if any(valores)]
+    if not filas:
+        return
+    columnas = list(zip(*(valores for _, valores in filas)))
+    await db.execute(_SUMAR, {
+        "empleado_ids": [empleado_id for (empleado_id, _), _ in filas],
+        "periodos": [año for (_, año), _ in filas],
+        "reportes": list(columnas[0]),
+        "devengado": list(columnas[1]),
+        "subsidios": list(columnas[2]),
+        "descuentos": list(columnas[3]),
+        "pagado": list(columnas[4]),
+    })
+
+async def obtener_acumulados(db: AsyncSession, empleado_id: UUID) -> list[NominaAcumuladoAnual]:
+    """Acumulados del empleado del año más reciente al más antiguo."""
+    result = await db.execute(
+        select(NominaAcumuladoAnual)
+        .where(NominaAcumuladoAnual.empleado_id == empleado_id, NominaAcumuladoAnual.reportes > 0)
+        .order_by(NominaAcumuladoAnual.año.desc())
+    )
+    return list(result.scalars().all())
+
+async def reconstruir_acumulados(db: AsyncSession):
+    """Vacía y vuelve a llenar los acumulados a partir de los reportes existentes."""
+    await db.execute(text("TRUNCATE nominas_acumulados_anuales"))
+    result = await db.execute(_RECONSTRUIR)
+    await db.commit()
+    return result.rowcount
+
+async def main():
+    from app.db.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        filas = await reconstruir_acumulados(db)
+    print(f"Acumulados reconstruidos: {filas} empleados y años")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,211 @@
+"""Backends de caché compartidos por las rutas y el servicio de nómina.
+
+Un backend guarda cuerpos serializados y lleva un contador de cambios por recurso (una tabla o
+grupo de tablas). ``invalidar`` incrementa el contador y avisa a los oyentes registrados con
+``al_invalidar``; con Redis el aviso llega también a los demás procesos por pub/sub, así que
+varios workers de uvicorn comparten versiones, ETags y cuerpos.
+
+``CACHE_BACKEND_URL`` vacío usa la memoria del proceso; ``redis://...`` usa Redis (requiere el
+paquete ``redis``). En memoria cada proceso tiene sus propias versiones y no se entera de lo que
+invalidan los demás, así que solo sirve con un único worker: con ``WEB_CONCURRENCY`` mayor que 1
+la aplicación no arranca sin Redis. Quien lance varios workers con ``--workers`` debe configurar
+también ``CACHE_BACKEND_URL``.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional
+from uuid import uuid4
+import asyncio
+import logging
+import time
+from ..core.config import CACHE_BACKEND_URL, CACHE_PREFIJO, RESPUESTAS_CACHE_MAX_BYTES, WEB_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+Oyente = Callable[[str, int], None]
+
+class CacheBackend(ABC):
+    """Interfaz común: valores en bytes, versiones por recurso e invalidación con aviso."""
+
+    # Si las invalidaciones llegan a los demás procesos (requisito de los trabajadores de nómina)
+    compartido = False
+
+    def __init__(self):
+        # Identifica el conjunto de contadores; cambia si los contadores se reinician
+        self.generacion = uuid4().hex[:12]
+        # Última versión conocida de cada recurso, para leerla sin ir al backend
+        self.versiones: dict[str, int] = {}
+        self._oyentes: list[Oyente] = []
+
+    def al_invalidar(self, oyente: Oyente):
+        """Registra una función que recibe (recurso, versión) en cada invalidación."""
+        self._oyentes.append(oyente)
+
+    def version(self, recurso: str) -> int:
+        return self.versiones.get(recurso, 0)
+
+    def _notificar(self, recurso: str, version: int):
+        # Los avisos pueden llegar repetidos o desordenados; solo cuenta una versión mayor
+        if version <= self.version(recurso):
+            return
+        self.versiones[recurso] = version
+        for oyente in self._oyentes:
+            oyente(recurso, version)
+
+    async def iniciar(self):
+        """Prepara el backend al arrancar la aplicación."""
+
+    async def cerrar(self):
+        """Libera conexiones y tareas al apagar la aplicación."""
+
+    @abstractmethod
+    async def obtener(self, clave: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def guardar(self, clave: str, valor: bytes, ttl: Optional[int] = None):
+        ...
+
+    @abstractmethod
+    async def borrar(self, clave: str):
+        ...
+
+    @abstractmethod
+    async def invalidar(self, recurso: str) -> int:
+        """Incrementa la versión del recurso, avisa a los oyentes y devuelve la versión nueva."""
+
+class MemoriaBackend(CacheBackend):
+    """LRU en la memoria del proceso con límite de bytes; los avisos solo llegan a este proceso."""
+
+    def __init__(self, max_bytes: int, procesos: int = 1):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.procesos = procesos
+        self.bytes = 0
+        # Valor y momento (reloj monotónico) en que expira, o None si no expira
+        self._entradas: OrderedDict[str, tuple[bytes, Optional[float]]] = OrderedDict()
+
+    async def iniciar(self):
+        if self.procesos > 1:
+            raise RuntimeError(
+                f"WEB_CONCURRENCY={self.procesos}: el caché en memoria no se comparte entre procesos; "
+                "configure CACHE_BACKEND_URL con Redis o use un solo worker"
+            )
+
+    async def obtener(self, clave: str) -> Optional[bytes]:
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        valor, expira = entrada
+        if expira is not None and expira <= time.monotonic():
+            await self.borrar(clave)
+            return None
+        self._entradas.move_to_end(clave)
+        return valor
+
+    async def guardar(self, clave: str, valor: bytes, ttl: Optional[int] = None):
+        if len(valor) > self.max_bytes:
+            return
+        await self.borrar(clave)
+        self._entradas[clave] = (valor, time.monotonic() + ttl if ttl else None)
+        self.bytes += len(valor)
+        while self.bytes > self.max_bytes:
+            _, (desalojado, _) = self._entradas.popitem(last=False)
+            self.bytes -= len(desalojado)
+
+    async def borrar(self, clave: str):
+        entrada = self._entradas.pop(clave, None)
+        if entrada is not None:
+            self.bytes -= len(entrada[0])
+
+    async def invalidar(self, recurso: str) -> int:
+        version = self.version(recurso) + 1
+        self._notificar(recurso, version)
+        return version
+
+class RedisBackend(CacheBackend):
+    """Backend sobre el protocolo de Redis: versiones en un hash e invalidaciones por pub/sub.
+
+    Recibe un cliente de ``redis.asyncio`` (o uno compatible, como el de fakeredis en pruebas).
+    El límite de memoria y el desalojo LRU los aplica el servidor (``maxmemory-policy``).
+    """
+
+    compartido = True
+
+    def __init__(self, cliente, prefijo: str = CACHE_PREFIJO):
+        super().__init__()
+        self._cliente = cliente
+        self._prefijo = prefijo
+        self._canal = f"{prefijo}:invalidaciones"
+        self._clave_versiones = f"{prefijo}:versiones"
+        self._tarea: Optional[asyncio.Task] = None
+        self._suscrito = asyncio.Event()
+
+    async def iniciar(self):
+        # Todos los procesos adoptan la misma generación para que sus ETags coincidan
+        await self._cliente.set(f"{self._prefijo}:generacion", self.generacion, nx=True)
+        self.generacion = (await self._cliente.get(f"{self._prefijo}:generacion")).decode()
+        await self._sincronizar()
+        self._tarea = asyncio.create_task(self._escuchar())
+        await self._suscrito.wait()
+
+    async def cerrar(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        await self._cliente.aclose()
+
+    async def _sincronizar(self):
+        for recurso, version in (await self._cliente.hgetall(self._clave_versiones)).items():
+            self._notificar(recurso.decode(), int(version))
+
+    async def _escuchar(self):
+        while True:
+            try:
+                pubsub = self._cliente.pubsub()
+                await pubsub.subscribe(self._canal)
+                # Lo invalidado mientras no había suscripción se recupera del hash
+                await self._sincronizar()
+                self._suscrito.set()
+                async for mensaje in pubsub.listen():
+                    if mensaje["type"] != "message":
+                        continue
+                    recurso, version = mensaje["data"].decode().rsplit(":", 1)
+                    self._notificar(recurso, int(version))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Se perdió la suscripción de invalidaciones de caché; reintentando")
+                await asyncio.sleep(1)
+
+    async def obtener(self, clave: str) -> Optional[bytes]:
+        return await self._cliente.get(f"{self._prefijo}:{clave}")
+
+    async def guardar(self, clave: str, valor: bytes, ttl: Optional[int] = None):
+        await self._cliente.set(f"{self._prefijo}:{clave}", valor, ex=ttl)
+
+    async def borrar(self, clave: str):
+        await self._cliente.delete(f"{self._prefijo}:{clave}")
+
+    async def invalidar(self, recurso: str) -> int:
+        version = await self._cliente.hincrby(self._clave_versiones, recurso, 1)
+        # El proceso que escribe queda al día sin esperar su propio mensaje
+        self._notificar(recurso, version)
+        await self._cliente.publish(self._canal, f"{recurso}:{version}")
+        return version
+
+def crear_backend(url: Optional[str] = CACHE_BACKEND_URL) -> CacheBackend:
+    if not url:
+        return MemoriaBackend(max_bytes=RESPUESTAS_CACHE_MAX_BYTES, procesos=WEB_CONCURRENCY)
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        raise RuntimeError("CACHE_BACKEND_URL apunta a Redis pero el paquete 'redis' no está instalado")
+    return RedisBackend(redis.from_url(url))
+
+# Instancia compartida por toda la aplicación
+cache_backend = crear_backend()
\ No newline at end of file
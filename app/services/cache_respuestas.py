@@ -0,0 +1,77 @@
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from typing import Any, Awaitable, Callable, Optional
+from ..core.config import RESPUESTAS_CACHE_TTL
+from ..core.metricas import respuestas_cache_consultas
+from .cache_backend import CacheBackend, cache_backend
+
+class CacheRespuestas:
+    """Cuerpos JSON ya serializados con ETag por recurso, guardados en un ``CacheBackend``.
+
+    El ETag combina la generación del backend con la versión del recurso, que las rutas de
+    escritura incrementan con ``cache_backend.invalidar`` después de confirmar. Un cliente con
+    el ETag vigente recibe 304 sin que se consulte la base de datos. Las claves llevan la
+    versión, así que los cuerpos viejos no se borran: dejan de pedirse y salen por LRU o TTL.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    def version(self, recurso: str) -> int:
+        return self.backend.version(recurso)
+
+    def etag(self, recurso: str, clave: str = "") -> str:
+        sufijo = f"-{clave}" if clave else ""
+        return f'"{recurso}-{self.backend.generacion}-{self.version(recurso)}{sufijo}"'
+
+    async def obtener(self, recurso: str, clave: str = "") -> Optional[bytes]:
+        return await self.backend.obtener(f"respuestas:{recurso}:{self.version(recurso)}:{clave}")
+
+    async def guardar(self, recurso: str, clave: str, version: int, cuerpo: bytes):
+        # Un cuerpo calculado antes de una invalidación ya no corresponde a ningún ETag vigente
+        if version != self.version(recurso):
+            return
+        await self.backend.guardar(f"respuestas:{recurso}:{version}:{clave}", cuerpo, ttl=self.ttl)
+
+def _candidatos(if_none_match: Optional[str]) -> list[str]:
+    if not if_none_match:
+        return []
+    return [valor.strip().removeprefix("W/") for valor in if_none_match.split(",")]
+
+# Instancia compartida por las rutas de catálogos y de nóminas
+cache_respuestas = CacheRespuestas(cache_backend, ttl=RESPUESTAS_CACHE_TTL)
+
+async def respuesta_cacheada(
+    request: Request,
+    recurso: str,
+    modelo: Any,
+    consultar: Callable[[], Awaitable[Any]],
+    clave: str = "",
+) -> Response:
+    """Responde 304 si el cliente ya tiene la versión vigente; si no, sirve el cuerpo guardado
+    o lo calcula con ``consultar`` y lo serializa con ``modelo`` (el response_model de la ruta)."""
+    version = cache_respuestas.version(recurso)
+    etag = cache_respuestas.etag(recurso, clave)
+    cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    candidatos = _candidatos(request.headers.get("if-none-match"))
+    if etag in candidatos:
+        respuestas_cache_consultas.incrementar(recurso, "no_modificado")
+        return Response(status_code=304, headers=cabeceras)
+
+    cuerpo = await cache_respuestas.obtener(recurso, clave)
+    acierto = cuerpo is not None
+    if cuerpo is None:
+        # Si el recurso no existe, consultar lanza aquí su 404
+        adaptador = TypeAdapter(modelo)
+        datos = adaptador.validate_python(await consultar(), from_attributes=True)
+        cuerpo = adaptador.dump_json(datos)
+        await cache_respuestas.guardar(recurso, clave, version, cuerpo)
+
+    # "*" coincide con cualquier representación, pero solo si existe: se resuelve antes de responder
+    if "*" in candidatos:
+        respuestas_cache_consultas.incrementar(recurso, "no_modificado")
+        return Response(status_code=304, headers=cabeceras)
+    respuestas_cache_consultas.incrementar(recurso, "acierto" if acierto else "fallo")
+    return Response(content=cuerpo, media_type="application/json", headers=cabeceras)
\ No newline at end of file
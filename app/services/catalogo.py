@@ -0,0 +1,222 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text
+from typing import Optional
+from datetime import date
+from decimal import Decimal
+import asyncio
+import json
+import time
+from ..db.models import (
+    ConfigSalario, TipoRecargo, TipoSubsidio, TipoDescuento,
+    TipoRecargoVigencia, TipoSubsidioVigencia, TipoDescuentoVigencia
+)
+from ..core.config import CATALOGO_CACHE_TTL
+from ..core.metricas import catalogo_cache_consultas
+from .cache_backend import cache_backend
+from .payroll_engine import (
+    CatalogoSnapshot, CatalogoVigencias, ConfigSalarioInfo, RecargoInfo, SubsidioInfo, DescuentoInfo, indexar_vigencias
+)
+
+async def cargar_catalogo(db: AsyncSession, version: int = 0) -> CatalogoVigencias:
+    """Lee de la base de datos las configuraciones de salario, los catálogos de nómina y sus
+    vigencias, e indexa las instantáneas por fecha."""
+    configs = (await db.execute(select(ConfigSalario))).scalars().all()
+    recargos = (await db.execute(select(TipoRecargo))).scalars().all()
+    subsidios = (await db.execute(select(TipoSubsidio))).scalars().all()
+    descuentos = (await db.execute(select(TipoDescuento))).scalars().all()
+    vigencias_recargos = (await db.execute(select(TipoRecargoVigencia))).scalars().all()
+    vigencias_subsidios = (await db.execute(select(TipoSubsidioVigencia))).scalars().all()
+    vigencias_descuentos = (await db.execute(select(TipoDescuentoVigencia))).scalars().all()
+
+    # Las vigencias solo cambian montos; el nombre sale del tipo
+    tipos_hora = {r.id: r.tipo_hora for r in recargos}
+    tipos_subsidio = {s.id: s.tipo for s in subsidios}
+    tipos_descuento = {d.id: d.tipo for d in descuentos}
+    cambios = [
+        *((v.vigente_desde, "recargos", RecargoInfo(v.tipo_recargo_id, tipos_hora[v.tipo_recargo_id], v.porcentaje, v.valor_hora))
+          for v in vigencias_recargos),
+        *((v.vigente_desde, "subsidios", SubsidioInfo(v.tipo_subsidio_id, tipos_subsidio[v.tipo_subsidio_id], v.valor))
+          for v in vigencias_subsidios),
+        *((v.vigente_desde, "descuentos", DescuentoInfo(v.tipo_descuento_id, tipos_descuento[v.tipo_descuento_id], v.valor))
+          for v in vigencias_descuentos),
+    ]
+
+    return indexar_vigencias(
+        version,
+        configs=[
+            ConfigSalarioInfo(
+                id=c.id,
+                año=c.año,
+                salario_minimo=c.salario_minimo,
+                horas_semana=c.horas_semana,
+                horas_mes=c.horas_mes,
+                valor_hora=c.valor_hora,
+                horas_salario=c.horas_salario,
+                vigente_desde=c.vigente_desde
+            )
+            for c in configs
+        ],
+        recargos={r.id: RecargoInfo(r.id, r.tipo_hora, r.porcentaje, r.valor_hora) for r in recargos},
+        subsidios={s.id: SubsidioInfo(s.id, s.tipo, s.valor) for s in subsidios},
+        descuentos={d.id: DescuentoInfo(d.id, d.tipo, d.valor) for d in descuentos},
+        cambios=cambios,
+    )
+
+# Empleado, configuración y solo los tipos que usa la nómina, vigentes en la fecha de inicio del periodo,
+# en un único viaje a la base de datos. Los montos viajan como texto dentro del JSON para no pasar por float.
+_CONTEXTO_NOMINA = text("""
+    SELECT
+        EXISTS (SELECT 1 FROM empleados WHERE id = :empleado_id) AS empleado,
+        (
+            SELECT json_build_object(
+                'id', c.id, 'año', c."año", 'salario_minimo', c.salario_minimo::text,
+                'horas_semana', c.horas_semana, 'horas_mes', c.horas_mes,
+                'valor_hora', c.valor_hora::text, 'horas_salario', c.horas_salario::text,
+                'vigente_desde', c.vigente_desde
+            )
+            FROM config_salarios c
+            WHERE c.vigente_desde <= :fecha
+            ORDER BY c.vigente_desde DESC
+            LIMIT 1
+        ) AS config,
+        (
+            SELECT COALESCE(json_agg(json_build_object(
+                'id', r.id, 'tipo_hora', r.tipo_hora,
+                'porcentaje', COALESCE(v.porcentaje, r.porcentaje)::text,
+                'valor_hora', COALESCE(v.valor_hora, r.valor_hora)::text
+            )), '[]')
+            FROM tipos_recargos r
+            LEFT JOIN LATERAL (
+                SELECT porcentaje, valor_hora FROM tipos_recargos_vigencias
+                WHERE tipo_recargo_id = r.id AND vigente_desde <= :fecha
+                ORDER BY vigente_desde DESC
+                LIMIT 1
+            ) v ON true
+            WHERE r.id = ANY(:recargo_ids)
+        ) AS recargos,
+        (
+            SELECT COALESCE(json_agg(json_build_object('id', s.id, 'tipo', s.tipo, 'valor', COALESCE(v.valor, s.valor)::text)), '[]')
+            FROM tipos_subsidios s
+            LEFT JOIN LATERAL (
+                SELECT valor FROM tipos_subsidios_vigencias
+                WHERE tipo_subsidio_id = s.id AND vigente_desde <= :fecha
+                ORDER BY vigente_desde DESC
+                LIMIT 1
+            ) v ON true
+            WHERE s.id = ANY(:subsidio_ids)
+        ) AS subsidios,
+        (
+            SELECT COALESCE(json_agg(json_build_object('id', d.id, 'tipo', d.tipo, 'valor', COALESCE(v.valor, d.valor)::text)), '[]')
+            FROM tipos_descuentos d
+            LEFT JOIN LATERAL (
+                SELECT valor FROM tipos_descuentos_vigencias
+                WHERE tipo_descuento_id = d.id AND vigente_desde <= :fecha
+                ORDER BY vigente_desde DESC
+                LIMIT 1
+            ) v ON true
+            WHERE d.id = ANY(:descuento_ids)
+        ) AS descuentos
+""")
+
+def _json(valor):
+    # asyncpg entrega json como texto; otros controladores ya lo decodifican
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+async def cargar_contexto_nomina(db: AsyncSession, nomina) -> Optional[CatalogoSnapshot]:
+    """Carga en una sola sentencia lo necesario para calcular ``nomina``.
+
+    Devuelve una instantánea parcial con la configuración y las tarifas vigentes en
+    ``nomina.fecha_inicio``, solo de los recargos, subsidios y descuentos referenciados por la
+    nómina, o None si el empleado no existe. Es la misma resolución que ``CatalogoVigencias.en_fecha``.
+    Los IDs que no estén en la base de datos quedan fuera y el motor los reporta como no encontrados.
+    """
+    recargo_ids = {valor.tipo_recargo_id for valor in nomina.quincena_valores} | set(nomina.recargos or [])
+    fila = (await db.execute(_CONTEXTO_NOMINA, {
+        "empleado_id": nomina.empleado_id,
+        "fecha": nomina.fecha_inicio,
+        "recargo_ids": sorted(recargo_ids),
+        "subsidio_ids": sorted(set(nomina.subsidios or [])),
+        "descuento_ids": sorted(set(nomina.descuentos or [])),
+    })).one()
+    if not fila.empleado:
+        return None
+
+    config = _json(fila.config)
+    return CatalogoSnapshot(
+        version=catalogo_cache.version,
+        config_salario=ConfigSalarioInfo(
+            id=config["id"],
+            año=config["año"],
+            salario_minimo=Decimal(config["salario_minimo"]),
+            horas_semana=config["horas_semana"],
+            horas_mes=config["horas_mes"],
+            valor_hora=Decimal(config["valor_hora"]),
+            horas_salario=Decimal(config["horas_salario"]),
+            vigente_desde=date.fromisoformat(config["vigente_desde"])
+        ) if config else None,
+        recargos={
+            r["id"]: RecargoInfo(r["id"], r["tipo_hora"], Decimal(r["porcentaje"]), Decimal(r["valor_hora"]))
+            for r in _json(fila.recargos)
+        },
+        subsidios={s["id"]: SubsidioInfo(s["id"], s["tipo"], Decimal(s["valor"])) for s in _json(fila.subsidios)},
+        descuentos={d["id"]: DescuentoInfo(d["id"], d["tipo"], Decimal(d["valor"])) for d in _json(fila.descuentos)},
+    )
+
+class CatalogoCache:
+    """Caché en memoria de los catálogos de nómina con tiempo de vida e invalidación explícita.
+
+    Cada invalidación incrementa la versión; una carga iniciada antes de una invalidación
+    se devuelve a quien la pidió pero no se conserva en el caché.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: Optional[CatalogoVigencias] = None
+        self._expira = 0.0
+        self._lock = asyncio.Lock()
+
+    def _vigente(self) -> Optional[CatalogoVigencias]:
+        if self._snapshot is not None and time.monotonic() < self._expira:
+            return self._snapshot
+        return None
+
+    def invalidar(self):
+        """Descarta la instantánea actual; se llama después de cada escritura en los catálogos."""
+        self.version += 1
+        self._snapshot = None
+
+    async def obtener(self, db: AsyncSession) -> CatalogoVigencias:
+        """Devuelve el índice de vigencias en caché o lo recarga desde la base de datos."""
+        snapshot = self._vigente()
+        if snapshot is not None:
+            catalogo_cache_consultas.incrementar("acierto")
+            return snapshot
+
+        async with self._lock:
+            # Otra corrutina pudo haber recargado mientras se esperaba el candado
+            snapshot = self._vigente()
+            if snapshot is not None:
+                catalogo_cache_consultas.incrementar("acierto")
+                return snapshot
+
+            catalogo_cache_consultas.incrementar("fallo")
+            version = self.version
+            snapshot = await cargar_catalogo(db, version)
+            if version == self.version and self.ttl > 0:
+                self._snapshot = snapshot
+                self._expira = time.monotonic() + self.ttl
+            return snapshot
+
+# Instancia compartida por el servicio de nómina y las rutas de catálogos
+catalogo_cache = CatalogoCache(ttl=CATALOGO_CACHE_TTL)
+
+# Recursos del backend de caché cuyas invalidaciones descartan la instantánea de catálogos
+RECURSOS_CATALOGO = ("tipos_recargos", "tipos_descuentos", "tipos_subsidios", "config_salarios")
+
+def _al_invalidar(recurso: str, version: int):
+    # Llega también de otros procesos cuando el backend es compartido
+    if recurso in RECURSOS_CATALOGO:
+        catalogo_cache.invalidar()
+
+cache_backend.al_invalidar(_al_invalidar)
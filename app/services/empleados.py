@@ -0,0 +1,69 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_, literal
+from fastapi import HTTPException
+from typing import Optional
+from uuid import UUID
+from ..db.models import Empleado
+from .paginacion import codificar_cursor, decodificar_cursor, LIMITE_POR_DEFECTO
+
+# Campos que se pueden pedir con fields=
+CAMPOS_EMPLEADO = ("id", "cedula", "nombres", "apellidos", "telefono", "puesto_trabajo", "salario_base")
+
+# Misma expresión que el índice de trigramas de la migración, para que el planificador lo use
+NOMBRE_COMPLETO = Empleado.nombres + literal(" ") + Empleado.apellidos
+
+def _escapar_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def campos_solicitados(fields: Optional[str]) -> tuple[str, ...]:
+    """Valida el parámetro fields= (lista separada por comas) y devuelve los campos en orden."""
+    if not fields:
+        return CAMPOS_EMPLEADO
+    campos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    desconocidos = [campo for campo in campos if campo not in CAMPOS_EMPLEADO]
+    if desconocidos or not campos:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(desconocidos)}")
+    return tuple(campo for campo in CAMPOS_EMPLEADO if campo in campos)
+
+async def obtener_empleados(
+    db: AsyncSession,
+    limite: int = LIMITE_POR_DEFECTO,
+    cursor: Optional[str] = None,
+    cedula: Optional[str] = None,
+    nombre: Optional[str] = None,
+    campos: tuple[str, ...] = CAMPOS_EMPLEADO,
+):
+    """Devuelve los empleados ordenados por (apellidos, nombres, id), paginados por cursor.
+
+    ``cedula`` filtra por prefijo y ``nombre`` busca en nombres y apellidos sin distinguir
+    mayúsculas. Las filas se devuelven como diccionarios con solo los ``campos`` pedidos, sin
+    pasar por la validación de schemas.Empleado.
+    """
+    orden = (Empleado.apellidos, Empleado.nombres, Empleado.id)
+    columnas = {campo: getattr(Empleado, campo) for campo in campos}
+    # La clave de orden siempre se lee para poder armar el cursor
+    consulta = select(*columnas.values(), *orden).order_by(*orden).limit(limite + 1)
+
+    if cursor is not None:
+        apellidos, nombres, id_cursor = decodificar_cursor(cursor, 3)
+        try:
+            id_cursor = UUID(id_cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        consulta = consulta.where(tuple_(*orden) > tuple_(literal(apellidos), literal(nombres), literal(id_cursor)))
+    if cedula:
+        consulta = consulta.where(Empleado.cedula.like(f"{_escapar_like(cedula)}%", escape="\\"))
+    if nombre:
+        consulta = consulta.where(NOMBRE_COMPLETO.ilike(f"%{_escapar_like(nombre)}%", escape="\\"))
+
+    filas = (await db.execute(consulta)).all()
+
+    # Se pidió un elemento de más para saber si hay una página siguiente
+    next_cursor = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        next_cursor = codificar_cursor(*ultima[len(columnas):])
+
+    items = [dict(zip(columnas, fila[:len(columnas)])) for fila in filas]
+    return {"items": items, "next_cursor": next_cursor}
\ No newline at end of file
@@ -0,0 +1,175 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from pydantic import ValidationError
+from typing import AsyncIterator
+from uuid import uuid4
+import csv
+import json
+
+from app.db.schemas import EmpleadoCreate
+from app.services.resumen_nominas import refrescar_resumen_empleados
+from app.services.cache_backend import cache_backend
+from app.core.metricas import cronometrar_lote
+
+FORMATOS_IMPORTACION = ("csv", "ndjson")
+
+# Filas válidas que se acumulan en memoria antes de enviarlas con COPY a la tabla temporal
+FILAS_POR_BLOQUE_IMPORTACION = 5000
+# Los errores se cuentan todos, pero solo se detallan los primeros
+MAX_ERRORES_REPORTADOS = 1000
+
+COLUMNAS_IMPORTACION = ("id", "cedula", "nombres", "apellidos", "telefono", "puesto_trabajo", "salario_base")
+
+# Tabla de paso: vive solo durante la transacción de la importación
+_CREAR_TABLA_PASO = text("""
+    CREATE TEMP TABLE empleados_importacion (
+        id uuid NOT NULL,
+        cedula varchar NOT NULL,
+        nombres varchar NOT NULL,
+        apellidos varchar NOT NULL,
+        telefono varchar,
+        puesto_trabajo varchar,
+        salario_base numeric(10, 2) NOT NULL
+    ) ON COMMIT DROP
+""")
+
+# Alta o actualización por cédula; las filas idénticas a las existentes no se tocan.
+# xmax = 0 distingue las filas insertadas de las actualizadas.
+_FUSIONAR = text("""
+    INSERT INTO empleados (id, cedula, nombres, apellidos, telefono, puesto_trabajo, salario_base)
+    SELECT id, cedula, nombres, apellidos, telefono, puesto_trabajo, salario_base
+    FROM empleados_importacion
+    ON CONFLICT (cedula) DO UPDATE SET
+        nombres = EXCLUDED.nombres,
+        apellidos = EXCLUDED.apellidos,
+        telefono = EXCLUDED.telefono,
+        puesto_trabajo = EXCLUDED.puesto_trabajo,
+        salario_base = EXCLUDED.salario_base
+    WHERE (empleados.nombres, empleados.apellidos, empleados.telefono, empleados.puesto_trabajo, empleados.salario_base)
+        IS DISTINCT FROM (EXCLUDED.nombres, EXCLUDED.apellidos, EXCLUDED.telefono, EXCLUDED.puesto_trabajo, EXCLUDED.salario_base)
+    RETURNING id, (xmax = 0) AS insertado
+""")
+
+async def _lineas(cuerpo: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Parte el cuerpo de la petición en líneas a medida que llega, sin leerlo completo."""
+    pendiente = b""
+    async for trozo in cuerpo:
+        pendiente += trozo
+        *completas, pendiente = pendiente.split(b"\n")
+        for linea in completas:
+            yield linea
+    if pendiente:
+        yield pendiente
+
+async def _registros(formato: str, cuerpo: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Devuelve (número de línea, datos, error de lectura) por cada registro no vacío del archivo.
+
+    En CSV la primera línea son los nombres de las columnas; cada registro ocupa una línea.
+    Cada línea se decodifica por separado para que una con bytes que no son UTF-8 quede como
+    error de esa fila.
+    """
+    encabezado = None
+    numero = 0
+    async for crudo in _lineas(cuerpo):
+        numero += 1
+        try:
+            linea = crudo.decode("utf-8-sig").rstrip("\r")
+        except UnicodeDecodeError:
+            yield numero, None, "La línea no es texto UTF-8 válido"
+            continue
+        if not linea.strip():
+            continue
+        if formato == "ndjson":
+            try:
+                datos = json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, None, f"JSON inválido: {e.msg}"
+                continue
+            if not isinstance(datos, dict):
+                yield numero, None, "Cada línea debe ser un objeto JSON"
+                continue
+            yield numero, datos, None
+            continue
+
+        valores = next(csv.reader([linea]))
+        if encabezado is None:
+            encabezado = [columna.strip() for columna in valores]
+            continue
+        if len(valores) != len(encabezado):
+            yield numero, None, f"Se esperaban {len(encabezado)} columnas y hay {len(valores)}"
+            continue
+        # Las celdas vacías de CSV son campos ausentes (telefono y puesto_trabajo son opcionales)
+        yield numero, {c: v for c, v in zip(encabezado, valores) if v != ""}, None
+
+def _mensajes(error: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(parte) for parte in detalle['loc']) or 'fila'}: {detalle['msg']}"
+        for detalle in error.errors()
+    ]
+
+async def _copiar(db: AsyncSession, filas: list[tuple]):
+    conexion = await db.connection()
+    conexion_cruda = await conexion.get_raw_connection()
+    await conexion_cruda.driver_connection.copy_records_to_table(
+        "empleados_importacion", records=filas, columns=list(COLUMNAS_IMPORTACION)
+    )
+
+@cronometrar_lote("importar_empleados")
+async def importar_empleados(db: AsyncSession, formato: str, cuerpo: AsyncIterator[bytes]) -> dict:
+    """Crea o actualiza empleados por cédula a partir de un archivo CSV o NDJSON.
+
+    Cada registro se valida con las reglas de EmpleadoCreate mientras se lee; los válidos pasan
+    por COPY a una tabla temporal y se fusionan con empleados en una sola sentencia al final.
+    Los registros con errores (o con una cédula repetida en el archivo) se informan por línea
+    sin detener la importación. Todo ocurre en una transacción.
+    """
+    errores = []
+    fallidos = 0
+    validos = 0
+    cedulas = set()
+    bloque: list[tuple] = []
+
+    def registrar_error(numero: int, cedula, mensajes: list[str]):
+        nonlocal fallidos
+        fallidos += 1
+        if len(errores) < MAX_ERRORES_REPORTADOS:
+            errores.append({"fila": numero, "cedula": cedula if isinstance(cedula, str) else None, "errores": mensajes})
+
+    await db.execute(_CREAR_TABLA_PASO)
+    async for numero, datos, error in _registros(formato, cuerpo):
+        if error:
+            registrar_error(numero, None, [error])
+            continue
+        try:
+            empleado = EmpleadoCreate.model_validate(datos)
+        except ValidationError as e:
+            registrar_error(numero, datos.get("cedula"), _mensajes(e))
+            continue
+        if empleado.cedula in cedulas:
+            registrar_error(numero, empleado.cedula, ["cedula: repetida en el archivo"])
+            continue
+        cedulas.add(empleado.cedula)
+        validos += 1
+        bloque.append((uuid4(), *(getattr(empleado, c) for c in COLUMNAS_IMPORTACION[1:])))
+        if len(bloque) >= FILAS_POR_BLOQUE_IMPORTACION:
+            await _copiar(db, bloque)
+            bloque = []
+    if bloque:
+        await _copiar(db, bloque)
+
+    fusionadas = (await db.execute(_FUSIONAR)).all()
+    actualizados = [fila.id for fila in fusionadas if not fila.insertado]
+    # Los datos del empleado están copiados en el resumen de sus nóminas
+    await refrescar_resumen_empleados(db, actualizados)
+    await db.commit()
+    if actualizados:
+        await cache_backend.invalidar("nominas")
+
+    creados = len(fusionadas) - len(actualizados)
+    return {
+        "creados": creados,
+        "actualizados": len(actualizados),
+        "sin_cambios": validos - len(fusionadas),
+        "fallidos": fallidos,
+        "errores": errores
+    }
\ No newline at end of file
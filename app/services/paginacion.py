@@ -0,0 +1,24 @@
+import base64
+import json
+from fastapi import HTTPException
+
+# Límites de tamaño de página para los listados paginados
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+def codificar_cursor(*valores) -> str:
+    """Codifica la clave de orden del último elemento de una página en un cursor opaco."""
+    datos = json.dumps([str(valor) for valor in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str, cantidad: int) -> list[str]:
+    """Devuelve los valores de la clave de orden contenidos en el cursor."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    # Los valores siempre se codifican como texto; otro tipo es un cursor alterado
+    if not isinstance(valores, list) or len(valores) != cantidad or not all(isinstance(v, str) for v in valores):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return valores
@@ -1,111 +1,101 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from ..db.models import (
-    Empleado, 
-    ConfigSalario, 
-    TipoRecargo, 
-    TipoSubsidio, 
-    TipoDescuento
-)
-from ..db.schemas import ReporteNominaCreate
-from decimal import Decimal
+from ..db.models import Empleado
+from ..db.schemas import ReporteNominaCreate, EscenarioNomina
+from .catalogo import catalogo_cache, cargar_contexto_nomina
+from .payroll_engine import calcular, con_tarifas, ErrorNomina, ResultadoNomina, CENTAVO
+from ..core.metricas import nominas_calculadas, cronometrar_lote
 from fastapi import HTTPException
+from decimal import ROUND_HALF_UP
+
+def aplicar_resultado(nomina: ReporteNominaCreate, resultado: ResultadoNomina):
+    """Copia los valores calculados sobre la nómina recibida.
+
+    Los totales de devengado, subsidios y descuentos quedan en centavos y cumplen
+    devengado - descuentos = total pagado con los montos tal como se guardan.
+    """
+    for valor, linea in zip(nomina.quincena_valores, resultado.lineas):
+        valor.valor_quincena = linea.valor_quincena
+    nomina.total_pagado = resultado.total_pagado
+    nomina.total_devengado = resultado.total_devengado.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    nomina.total_subsidios = resultado.total_subsidios.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    nomina.total_descuentos = nomina.total_devengado - resultado.total_pagado.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    return nomina
 
 async def calcular_nomina(db: AsyncSession, nomina: ReporteNominaCreate):
     """Calcula la nómina del empleado incluyendo recargos, subsidios y descuentos."""
+    # 1. Empleado, configuración vigente y los tipos que usa la nómina en un solo viaje a la base de datos.
+    # Cuesta lo mismo que comprobar el empleado y no depende de la vigencia del caché de catálogos.
+    catalogo = await cargar_contexto_nomina(db, nomina)
+    if catalogo is None:
+        raise HTTPException(status_code=404, detail="Empleado no encontrado")
+
+    # 2. Calcular valores, subsidios, descuentos y total
     try:
-        # 1. Obtener datos del empleado
-        result = await db.execute(
-            select(Empleado).where(Empleado.id == nomina.empleado_id)
-        )
-        empleado = result.scalar_one_or_none()
-        if not empleado:
-            raise HTTPException(status_code=404, detail="Empleado no encontrado")
-
-        # 2. Obtener configuración de salario vigente
-        result = await db.execute(
-            select(ConfigSalario).order_by(ConfigSalario.año.desc())
-        )
-        config_salario = result.scalar_one_or_none()
-        if not config_salario:
-            raise HTTPException(status_code=404, detail="No hay configuración de salario vigente")
-
-        # 3. Validar fechas
-        if nomina.fecha_inicio > nomina.fecha_fin:
-            raise HTTPException(
-                status_code=400,
-                detail="La fecha de inicio no puede ser mayor que la fecha de fin"
-            )
-
-        # 4. Obtener tipos de recargos
-        recargos_result = await db.execute(select(TipoRecargo))
-        recargos = {r.id: r for r in recargos_result.scalars().all()}
-
-        # 5. Calcular total por quincena
-        total_devengado = Decimal('0')
-        for valor in nomina.quincena_valores:
-            recargo = recargos.get(valor.tipo_recargo_id)
-            if not recargo:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Tipo de recargo {valor.tipo_recargo_id} no encontrado"
-                )
-
-            if recargo.tipo_hora == 'ORDINARIA':
-                # Cálculo de horas ordinarias
-                valor_calculado = (
-                    recargo.valor_hora * 
-                    valor.cantidad_dias * 
-                    config_salario.horas_salario
-                )
-            elif recargo.tipo_hora in ['EXTRA_DIURNA', 'EXTRA_NOCTURNA', 'EXTRA_DOMINICAL_DIURNA', 'EXTRA_DOMINICAL_NOCTURNA']:
-                # Cálculo de horas extras
-                valor_calculado = recargo.valor_hora * valor.cantidad_dias
-            elif recargo.tipo_hora == 'NOCTURNA':
-                # Cálculo de recargo nocturno
-                valor_calculado = (
-                    recargo.valor_hora * 
-                    config_salario.horas_salario * 
-                    valor.cantidad_dias
-                )
-            else:
-                # Cálculo de otros recargos (dominicales y dominicales nocturnos)
-                valor_calculado = recargo.valor_hora * valor.cantidad_dias
-
-            valor.valor_quincena = valor_calculado
-            total_devengado += valor_calculado
-
-        # 6. Aplicar subsidio de transporte si corresponde
-        if nomina.subsidios:
-            subsidios_result = await db.execute(select(TipoSubsidio))
-            subsidios = {s.id: s for s in subsidios_result.scalars().all()}
-            
-            for subsidio_id in nomina.subsidios:
-                subsidio = subsidios.get(subsidio_id)
-                if subsidio:
-                    total_devengado += subsidio.valor
-
-        # 7. Aplicar descuentos (salud y pensión)
-        descuentos_result = await db.execute(select(TipoDescuento))
-        descuentos = {d.id: d for d in descuentos_result.scalars().all()}
-        
-        total_descuentos = Decimal('0')
-        for descuento_id in nomina.descuentos:
-            descuento = descuentos.get(descuento_id)
-            if descuento:
-                total_descuentos += total_devengado * descuento.valor
-
-        # 8. Calcular total final
-        nomina.total_pagado = total_devengado - total_descuentos
-
-        # 9. Validaciones finales
-        if nomina.total_pagado < 0:
-            raise HTTPException(
-                status_code=400,
-                detail="El total a pagar no puede ser negativo"
-            )
-
-        return nomina
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        resultado = calcular(catalogo.config_salario, catalogo, nomina)
+    except ErrorNomina as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    nominas_calculadas.incrementar("individual")
+    return aplicar_resultado(nomina, resultado)
+
+@cronometrar_lote("calcular_nominas_lote")
+async def calcular_nominas_lote(db: AsyncSession, nominas: list[ReporteNominaCreate]):
+    """Calcula un lote de nóminas cargando empleados y catálogos una sola vez.
+
+    Cada nómina usa la configuración y las tarifas vigentes en su fecha de inicio, resueltas
+    en memoria con búsqueda binaria, así un lote que cruza de año no consulta por reporte.
+
+    Devuelve una lista de tuplas ``(nomina, error)`` en el mismo orden recibido:
+    la nómina calculada cuando el cálculo fue exitoso o el detalle del error en caso contrario.
+    """
+    # 1. Obtener todos los empleados del lote en una sola consulta
+    empleado_ids = {nomina.empleado_id for nomina in nominas}
+    result = await db.execute(select(Empleado.id).where(Empleado.id.in_(empleado_ids)))
+    empleados_existentes = set(result.scalars().all())
+
+    # 2. Obtener configuraciones y catálogos una sola vez para todo el lote, indexados por vigencia
+    catalogo = await catalogo_cache.obtener(db)
+    if not any(instantanea.config_salario for instantanea in catalogo.instantaneas):
+        raise HTTPException(status_code=404, detail="No hay configuración de salario vigente")
+
+    # 3. Calcular cada nómina en memoria con la configuración y tarifas de su periodo
+    resultados = []
+    for nomina in nominas:
+        if nomina.empleado_id not in empleados_existentes:
+            resultados.append((None, "Empleado no encontrado"))
+            continue
+        vigente = catalogo.en_fecha(nomina.fecha_inicio)
+        try:
+            resultado = calcular(vigente.config_salario, vigente, nomina)
+        except ErrorNomina as e:
+            resultados.append((None, str(e)))
+            continue
+        resultados.append((aplicar_resultado(nomina, resultado), None))
+
+    nominas_calculadas.incrementar("lote", cantidad=sum(error is None for _, error in resultados))
+    return resultados
+
+
+async def simular_nominas(db: AsyncSession, escenarios: list[EscenarioNomina]):
+    """Calcula escenarios hipotéticos en memoria, sin escribir en la base de datos.
+
+    Todos los escenarios se evalúan contra la misma instantánea del caché de catálogos (solo se
+    consulta la base de datos si el caché está vacío), con las tarifas vigentes en su fecha de
+    inicio y los reemplazos de ``tarifas``. El empleado no se consulta. Devuelve, en el orden
+    recibido, tuplas ``(resultado, error)`` con el ``ResultadoNomina`` o el detalle del error.
+    """
+    catalogo = await catalogo_cache.obtener(db)
+
+    resultados = []
+    for escenario in escenarios:
+        vigente = catalogo.en_fecha(escenario.fecha_inicio)
+        try:
+            if escenario.tarifas is not None:
+                vigente = con_tarifas(vigente, **escenario.tarifas.model_dump())
+            resultados.append((calcular(vigente.config_salario, vigente, escenario), None))
+        except ErrorNomina as e:
+            resultados.append((None, str(e)))
+
+    nominas_calculadas.incrementar("simulacion", cantidad=sum(error is None for _, error in resultados))
+    return resultados
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""Motor de cálculo de nómina sin dependencias de la base de datos.
+
+Las funciones de este módulo son puras y síncronas: reciben la configuración de salario,
+una instantánea de los catálogos y los datos de la quincena, y devuelven el resultado
+sin modificar sus entradas. Pueden usarse en ciclos, en un pool de procesos o en pruebas
+sin necesidad de Postgres.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass, replace
+from datetime import date
+from decimal import Decimal
+from itertools import groupby
+from typing import Optional, Iterable
+import numpy as np
+
+# Tipos de hora que se pagan por hora (las horas ya vienen en cantidad_dias)
+TIPOS_HORA_EXTRA = ('EXTRA_DIURNA', 'EXTRA_NOCTURNA', 'EXTRA_DOMINICAL_DIURNA', 'EXTRA_DOMINICAL_NOCTURNA')
+
+# Tipos de hora que se pagan por jornada completa (días × horas_salario)
+TIPOS_HORA_JORNADA = ('ORDINARIA', 'NOCTURNA')
+
+# Escala de los montos guardados (Numeric(10, 2))
+CENTAVO = Decimal("0.01")
+
+# Copias inmutables de los catálogos, independientes de la sesión de base de datos
+@dataclass(frozen=True)
+class ConfigSalarioInfo:
+    id: int
+    año: str
+    salario_minimo: Decimal
+    horas_semana: int
+    horas_mes: int
+    valor_hora: Decimal
+    horas_salario: Decimal
+    vigente_desde: Optional[date] = None
+
+@dataclass(frozen=True)
+class RecargoInfo:
+    id: int
+    tipo_hora: str
+    porcentaje: Decimal
+    valor_hora: Decimal
+
+@dataclass(frozen=True)
+class SubsidioInfo:
+    id: int
+    tipo: str
+    valor: Decimal
+
+@dataclass(frozen=True)
+class DescuentoInfo:
+    id: int
+    tipo: str
+    valor: Decimal
+
+@dataclass(frozen=True)
+class CatalogoSnapshot:
+    version: int
+    config_salario: Optional[ConfigSalarioInfo]
+    recargos: dict[int, RecargoInfo]
+    subsidios: dict[int, SubsidioInfo]
+    descuentos: dict[int, DescuentoInfo]
+
+@dataclass(frozen=True)
+class CatalogoVigencias:
+    """Instantáneas de los catálogos por intervalo de vigencia.
+
+    ``fechas`` son, ordenadas, las fechas en que cambia la configuración o alguna tarifa.
+    ``instantaneas[0]`` rige antes de ``fechas[0]`` e ``instantaneas[i]`` desde ``fechas[i - 1]``
+    hasta el día anterior a ``fechas[i]``.
+    """
+    version: int
+    fechas: tuple[date, ...]
+    instantaneas: tuple[CatalogoSnapshot, ...]
+
+    def en_fecha(self, fecha: date) -> CatalogoSnapshot:
+        """Instantánea vigente en ``fecha``, por búsqueda binaria."""
+        return self.instantaneas[bisect_right(self.fechas, fecha)]
+
+def indexar_vigencias(
+    version: int,
+    configs: Iterable[ConfigSalarioInfo],
+    recargos: dict[int, RecargoInfo],
+    subsidios: dict[int, SubsidioInfo],
+    descuentos: dict[int, DescuentoInfo],
+    cambios: Iterable[tuple[date, str, object]] = (),
+) -> CatalogoVigencias:
+    """Precalcula la instantánea de cada intervalo de vigencia.
+
+    ``recargos``, ``subsidios`` y ``descuentos`` son las tarifas que rigen antes de cualquier cambio;
+    ``cambios`` son tuplas ``(vigente_desde, catálogo, info)`` donde catálogo es "recargos",
+    "subsidios" o "descuentos" e ``info`` reemplaza desde esa fecha a la tarifa con el mismo id.
+    Cada configuración de salario rige desde su ``vigente_desde`` hasta la siguiente.
+    """
+    eventos = sorted(
+        [(config.vigente_desde, "config", config) for config in configs] + list(cambios),
+        key=lambda evento: evento[0]
+    )
+    actual = {"config": None, "recargos": recargos, "subsidios": subsidios, "descuentos": descuentos}
+
+    def instantanea():
+        return CatalogoSnapshot(version, actual["config"], actual["recargos"], actual["subsidios"], actual["descuentos"])
+
+    fechas, instantaneas = [], [instantanea()]
+    for fecha, grupo in groupby(eventos, key=lambda evento: evento[0]):
+        for _, catalogo, info in grupo:
+            # Los diccionarios se copian al cambiar para no alterar las instantáneas anteriores
+            actual[catalogo] = info if catalogo == "config" else {**actual[catalogo], info.id: info}
+        fechas.append(fecha)
+        instantaneas.append(instantanea())
+    return CatalogoVigencias(version, tuple(fechas), tuple(instantaneas))
+
+def con_tarifas(
+    catalogo: CatalogoSnapshot,
+    horas_salario: Optional[Decimal] = None,
+    recargos: Optional[dict[int, Decimal]] = None,
+    subsidios: Optional[dict[int, Decimal]] = None,
+    descuentos: Optional[dict[int, Decimal]] = None,
+) -> CatalogoSnapshot:
+    """Copia de ``catalogo`` con tarifas reemplazadas, para simular escenarios.
+
+    ``recargos`` reemplaza el valor_hora y ``subsidios``/``descuentos`` el valor de cada id;
+    un id que no exista en el catálogo lanza ``CatalogoNoEncontrado``.
+    """
+    def reemplazar(actuales: dict, nuevos: Optional[dict], campo: str, nombre: str) -> dict:
+        if not nuevos:
+            return actuales
+        _validar_ids(nuevos, actuales, nombre)
+        return {**actuales, **{i: replace(actuales[i], **{campo: valor}) for i, valor in nuevos.items()}}
+
+    config = catalogo.config_salario
+    if config is not None and horas_salario is not None:
+        config = replace(config, horas_salario=horas_salario)
+    return replace(
+        catalogo,
+        config_salario=config,
+        recargos=reemplazar(catalogo.recargos, recargos, "valor_hora", "recargo"),
+        subsidios=reemplazar(catalogo.subsidios, subsidios, "valor", "subsidio"),
+        descuentos=reemplazar(catalogo.descuentos, descuentos, "valor", "descuento"),
+    )
+
+# Resultado del cálculo
+@dataclass(frozen=True)
+class LineaCalculada:
+    tipo_recargo_id: int
+    tipo_hora: str
+    cantidad_dias: int
+    valor_quincena: Decimal
+
+@dataclass(frozen=True)
+class ResultadoNomina:
+    lineas: tuple[LineaCalculada, ...]
+    total_devengado: Decimal
+    total_subsidios: Decimal
+    total_descuentos: Decimal
+    total_pagado: Decimal
+
+# Errores del cálculo; status_code indica el código HTTP equivalente
+class ErrorNomina(Exception):
+    status_code = 400
+
+class NominaInvalida(ErrorNomina):
+    status_code = 400
+
+class CatalogoNoEncontrado(ErrorNomina):
+    status_code = 404
+
+def valor_linea(tipo_hora: str, valor_hora: Decimal, cantidad_dias: int, horas_salario: Decimal) -> Decimal:
+    """Calcula el valor de una línea de la quincena según su tipo de hora."""
+    if tipo_hora in TIPOS_HORA_JORNADA:
+        # Horas ordinarias y recargo nocturno: se pagan por jornada completa
+        return valor_hora * cantidad_dias * horas_salario
+    # Horas extras, dominicales y dominicales nocturnas: cantidad_dias son horas
+    return valor_hora * cantidad_dias
+
+def calcular(
+    config: Optional[ConfigSalarioInfo],
+    catalogo: CatalogoSnapshot,
+    nomina,
+) -> ResultadoNomina:
+    """Calcula una nómina con los catálogos ya cargados en memoria.
+
+    ``nomina`` es cualquier objeto con los campos de ``ReporteNominaCreate``.
+    """
+    if config is None:
+        raise CatalogoNoEncontrado("No hay configuración de salario vigente")
+
+    # Validar fechas
+    if nomina.fecha_inicio > nomina.fecha_fin:
+        raise NominaInvalida("La fecha de inicio no puede ser mayor que la fecha de fin")
+
+    # Validar que los recargos aplicados existan
+    _validar_ids(nomina.recargos, catalogo.recargos, "recargo")
+
+    # Calcular total por quincena
+    lineas = []
+    total_devengado = Decimal('0')
+    for valor in nomina.quincena_valores:
+        recargo = catalogo.recargos.get(valor.tipo_recargo_id)
+        if not recargo:
+            raise CatalogoNoEncontrado(f"Tipo de recargo {valor.tipo_recargo_id} no encontrado")
+
+        valor_calculado = valor_linea(recargo.tipo_hora, recargo.valor_hora, valor.cantidad_dias, config.horas_salario)
+        lineas.append(LineaCalculada(valor.tipo_recargo_id, recargo.tipo_hora, valor.cantidad_dias, valor_calculado))
+        total_devengado += valor_calculado
+
+    # Aplicar subsidios (transporte)
+    _validar_ids(nomina.subsidios, catalogo.subsidios, "subsidio")
+    total_subsidios = sum((catalogo.subsidios[s].valor for s in nomina.subsidios or []), Decimal('0'))
+    total_devengado += total_subsidios
+
+    # Aplicar descuentos (salud y pensión) sobre el total devengado
+    _validar_ids(nomina.descuentos, catalogo.descuentos, "descuento")
+    total_descuentos = sum(
+        (total_devengado * catalogo.descuentos[d].valor for d in nomina.descuentos or []), Decimal('0')
+    )
+
+    # Calcular total final
+    total_pagado = total_devengado - total_descuentos
+    if total_pagado < 0:
+        raise NominaInvalida("El total a pagar no puede ser negativo")
+
+    return ResultadoNomina(
+        lineas=tuple(lineas),
+        total_devengado=total_devengado,
+        total_subsidios=total_subsidios,
+        total_descuentos=total_descuentos,
+        total_pagado=total_pagado
+    )
+
+def _validar_ids(ids: Optional[Iterable[int]], catalogo: dict, nombre: str):
+    for catalogo_id in ids or []:
+        if catalogo_id not in catalogo:
+            raise CatalogoNoEncontrado(f"Tipo de {nombre} {catalogo_id} no encontrado")
+
+def recalcular_centavos(
+    reporte_idx: np.ndarray,
+    cantidad_dias: np.ndarray,
+    valor_hora_c: np.ndarray,
+    es_jornada: np.ndarray,
+    horas_salario_c,
+    subsidios_c: np.ndarray,
+    descuentos_c: np.ndarray,
+):
+    """Versión vectorizada de ``valor_linea`` y ``calcular`` en aritmética entera.
+
+    Los montos llegan en centavos (``Numeric(10, 2)`` × 100) y los porcentajes de descuento
+    en centésimas. Las líneas se acumulan sin redondear (diezmilésimas) y los descuentos se
+    aplican sobre el devengado exacto, igual que con ``Decimal``; el redondeo final a centavos
+    es mitad hacia arriba, como el que hace Postgres al guardar en ``Numeric(10, 2)``.
+
+    ``reporte_idx`` indica, por línea, la posición del reporte en ``subsidios_c``/``descuentos_c``.
+    ``horas_salario_c`` es un escalar o un arreglo por línea cuando los reportes tienen distinta vigencia.
+    Devuelve ``(valores_c, totales_c, devengados_c)``: el valor de cada línea y el total pagado y
+    el total devengado (con subsidios) de cada reporte.
+    """
+    horas_c = np.where(es_jornada, horas_salario_c, 100)
+    lineas_e4 = valor_hora_c.astype(np.int64) * cantidad_dias * horas_c
+    valores_c = _redondear(lineas_e4, 100)
+
+    devengado_e4 = np.zeros(len(subsidios_c), dtype=np.int64)
+    np.add.at(devengado_e4, reporte_idx, lineas_e4)
+    devengado_e4 += subsidios_c.astype(np.int64) * 100
+
+    totales_e6 = devengado_e4 * (100 - descuentos_c.astype(np.int64))
+    return valores_c, _redondear(totales_e6, 10000), _redondear(devengado_e4, 100)
+
+def _redondear(valores: np.ndarray, divisor: int) -> np.ndarray:
+    """Divide enteros redondeando la mitad lejos de cero."""
+    mitad = divisor // 2
+    return np.where(valores >= 0, (valores + mitad) // divisor, -((-valores + mitad) // divisor))
@@ -0,0 +1,224 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, values, column, exists, func, Numeric
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from decimal import Decimal
+from uuid import UUID
+from fastapi import HTTPException
+import numpy as np
+from ..db.models import (
+    ReporteNomina, QuincenaValor, ReporteNominaSubsidio, ReporteNominaDescuento
+)
+from ..db.schemas import RecalculoNominaRequest
+from .catalogo import cargar_catalogo
+from .payroll_engine import recalcular_centavos, TIPOS_HORA_JORNADA
+from .resumen_nominas import refrescar_resumen
+from .acumulados_nominas import sumar_acumulados, TOTALES
+from .cache_backend import cache_backend
+from ..core.metricas import nominas_calculadas, cronometrar_lote
+
+# Filas por sentencia UPDATE ... FROM VALUES (2 parámetros por fila, asyncpg admite 32767)
+TAMAÑO_BLOQUE = 5000
+
+def _centavos(valor: Decimal) -> int:
+    return int(valor * 100)
+
+def _decimal(centavos) -> Decimal:
+    return Decimal(int(centavos)).scaleb(-2)
+
+def _filtro_reportes(parametros: RecalculoNominaRequest):
+    """Condiciones que seleccionan los reportes afectados por la corrección."""
+    condiciones = []
+    if parametros.fecha_desde is not None:
+        condiciones.append(ReporteNomina.fecha_inicio >= parametros.fecha_desde)
+    if parametros.fecha_hasta is not None:
+        condiciones.append(ReporteNomina.fecha_inicio <= parametros.fecha_hasta)
+    if parametros.empleado_ids:
+        condiciones.append(ReporteNomina.empleado_id.in_(parametros.empleado_ids))
+    if parametros.tipo_recargo_ids:
+        condiciones.append(exists().where(
+            QuincenaValor.reporte_nomina_id == ReporteNomina.id,
+            QuincenaValor.tipo_recargo_id.in_(parametros.tipo_recargo_ids)
+        ))
+    return condiciones
+
+async def empleados_afectados(db: AsyncSession, parametros: RecalculoNominaRequest) -> list[UUID]:
+    """Empleados con reportes alcanzados por el recálculo, ordenados; permiten repartirlo por bloques."""
+    result = await db.execute(
+        select(ReporteNomina.empleado_id).where(*_filtro_reportes(parametros))
+        .distinct().order_by(ReporteNomina.empleado_id)
+    )
+    return list(result.scalars().all())
+
+async def _actualizar_por_bloques(db: AsyncSession, modelo, columna: str, filas: list[tuple]):
+    """Escribe los valores nuevos con UPDATE ... FROM (VALUES ...) en bloques."""
+    for inicio in range(0, len(filas), TAMAÑO_BLOQUE):
+        nuevos = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("valor", Numeric(10, 2)),
+            name="nuevos"
+        ).data(filas[inicio:inicio + TAMAÑO_BLOQUE])
+        await db.execute(
+            update(modelo)
+            .where(modelo.id == nuevos.c.id)
+            .values({columna: nuevos.c.valor})
+            .execution_options(synchronize_session=False)
+        )
+
+@cronometrar_lote("recalcular_nominas")
+async def recalcular_nominas(db: AsyncSession, parametros: RecalculoNominaRequest):
+    """Recalcula en bloque los valores de quincena y el total pagado de los reportes guardados.
+
+    Carga todas las líneas afectadas en una consulta, resuelve para cada reporte la
+    configuración y las tarifas vigentes en su fecha de inicio, calcula columna a columna en
+    centavos enteros y escribe solo las filas que cambiaron, junto con la diferencia en los
+    acumulados del año. Con ``dry_run`` no escribe nada y solo devuelve las diferencias.
+    """
+    try:
+        # Catálogos leídos directamente de la base de datos para usar los valores recién corregidos
+        catalogo = await cargar_catalogo(db)
+
+        condiciones = _filtro_reportes(parametros)
+
+        # 1. Reportes afectados con los subsidios y descuentos que aplicaron
+        subsidios = (
+            select(func.array_agg(ReporteNominaSubsidio.tipo_subsidio_id))
+            .where(ReporteNominaSubsidio.reporte_nomina_id == ReporteNomina.id)
+            .scalar_subquery()
+        )
+        descuentos = (
+            select(func.array_agg(ReporteNominaDescuento.tipo_descuento_id))
+            .where(ReporteNominaDescuento.reporte_nomina_id == ReporteNomina.id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(
+                ReporteNomina.id,
+                ReporteNomina.total_pagado,
+                subsidios,
+                descuentos,
+                ReporteNomina.empleado_id,
+                ReporteNomina.fecha_inicio,
+                ReporteNomina.total_devengado,
+                ReporteNomina.total_subsidios,
+                ReporteNomina.total_descuentos
+            ).where(*condiciones)
+        )
+        reportes = result.all()
+        posicion = {fila[0]: i for i, fila in enumerate(reportes)}
+
+        # Configuración y tarifas vigentes en el periodo de cada reporte
+        vigentes = [catalogo.en_fecha(r[5]) for r in reportes]
+        sin_config = [r[5] for r, vigente in zip(reportes, vigentes) if vigente.config_salario is None]
+        if sin_config:
+            raise HTTPException(status_code=404, detail=f"No hay configuración de salario vigente para el {sin_config[0]}")
+
+        # 2. Todas las líneas de esos reportes en una sola consulta
+        result = await db.execute(
+            select(
+                QuincenaValor.id,
+                QuincenaValor.reporte_nomina_id,
+                QuincenaValor.tipo_recargo_id,
+                QuincenaValor.cantidad_dias,
+                QuincenaValor.valor_quincena
+            )
+            .join(ReporteNomina, ReporteNomina.id == QuincenaValor.reporte_nomina_id)
+            .where(*condiciones)
+        )
+        lineas = result.all()
+
+        # 3. Columnas en enteros
+        sin_recargo = [l[2] for l in lineas if l[2] not in vigentes[posicion[l[1]]].recargos]
+        if sin_recargo:
+            raise HTTPException(status_code=404, detail=f"Tipo de recargo {sin_recargo[0]} no encontrado")
+        recargos = [vigentes[posicion[l[1]]].recargos[l[2]] for l in lineas]
+
+        subsidios_c = np.fromiter(
+            (_centavos(sum((v.subsidios[i].valor for i in r[2] or []), Decimal(0))) for r, v in zip(reportes, vigentes)),
+            dtype=np.int64, count=len(reportes)
+        )
+        valores_c, totales_c, devengados_c = recalcular_centavos(
+            reporte_idx=np.fromiter((posicion[l[1]] for l in lineas), dtype=np.int64, count=len(lineas)),
+            cantidad_dias=np.fromiter((l[3] for l in lineas), dtype=np.int64, count=len(lineas)),
+            valor_hora_c=np.fromiter((_centavos(r.valor_hora) for r in recargos), dtype=np.int64, count=len(lineas)),
+            es_jornada=np.fromiter((r.tipo_hora in TIPOS_HORA_JORNADA for r in recargos), dtype=bool, count=len(lineas)),
+            horas_salario_c=np.fromiter(
+                (_centavos(vigentes[posicion[l[1]]].config_salario.horas_salario) for l in lineas), dtype=np.int64, count=len(lineas)
+            ),
+            subsidios_c=subsidios_c,
+            descuentos_c=np.fromiter(
+                (_centavos(sum((v.descuentos[i].valor for i in r[3] or []), Decimal(0))) for r, v in zip(reportes, vigentes)),
+                dtype=np.int64, count=len(reportes)
+            ),
+        )
+        # Totales por reporte en el orden de TOTALES: devengado, subsidios, descuentos y pagado
+        nuevos_c = np.stack([devengados_c, subsidios_c, devengados_c - totales_c, totales_c], axis=1)
+
+        nominas_calculadas.incrementar("recalculo", cantidad=len(reportes))
+
+        # 4. Diferencias contra lo guardado
+        anteriores_lineas_c = np.fromiter((_centavos(l[4]) for l in lineas), dtype=np.int64, count=len(lineas))
+        anteriores_totales_c = np.fromiter((_centavos(r[1]) for r in reportes), dtype=np.int64, count=len(reportes))
+        anteriores_c = np.array(
+            [[_centavos(r[6]), _centavos(r[7]), _centavos(r[8]), _centavos(r[1])] for r in reportes], dtype=np.int64
+        ).reshape(len(reportes), 4)
+        totales_cambiados = nuevos_c != anteriores_c
+
+        lineas_cambiadas = np.flatnonzero(valores_c != anteriores_lineas_c)
+        reportes_cambiados = np.flatnonzero(totales_c != anteriores_totales_c)
+        lineas_por_reporte = np.bincount(
+            np.fromiter((posicion[lineas[i][1]] for i in lineas_cambiadas), dtype=np.int64, count=len(lineas_cambiadas)),
+            minlength=len(reportes)
+        )
+        # Un reporte se considera modificado si cambió alguno de sus totales o alguna de sus líneas
+        modificados = np.flatnonzero(totales_cambiados.any(axis=1) | (lineas_por_reporte > 0))
+
+        # Un total negativo no es válido; esos reportes se informan pero no se escriben
+        negativos = set(np.flatnonzero(totales_c < 0).tolist())
+
+        diferencias = [
+            {
+                "reporte_nomina_id": reportes[i][0],
+                "empleado_id": reportes[i][4],
+                "total_anterior": reportes[i][1],
+                "total_nuevo": _decimal(totales_c[i]),
+                "lineas_modificadas": int(lineas_por_reporte[i]),
+                "error": "El total a pagar no puede ser negativo" if i in negativos else None
+            }
+            for i in modificados
+        ]
+
+        # 5. Escritura en bloque, salvo en modo de simulación
+        if not parametros.dry_run:
+            await _actualizar_por_bloques(db, QuincenaValor, "valor_quincena", [
+                (lineas[i][0], _decimal(valores_c[i]))
+                for i in lineas_cambiadas if posicion[lineas[i][1]] not in negativos
+            ])
+            await _actualizar_por_bloques(db, ReporteNomina, "total_pagado", [
+                (reportes[i][0], _decimal(totales_c[i]))
+                for i in reportes_cambiados if i not in negativos
+            ])
+            for j, columna in enumerate(TOTALES[:3]):
+                await _actualizar_por_bloques(db, ReporteNomina, columna, [
+                    (reportes[i][0], _decimal(nuevos_c[i, j]))
+                    for i in np.flatnonzero(totales_cambiados[:, j]) if i not in negativos
+                ])
+            escritos = [i for i in modificados if i not in negativos]
+            await refrescar_resumen(db, [reportes[i][0] for i in escritos])
+            await sumar_acumulados(db, [
+                (reportes[i][4], reportes[i][5].year, 0, *(_decimal(d) for d in nuevos_c[i] - anteriores_c[i]))
+                for i in escritos
+            ])
+            await db.commit()
+            await cache_backend.invalidar("nominas")
+
+        return {
+            "dry_run": parametros.dry_run,
+            "reportes_evaluados": len(reportes),
+            "reportes_modificados": len(diferencias),
+            "lineas_modificadas": int(lineas_por_reporte.sum()),
+            "diferencias": diferencias
+        }
+
+    except Exception as e:
+        await db.rollback()
+        raise e
@@ -1,66 +1,62 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from fastapi import HTTPException
+from typing import Optional
+from datetime import date
 from uuid import UUID
+import csv
+import io
+import json
+from .paginacion import codificar_cursor, decodificar_cursor, LIMITE_POR_DEFECTO
+from .resumen_nominas import COLUMNAS
 
-# Función para obtener todos los reportes de nóminas
-async def obtener_reporte_nominas(db: AsyncSession):
-    query = text("""
-    SELECT
-        rn.id,
-        rn.empleado_id,
-        e.cedula,
-        e.nombres,
-        e.apellidos,
-        e.telefono,
-        e.puesto_trabajo,
-        rn.fecha_inicio,
-        rn.fecha_fin,
-
-        -- Descuentos
-        COALESCE(
-            STRING_AGG(DISTINCT td.tipo, '\n') 
-            FILTER (WHERE td.tipo IS NOT NULL), 'Sin descuentos'
-        ) AS descuentos_aplicados,
-
-        -- Subsidios
-        COALESCE(
-            STRING_AGG(DISTINCT ts.tipo, '\n') 
-            FILTER (WHERE ts.tipo IS NOT NULL), 'Sin subsidios'
-        ) AS subsidios_aplicados,
-
-        -- Recargos y Valores de Quincena
-        COALESCE(
-            STRING_AGG(DISTINCT tr.tipo_hora || ' ' || qv.cantidad_dias::text || ' días $ ' || qv.valor_quincena::text, '\n') 
-            FILTER (WHERE tr.tipo_hora IS NOT NULL), 'Sin recargos'
-        ) AS recargos_y_valores,
-
-        rn.total_pagado
-
-    FROM reportes_nominas rn
-    INNER JOIN empleados e ON e.id = rn.empleado_id
-    LEFT JOIN reportes_nominas_descuentos rnd ON rn.id = rnd.reporte_nomina_id
-    LEFT JOIN tipos_descuentos td ON rnd.tipo_descuento_id = td.id
-    LEFT JOIN reportes_nominas_recargos rnr ON rn.id = rnr.reporte_nomina_id
-    LEFT JOIN tipos_recargos tr ON rnr.tipo_recargo_id = tr.id
-    LEFT JOIN quincena_valores qv ON rn.id = qv.reporte_nomina_id AND tr.id = qv.tipo_recargo_id
-    LEFT JOIN reportes_nominas_subsidios rns ON rn.id = rns.reporte_nomina_id
-    LEFT JOIN tipos_subsidios ts ON rns.tipo_subsidio_id = ts.id
-
-    GROUP BY 
-        rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos,
-        e.telefono, e.puesto_trabajo, rn.fecha_inicio, rn.fecha_fin,
-        rn.total_pagado
-
-    ORDER BY rn.fecha_inicio DESC;
+# Filas que se traen del cursor del servidor en cada viaje durante la exportación
+FILAS_POR_BLOQUE_EXPORTACION = 1000
+
+FORMATOS_EXPORTACION = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+def consulta_reporte_nominas(where: str = "", limitar: bool = True):
+    """Consulta del listado de nóminas sobre reportes_nominas_resumen, filtrada por ``where``.
+
+    El resumen ya trae las colecciones agregadas y los datos del empleado, así que cada página
+    es un recorrido por índice de una sola tabla.
+    """
+    return text(f"""
+    SELECT {COLUMNAS}
+    FROM reportes_nominas_resumen r
+    {where}
+    ORDER BY r.fecha_inicio DESC, r.id DESC
+    {"LIMIT :limite" if limitar else ""};
     """)
 
-    result = await db.execute(query)
-    rows = result.fetchall()
-    return [dict(row._mapping) for row in rows]
+def _filtros_reporte_nominas(
+    empleado_id: Optional[UUID],
+    fecha_desde: Optional[date],
+    fecha_hasta: Optional[date],
+    puesto_trabajo: Optional[str],
+):
+    """Condiciones SQL y parámetros de los filtros comunes al listado y a la exportación."""
+    condiciones = []
+    parametros = {}
+    if empleado_id is not None:
+        condiciones.append("r.empleado_id = :empleado_id")
+        parametros["empleado_id"] = empleado_id
+    if fecha_desde is not None:
+        condiciones.append("r.fecha_inicio >= :fecha_desde")
+        parametros["fecha_desde"] = fecha_desde
+    if fecha_hasta is not None:
+        condiciones.append("r.fecha_inicio <= :fecha_hasta")
+        parametros["fecha_hasta"] = fecha_hasta
+    if puesto_trabajo is not None:
+        condiciones.append("r.puesto_trabajo = :puesto_trabajo")
+        parametros["puesto_trabajo"] = puesto_trabajo
+    return condiciones, parametros
 
-# Función para obtener un reporte de nómina por su ID
-async def obtener_reporte_nomina(db: AsyncSession, nomina_id: UUID):
-    query = text("""
+# Consulta de un reporte de nómina con sus colecciones como arreglos JSON
+CONSULTA_REPORTE_NOMINA = text("""
 SELECT
     rn.id,
     rn.empleado_id,
@@ -72,50 +68,137 @@ SELECT
     rn.fecha_inicio,
     rn.fecha_fin,
     rn.total_pagado,
-    
-    -- Array de objetos quincena_valores con tipo_recargo_id
-    COALESCE(
-        JSONB_AGG(
-            DISTINCT jsonb_build_object(
-                'tipo_recargo_id', qv.tipo_recargo_id,
-                'cantidad_dias', qv.cantidad_dias,
-                'valor_quincena', qv.valor_quincena
-            )
-        ) FILTER (WHERE qv.tipo_recargo_id IS NOT NULL), '[]'::jsonb
-    ) AS quincena_valores,
-
-    -- Lista de IDs de recargos aplicados
-    COALESCE(
-        JSONB_AGG(DISTINCT tr.id) FILTER (WHERE tr.id IS NOT NULL), '[]'::jsonb
-    ) AS recargos,
-
-    -- Lista de IDs de descuentos aplicados
-    COALESCE(
-        JSONB_AGG(DISTINCT td.id) FILTER (WHERE td.id IS NOT NULL), '[]'::jsonb
-    ) AS descuentos,
-
-    -- Lista de IDs de subsidios aplicados
-    COALESCE(
-        JSONB_AGG(DISTINCT ts.id) FILTER (WHERE ts.id IS NOT NULL), '[]'::jsonb
-    ) AS subsidios
+    COALESCE(q.quincena_valores, '[]'::jsonb) AS quincena_valores,
+    COALESCE(r.recargos, '[]'::jsonb) AS recargos,
+    COALESCE(d.descuentos, '[]'::jsonb) AS descuentos,
+    COALESCE(s.subsidios, '[]'::jsonb) AS subsidios
 
 FROM reportes_nominas rn
 INNER JOIN empleados e ON e.id = rn.empleado_id
-LEFT JOIN reportes_nominas_descuentos rnd ON rn.id = rnd.reporte_nomina_id
-LEFT JOIN tipos_descuentos td ON rnd.tipo_descuento_id = td.id
-LEFT JOIN reportes_nominas_recargos rnr ON rn.id = rnr.reporte_nomina_id
-LEFT JOIN tipos_recargos tr ON rnr.tipo_recargo_id = tr.id
-LEFT JOIN quincena_valores qv ON rn.id = qv.reporte_nomina_id AND tr.id = qv.tipo_recargo_id
-LEFT JOIN reportes_nominas_subsidios rns ON rn.id = rns.reporte_nomina_id
-LEFT JOIN tipos_subsidios ts ON rns.tipo_subsidio_id = ts.id
-WHERE rn.id = :nomina_id
-GROUP BY 
-    rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos,
-    e.telefono, e.puesto_trabajo, rn.fecha_inicio, rn.fecha_fin,
-    rn.total_pagado;
-    """)
-    
-    result = await db.execute(query, {"nomina_id": nomina_id})
+
+-- Array de objetos quincena_valores con tipo_recargo_id
+LEFT JOIN LATERAL (
+    SELECT JSONB_AGG(
+        DISTINCT jsonb_build_object(
+            'tipo_recargo_id', qv.tipo_recargo_id,
+            'cantidad_dias', qv.cantidad_dias,
+            'valor_quincena', qv.valor_quincena
+        )
+    ) AS quincena_valores
+    FROM reportes_nominas_recargos rnr
+    INNER JOIN quincena_valores qv ON qv.reporte_nomina_id = rnr.reporte_nomina_id AND qv.tipo_recargo_id = rnr.tipo_recargo_id
+    WHERE rnr.reporte_nomina_id = rn.id
+) q ON TRUE
+
+-- Lista de IDs de recargos aplicados
+LEFT JOIN LATERAL (
+    SELECT JSONB_AGG(DISTINCT rnr.tipo_recargo_id) AS recargos
+    FROM reportes_nominas_recargos rnr
+    WHERE rnr.reporte_nomina_id = rn.id
+) r ON TRUE
+
+-- Lista de IDs de descuentos aplicados
+LEFT JOIN LATERAL (
+    SELECT JSONB_AGG(DISTINCT rnd.tipo_descuento_id) AS descuentos
+    FROM reportes_nominas_descuentos rnd
+    WHERE rnd.reporte_nomina_id = rn.id
+) d ON TRUE
+
+-- Lista de IDs de subsidios aplicados
+LEFT JOIN LATERAL (
+    SELECT JSONB_AGG(DISTINCT rns.tipo_subsidio_id) AS subsidios
+    FROM reportes_nominas_subsidios rns
+    WHERE rns.reporte_nomina_id = rn.id
+) s ON TRUE
+
+WHERE rn.id = :nomina_id;
+""")
+
+# Función para obtener una página de reportes de nóminas
+async def obtener_reporte_nominas(
+    db: AsyncSession,
+    limite: int = LIMITE_POR_DEFECTO,
+    cursor: Optional[str] = None,
+    empleado_id: Optional[UUID] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    puesto_trabajo: Optional[str] = None,
+):
+    """Devuelve los reportes ordenados por (fecha_inicio, id) descendente, paginados por cursor.
+
+    Se lee de reportes_nominas_resumen, que las rutas de escritura mantienen al día.
+    """
+    condiciones, parametros = _filtros_reporte_nominas(empleado_id, fecha_desde, fecha_hasta, puesto_trabajo)
+    parametros["limite"] = limite + 1
+
+    if cursor is not None:
+        fecha_cursor, id_cursor = decodificar_cursor(cursor, 2)
+        try:
+            parametros["fecha_cursor"] = date.fromisoformat(fecha_cursor)
+            parametros["id_cursor"] = UUID(id_cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        condiciones.append("(r.fecha_inicio, r.id) < (CAST(:fecha_cursor AS date), CAST(:id_cursor AS uuid))")
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    query = consulta_reporte_nominas(where)
+
+    result = await db.execute(query, parametros)
+    items = [dict(row._mapping) for row in result.fetchall()]
+
+    # Se pidió un elemento de más para saber si hay una página siguiente
+    next_cursor = None
+    if len(items) > limite:
+        items = items[:limite]
+        next_cursor = codificar_cursor(items[-1]["fecha_inicio"], items[-1]["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
+
+def _bloque_csv(filas, encabezado: bool = False) -> str:
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    if encabezado:
+        escritor.writerow(COLUMNAS.split(", "))
+    escritor.writerows(filas)
+    return salida.getvalue()
+
+def _bloque_ndjson(filas) -> str:
+    return "".join(
+        json.dumps(dict(fila._mapping), default=str, ensure_ascii=False) + "\n"
+        for fila in filas
+    )
+
+async def exportar_reporte_nominas(
+    Sesion,
+    formato: str,
+    empleado_id: Optional[UUID] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    puesto_trabajo: Optional[str] = None,
+):
+    """Genera el listado completo de nóminas en CSV o NDJSON, un bloque de filas a la vez.
+
+    Las filas se leen con un cursor del servidor, así que la memoria no crece con el historial.
+    Abre su propia sesión con ``Sesion`` porque se consume después de que la ruta retorna.
+    """
+    condiciones, parametros = _filtros_reporte_nominas(empleado_id, fecha_desde, fecha_hasta, puesto_trabajo)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    query = consulta_reporte_nominas(where, limitar=False)
+
+    if formato == "csv":
+        yield _bloque_csv([], encabezado=True)
+
+    async with Sesion() as db:
+        result = await db.stream(
+            query, parametros, execution_options={"yield_per": FILAS_POR_BLOQUE_EXPORTACION}
+        )
+        async for filas in result.partitions(FILAS_POR_BLOQUE_EXPORTACION):
+            yield _bloque_csv(filas) if formato == "csv" else _bloque_ndjson(filas)
+
+# Función para obtener un reporte de nómina por su ID
+async def obtener_reporte_nomina(db: AsyncSession, nomina_id: UUID):
+    result = await db.execute(CONSULTA_REPORTE_NOMINA, {"nomina_id": nomina_id})
     row = result.fetchone()
     if row is None:
         return None
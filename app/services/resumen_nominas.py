@@ -0,0 +1,148 @@
+"""Mantenimiento de reportes_nominas_resumen, el modelo de lectura del listado de nóminas.
+
+Las rutas de escritura llaman a ``refrescar_resumen`` dentro de su misma transacción, de modo
+que el listado nunca ve un reporte sin su resumen. Las que cambian datos copiados en el resumen
+(el nombre de un empleado o de un tipo de catálogo) refrescan los reportes que los usan. Para
+reconstruir la tabla completa:
+
+    python -m app.services.resumen_nominas
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from uuid import UUID
+import asyncio
+
+COLUMNAS = (
+    "id, empleado_id, cedula, nombres, apellidos, telefono, puesto_trabajo, "
+    "fecha_inicio, fecha_fin, descuentos_aplicados, subsidios_aplicados, recargos_y_valores, total_pagado"
+)
+
+def consulta_agregada(filtro: str) -> str:
+    """SELECT con las columnas del resumen para los reportes que cumplen ``filtro``.
+
+    Cada colección hija se agrega por separado, limitada a los reportes seleccionados, y luego
+    se une por reporte: un reporte con d descuentos, r recargos y s subsidios procesa
+    d + r + s filas y no d × r × s.
+    """
+    return f"""
+    WITH reportes AS (
+        SELECT rn.id FROM reportes_nominas rn WHERE {filtro}
+    ),
+
+    -- Descuentos
+    descuentos AS (
+        SELECT rnd.reporte_nomina_id, STRING_AGG(DISTINCT td.tipo, '\n') AS descuentos_aplicados
+        FROM reportes_nominas_descuentos rnd
+        INNER JOIN tipos_descuentos td ON td.id = rnd.tipo_descuento_id
+        WHERE rnd.reporte_nomina_id IN (SELECT id FROM reportes)
+        GROUP BY rnd.reporte_nomina_id
+    ),
+
+    -- Subsidios
+    subsidios AS (
+        SELECT rns.reporte_nomina_id, STRING_AGG(DISTINCT ts.tipo, '\n') AS subsidios_aplicados
+        FROM reportes_nominas_subsidios rns
+        INNER JOIN tipos_subsidios ts ON ts.id = rns.tipo_subsidio_id
+        WHERE rns.reporte_nomina_id IN (SELECT id FROM reportes)
+        GROUP BY rns.reporte_nomina_id
+    ),
+
+    -- Recargos y Valores de Quincena
+    recargos AS (
+        SELECT
+            rnr.reporte_nomina_id,
+            STRING_AGG(DISTINCT tr.tipo_hora || ' ' || qv.cantidad_dias::text || ' días $ ' || qv.valor_quincena::text, '\n') AS recargos_y_valores
+        FROM reportes_nominas_recargos rnr
+        INNER JOIN tipos_recargos tr ON tr.id = rnr.tipo_recargo_id
+        LEFT JOIN quincena_valores qv ON qv.reporte_nomina_id = rnr.reporte_nomina_id AND qv.tipo_recargo_id = tr.id
+        WHERE rnr.reporte_nomina_id IN (SELECT id FROM reportes)
+        GROUP BY rnr.reporte_nomina_id
+    )
+
+    SELECT
+        rn.id,
+        rn.empleado_id,
+        e.cedula,
+        e.nombres,
+        e.apellidos,
+        e.telefono,
+        e.puesto_trabajo,
+        rn.fecha_inicio,
+        rn.fecha_fin,
+        COALESCE(d.descuentos_aplicados, 'Sin descuentos') AS descuentos_aplicados,
+        COALESCE(s.subsidios_aplicados, 'Sin subsidios') AS subsidios_aplicados,
+        COALESCE(r.recargos_y_valores, 'Sin recargos') AS recargos_y_valores,
+        rn.total_pagado
+
+    FROM reportes
+    INNER JOIN reportes_nominas rn ON rn.id = reportes.id
+    INNER JOIN empleados e ON e.id = rn.empleado_id
+    LEFT JOIN descuentos d ON d.reporte_nomina_id = rn.id
+    LEFT JOIN subsidios s ON s.reporte_nomina_id = rn.id
+    LEFT JOIN recargos r ON r.reporte_nomina_id = rn.id
+    """
+
+def _upsert(filtro: str) -> str:
+    actualizar = ", ".join(f"{c} = EXCLUDED.{c}" for c in COLUMNAS.split(", ")[1:])
+    return f"""
+    INSERT INTO reportes_nominas_resumen ({COLUMNAS})
+    {consulta_agregada(filtro)}
+    ON CONFLICT (id) DO UPDATE SET {actualizar}
+    """
+
+_REFRESCAR_REPORTES = text(_upsert("rn.id = ANY(:nomina_ids)")).bindparams(
+    bindparam("nomina_ids", type_=ARRAY(PG_UUID(as_uuid=True)))
+)
+_REFRESCAR_EMPLEADOS = text(_upsert("rn.empleado_id = ANY(:empleado_ids)")).bindparams(
+    bindparam("empleado_ids", type_=ARRAY(PG_UUID(as_uuid=True)))
+)
+# Tabla de enlace y columna por la que cada catálogo llega a los reportes
+_ENLACES_TIPO = {
+    "tipos_recargos": ("reportes_nominas_recargos", "tipo_recargo_id"),
+    "tipos_descuentos": ("reportes_nominas_descuentos", "tipo_descuento_id"),
+    "tipos_subsidios": ("reportes_nominas_subsidios", "tipo_subsidio_id"),
+}
+_REFRESCAR_POR_TIPO = {
+    recurso: text(_upsert(f"rn.id IN (SELECT reporte_nomina_id FROM {tabla} WHERE {columna} = :tipo_id)"))
+    for recurso, (tabla, columna) in _ENLACES_TIPO.items()
+}
+_RECONSTRUIR = text(f"INSERT INTO reportes_nominas_resumen ({COLUMNAS}) {consulta_agregada('TRUE')}")
+
+async def refrescar_resumen(db: AsyncSession, nomina_ids: list[UUID]):
+    """Recalcula el resumen de los reportes indicados. No confirma la transacción."""
+    if nomina_ids:
+        await db.execute(_REFRESCAR_REPORTES, {"nomina_ids": list(nomina_ids)})
+
+async def refrescar_resumen_empleado(db: AsyncSession, empleado_id: UUID):
+    """Recalcula el resumen de todos los reportes de un empleado (p. ej. tras cambiar su nombre)."""
+    await refrescar_resumen_empleados(db, [empleado_id])
+
+async def refrescar_resumen_empleados(db: AsyncSession, empleado_ids: list[UUID]):
+    """Igual que refrescar_resumen_empleado para varios empleados en una sola sentencia."""
+    if empleado_ids:
+        await db.execute(_REFRESCAR_EMPLEADOS, {"empleado_ids": list(empleado_ids)})
+
+async def refrescar_resumen_por_tipo(db: AsyncSession, recurso: str, tipo_id: int):
+    """Recalcula el resumen de los reportes que usan un tipo de recargo, descuento o subsidio.
+
+    ``recurso`` es el nombre de la tabla del catálogo (p. ej. "tipos_descuentos"); se llama tras
+    renombrar el tipo. No confirma la transacción.
+    """
+    await db.execute(_REFRESCAR_POR_TIPO[recurso], {"tipo_id": tipo_id})
+
+async def reconstruir_resumen(db: AsyncSession):
+    """Vacía y vuelve a llenar la tabla de resumen a partir de los reportes existentes."""
+    await db.execute(text("TRUNCATE reportes_nominas_resumen"))
+    result = await db.execute(_RECONSTRUIR)
+    await db.commit()
+    return result.rowcount
+
+async def main():
+    from app.db.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        filas = await reconstruir_resumen(db)
+    print(f"Resumen reconstruido: {filas} reportes")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,358 @@
+"""Cola de trabajos de nómina en segundo plano respaldada por la base de datos.
+
+La API encola con ``encolar_trabajo`` y consulta el avance con ``obtener_trabajo``. Los trabajos
+los ejecutan uno o más procesos aparte::
+
+    python -m app.services.trabajos_nomina
+
+Cada proceso toma el trabajo pendiente más antiguo con SELECT ... FOR UPDATE SKIP LOCKED y lo
+reparte en bloques que procesa con concurrencia limitada. El resultado de cada bloque se guarda
+en trabajos_nominas_bloques; si el proceso muere, otro retoma el trabajo cuando su latido vence
+y salta los bloques ya guardados. Antes de escribir un bloque el proceso comprueba que el trabajo
+siga a su nombre, y el registro del bloque no se duplica: si otro proceso lo retomó mientras este
+seguía vivo, este deja de escribir y ningún bloque se guarda dos veces.
+
+Los trabajadores exigen un caché compartido (``CACHE_BACKEND_URL=redis://...``): por él reciben
+las invalidaciones de catálogos hechas en la API y avisan a la API de las nóminas que escriben.
+Con el caché en la memoria del proceso esos avisos no salen de cada proceso y el proceso no arranca.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import select, insert, update, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import (
+    TRABAJOS_TAMANO_BLOQUE, TRABAJOS_CONCURRENCIA, TRABAJOS_INTERVALO, TRABAJOS_VENCIMIENTO, TRABAJOS_MAX_INTENTOS
+)
+from app.db.crud import crear_reportes_nomina_lote
+from app.db.database import AsyncSessionLocal, engine
+from app.db.models import TrabajoNomina, TrabajoNominaBloque
+from app.db.schemas import TrabajoNominaCreate, ReporteNominaCreate, RecalculoNominaRequest
+from app.services.payroll import calcular_nominas_lote
+from app.services.recalculo import recalcular_nominas, empleados_afectados
+from app.services.cache_backend import cache_backend
+
+logger = logging.getLogger(__name__)
+
+# Errores por trabajo que devuelve la consulta de avance; el resto solo se cuenta
+MAX_ERRORES_REPORTADOS = 1000
+
+# Toma el trabajo pendiente más antiguo, o uno en proceso cuyo trabajador dejó de latir
+_TOMAR = text("""
+    UPDATE trabajos_nominas SET
+        estado = 'en_proceso',
+        intentos = intentos + 1,
+        trabajador = :trabajador,
+        iniciado_en = COALESCE(iniciado_en, now()),
+        latido_en = now()
+    WHERE id = (
+        SELECT id FROM trabajos_nominas
+        WHERE estado = 'pendiente'
+           OR (estado = 'en_proceso' AND latido_en < now() - make_interval(secs => :vencimiento))
+        ORDER BY creado_en
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, tipo, parametros, intentos
+""")
+
+class TrabajoAjeno(Exception):
+    """El trabajo pasó a otro proceso o ya no está en proceso."""
+
+def _mensaje(error: Exception) -> str:
+    return str(getattr(error, "detail", None) or error)
+
+async def encolar_trabajo(db: AsyncSession, datos: TrabajoNominaCreate) -> dict:
+    """Guarda el trabajo como pendiente y devuelve su estado inicial."""
+    parametros = datos.model_dump(mode="json", include={"nominas"} if datos.tipo == "lote" else {"recalculo"})
+    result = await db.execute(
+        insert(TrabajoNomina).values(tipo=datos.tipo, parametros=parametros).returning(TrabajoNomina)
+    )
+    trabajo = result.scalar_one()
+    await db.commit()
+    return _estado(trabajo, [])
+
+async def obtener_trabajo(db: AsyncSession, trabajo_id: UUID) -> Optional[dict]:
+    """Estado, avance, velocidad y errores por empleado de un trabajo; None si no existe."""
+    trabajo = await db.get(TrabajoNomina, trabajo_id, populate_existing=True)
+    if trabajo is None:
+        return None
+    result = await db.execute(
+        select(TrabajoNominaBloque).where(TrabajoNominaBloque.trabajo_id == trabajo_id).order_by(TrabajoNominaBloque.bloque)
+    )
+    return _estado(trabajo, result.scalars().all())
+
+def _estado(trabajo: TrabajoNomina, bloques) -> dict:
+    procesados = sum(bloque.procesados for bloque in bloques)
+    errores = [error for bloque in bloques for error in bloque.errores][:MAX_ERRORES_REPORTADOS]
+    if trabajo.total:
+        porcentaje = round(100 * procesados / trabajo.total, 2)
+    else:
+        porcentaje = 100.0 if trabajo.estado == "completado" else 0.0
+    por_segundo = None
+    if trabajo.iniciado_en is not None:
+        fin = trabajo.terminado_en or datetime.now(timezone.utc)
+        segundos = (fin - trabajo.iniciado_en).total_seconds()
+        por_segundo = round(procesados / segundos, 2) if segundos > 0 else None
+    return {
+        "id": trabajo.id,
+        "tipo": trabajo.tipo,
+        "estado": trabajo.estado,
+        "total": trabajo.total,
+        "procesados": procesados,
+        "exitosos": sum(bloque.exitosos for bloque in bloques),
+        "fallidos": sum(bloque.fallidos for bloque in bloques),
+        "porcentaje": porcentaje,
+        "por_segundo": por_segundo,
+        "error": trabajo.error,
+        "errores": errores,
+        "creado_en": trabajo.creado_en,
+        "iniciado_en": trabajo.iniciado_en,
+        "terminado_en": trabajo.terminado_en,
+    }
+
+async def _comprobar_propio(db: AsyncSession, trabajo_id: UUID, trabajador: str):
+    """Lanza TrabajoAjeno si el trabajo ya no es de este proceso.
+
+    El bloqueo compartido de la fila del trabajo dura hasta el commit de la transacción actual:
+    nadie lo retoma entre la comprobación y la escritura (la toma salta las filas bloqueadas).
+    """
+    propio = await db.execute(
+        select(TrabajoNomina.id)
+        .where(TrabajoNomina.id == trabajo_id, TrabajoNomina.trabajador == trabajador, TrabajoNomina.estado == "en_proceso")
+        .with_for_update(read=True)
+    )
+    if propio.scalar_one_or_none() is None:
+        raise TrabajoAjeno(f"El trabajo {trabajo_id} ya no pertenece a {trabajador}")
+
+async def _registrar_bloque(db: AsyncSession, trabajo_id: UUID, trabajador: str, bloque: int,
+                            procesados: int, fallidos: int, errores: list[dict]) -> bool:
+    """Registra el bloque en la transacción actual; devuelve False si ya estaba registrado."""
+    await _comprobar_propio(db, trabajo_id, trabajador)
+    result = await db.execute(
+        pg_insert(TrabajoNominaBloque).values(
+            trabajo_id=trabajo_id, bloque=bloque, procesados=procesados,
+            exitosos=procesados - fallidos, fallidos=fallidos, errores=errores
+        )
+        .on_conflict_do_nothing(index_elements=["trabajo_id", "bloque"])
+        .returning(TrabajoNominaBloque.bloque)
+    )
+    return result.scalar_one_or_none() is not None
+
+async def _bloque_lote(db: AsyncSession, trabajo_id: UUID, trabajador: str, bloque: int, inicio: int, nominas: list[ReporteNominaCreate]):
+    calculadas = await calcular_nominas_lote(db, nominas)
+    errores = [
+        {"indice": inicio + i, "empleado_id": str(nominas[i].empleado_id), "error": error}
+        for i, (_, error) in enumerate(calculadas) if error is not None
+    ]
+    # crear_reportes_nomina_lote confirma el registro del bloque junto con los reportes; si el
+    # bloque ya estaba registrado sus nóminas ya se crearon y no se repiten
+    if not await _registrar_bloque(db, trabajo_id, trabajador, bloque, len(nominas), len(errores), errores):
+        await db.rollback()
+        return
+    await crear_reportes_nomina_lote(db, [nomina for nomina, error in calculadas if error is None])
+
+async def _bloque_recalculo(db: AsyncSession, trabajo_id: UUID, trabajador: str, bloque: int, parametros: RecalculoNominaRequest, empleado_ids: list[str]):
+    # recalcular_nominas confirma por su cuenta; el bloque se registra después porque repetir
+    # un recálculo no cambia nada si el proceso muere entre las dos transacciones
+    await _comprobar_propio(db, trabajo_id, trabajador)
+    resultado = await recalcular_nominas(db, parametros.model_copy(update={"empleado_ids": [UUID(i) for i in empleado_ids], "dry_run": False}))
+    errores = [
+        {"empleado_id": str(diferencia["empleado_id"]), "reporte_nomina_id": str(diferencia["reporte_nomina_id"]), "error": diferencia["error"]}
+        for diferencia in resultado["diferencias"] if diferencia["error"]
+    ]
+    # Un empleado falla si alguno de sus reportes no se pudo recalcular
+    fallidos = len({error["empleado_id"] for error in errores})
+    await _registrar_bloque(db, trabajo_id, trabajador, bloque, len(empleado_ids), fallidos, errores)
+    await db.commit()
+
+async def _planificar(Sesion, trabajo_id: UUID, tipo: str, parametros: dict) -> dict:
+    """Fija en el trabajo el tamaño de bloque y, en un recálculo, la lista de empleados.
+
+    Se guarda en el primer intento para que un trabajo retomado reparta los bloques igual.
+    """
+    if "tamano_bloque" in parametros:
+        return parametros
+    async with Sesion() as db:
+        plan = {"tamano_bloque": TRABAJOS_TAMANO_BLOQUE}
+        if tipo == "lote":
+            total = len(parametros["nominas"])
+        else:
+            plan["empleado_ids"] = [str(i) for i in await empleados_afectados(db, RecalculoNominaRequest.model_validate(parametros["recalculo"]))]
+            total = len(plan["empleado_ids"])
+        parametros = {**parametros, **plan}
+        await db.execute(
+            update(TrabajoNomina).where(TrabajoNomina.id == trabajo_id).values(parametros=parametros, total=total)
+        )
+        await db.commit()
+    return parametros
+
+async def _latir(Sesion, trabajo_id: UUID, trabajador: str):
+    while True:
+        await asyncio.sleep(TRABAJOS_VENCIMIENTO / 3)
+        async with Sesion() as db:
+            await db.execute(
+                update(TrabajoNomina)
+                .where(TrabajoNomina.id == trabajo_id, TrabajoNomina.trabajador == trabajador)
+                .values(latido_en=text("now()"))
+            )
+            await db.commit()
+
+async def procesar_trabajo(Sesion, trabajo_id: UUID, tipo: str, parametros: dict, trabajador: str,
+                           concurrencia: int = TRABAJOS_CONCURRENCIA, detener: Optional[asyncio.Event] = None):
+    """Procesa los bloques que falten del trabajo y lo marca como completado.
+
+    Si ``detener`` se activa, los bloques en curso terminan y el trabajo vuelve a pendiente.
+    """
+    parametros = await _planificar(Sesion, trabajo_id, tipo, parametros)
+    tamaño = parametros["tamano_bloque"]
+    if tipo == "lote":
+        elementos = parametros["nominas"]
+    else:
+        elementos = parametros["empleado_ids"]
+        recalculo = RecalculoNominaRequest.model_validate(parametros["recalculo"])
+
+    async with Sesion() as db:
+        result = await db.execute(select(TrabajoNominaBloque.bloque).where(TrabajoNominaBloque.trabajo_id == trabajo_id))
+        hechos = set(result.scalars().all())
+
+    semaforo = asyncio.Semaphore(concurrencia)
+    pendientes = []
+    # Se activa si otro proceso retomó el trabajo; los bloques que falten quedan para él
+    ajeno = asyncio.Event()
+
+    async def ejecutar(bloque: int, inicio: int):
+        async with semaforo:
+            if ajeno.is_set():
+                return
+            if detener is not None and detener.is_set():
+                pendientes.append(bloque)
+                return
+            parte = elementos[inicio:inicio + tamaño]
+            async with Sesion() as db:
+                try:
+                    if tipo == "lote":
+                        nominas = [ReporteNominaCreate.model_validate(nomina) for nomina in parte]
+                        await _bloque_lote(db, trabajo_id, trabajador, bloque, inicio, nominas)
+                    else:
+                        await _bloque_recalculo(db, trabajo_id, trabajador, bloque, recalculo, parte)
+                except TrabajoAjeno:
+                    await db.rollback()
+                    ajeno.set()
+                except Exception as e:
+                    # El bloque completo queda como fallido y el trabajo sigue con los demás
+                    logger.exception("Falló el bloque %s del trabajo %s", bloque, trabajo_id)
+                    await db.rollback()
+                    if tipo == "lote":
+                        errores = [{"indice": inicio + i, "empleado_id": nomina["empleado_id"], "error": _mensaje(e)} for i, nomina in enumerate(parte)]
+                    else:
+                        errores = [{"empleado_id": empleado_id, "error": _mensaje(e)} for empleado_id in parte]
+                    try:
+                        await _registrar_bloque(db, trabajo_id, trabajador, bloque, len(parte), len(parte), errores)
+                        await db.commit()
+                    except TrabajoAjeno:
+                        await db.rollback()
+                        ajeno.set()
+
+    latido = asyncio.create_task(_latir(Sesion, trabajo_id, trabajador))
+    try:
+        await asyncio.gather(*(
+            ejecutar(bloque, inicio)
+            for bloque, inicio in enumerate(range(0, len(elementos), tamaño)) if bloque not in hechos
+        ))
+    finally:
+        latido.cancel()
+
+    if ajeno.is_set():
+        logger.warning("El trabajo %s pasó a otro proceso; %s deja de procesarlo", trabajo_id, trabajador)
+        return
+
+    async with Sesion() as db:
+        if pendientes:
+            valores = {"estado": "pendiente", "trabajador": None}
+        else:
+            valores = {"estado": "completado", "terminado_en": text("now()")}
+        await db.execute(
+            update(TrabajoNomina)
+            .where(TrabajoNomina.id == trabajo_id, TrabajoNomina.trabajador == trabajador, TrabajoNomina.estado == "en_proceso")
+            .values(**valores)
+        )
+        await db.commit()
+
+async def tomar_trabajo(Sesion, trabajador: str):
+    """Reserva el siguiente trabajo disponible; None si la cola está vacía."""
+    async with Sesion() as db:
+        trabajo = (await db.execute(_TOMAR, {"trabajador": trabajador, "vencimiento": float(TRABAJOS_VENCIMIENTO)})).first()
+        await db.commit()
+    return trabajo
+
+async def procesar_pendientes(Sesion=AsyncSessionLocal, trabajador: Optional[str] = None,
+                              concurrencia: int = TRABAJOS_CONCURRENCIA, detener: Optional[asyncio.Event] = None) -> int:
+    """Procesa trabajos hasta vaciar la cola y devuelve cuántos tomó."""
+    trabajador = trabajador or f"{socket.gethostname()}:{os.getpid()}"
+    tomados = 0
+    while detener is None or not detener.is_set():
+        trabajo = await tomar_trabajo(Sesion, trabajador)
+        if trabajo is None:
+            break
+        tomados += 1
+        try:
+            if trabajo.intentos > TRABAJOS_MAX_INTENTOS:
+                raise RuntimeError(f"Se abandonó tras {TRABAJOS_MAX_INTENTOS} intentos")
+            await procesar_trabajo(Sesion, trabajo.id, trabajo.tipo, trabajo.parametros, trabajador, concurrencia, detener)
+        except Exception as e:
+            logger.exception("Falló el trabajo %s", trabajo.id)
+            async with Sesion() as db:
+                # Solo si sigue siendo de este proceso; si otro lo retomó, el resultado es suyo
+                await db.execute(
+                    update(TrabajoNomina)
+                    .where(TrabajoNomina.id == trabajo.id, TrabajoNomina.trabajador == trabajador, TrabajoNomina.estado == "en_proceso")
+                    .values(estado="fallido", error=_mensaje(e), terminado_en=text("now()"))
+                )
+                await db.commit()
+    return tomados
+
+async def ejecutar_trabajador(Sesion=AsyncSessionLocal, concurrencia: int = TRABAJOS_CONCURRENCIA, una_vez: bool = False):
+    """Bucle del proceso trabajador; SIGINT o SIGTERM lo detienen después de los bloques en curso."""
+    detener = asyncio.Event()
+    bucle = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        bucle.add_signal_handler(senal, detener.set)
+
+    while not detener.is_set():
+        await procesar_pendientes(Sesion, concurrencia=concurrencia, detener=detener)
+        if una_vez:
+            break
+        try:
+            await asyncio.wait_for(detener.wait(), TRABAJOS_INTERVALO)
+        except asyncio.TimeoutError:
+            pass
+
+async def main():
+    parser = argparse.ArgumentParser(description="Procesa los trabajos de nómina encolados")
+    parser.add_argument("--concurrencia", type=int, default=TRABAJOS_CONCURRENCIA, help="Bloques procesados a la vez")
+    parser.add_argument("--una-vez", action="store_true", help="Terminar cuando la cola quede vacía")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+    if not cache_backend.compartido:
+        parser.error("los trabajadores necesitan un caché compartido; configure CACHE_BACKEND_URL=redis://...")
+
+    # Se une al canal de invalidaciones como un proceso más de la API
+    await cache_backend.iniciar()
+    try:
+        await ejecutar_trabajador(concurrencia=args.concurrencia, una_vez=args.una_vez)
+    finally:
+        await cache_backend.cerrar()
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
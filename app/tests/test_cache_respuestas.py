@@ -0,0 +1,155 @@
+import pytest
+import httpx
+from decimal import Decimal
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.main import app
+from app.db.database import get_db
+from app.db.models import TipoDescuento
+from app.services.cache_backend import MemoriaBackend, RedisBackend, cache_backend
+from app.services.cache_respuestas import CacheRespuestas
+from app.services.catalogo import catalogo_cache
+
+@pytest.mark.asyncio
+async def test_memoria_backend_lru():
+    """Prueba el desalojo por memoria, el orden LRU y la versión de las respuestas guardadas"""
+    backend = MemoriaBackend(max_bytes=10)
+    cache = CacheRespuestas(backend, ttl=60)
+
+    await cache.guardar("a", "1", 0, b"1234")
+    await cache.guardar("a", "2", 0, b"5678")
+    assert await cache.obtener("a", "1") == b"1234"  # "1" pasa a ser el más reciente
+    await cache.guardar("b", "", 0, b"abcd")
+
+    assert await cache.obtener("a", "2") is None
+    assert await cache.obtener("a", "1") == b"1234"
+    assert backend.bytes == 8
+
+    # Cuerpos más grandes que el límite o de una versión vieja no se guardan
+    await cache.guardar("c", "", 0, b"x" * 11)
+    assert await cache.obtener("c") is None
+    etag = cache.etag("a", "1")
+    assert await backend.invalidar("a") == 1
+    assert cache.etag("a", "1") != etag
+    assert await cache.obtener("a", "1") is None
+    await cache.guardar("a", "1", 0, b"1234")
+    assert await cache.obtener("a", "1") is None
+
+@pytest.mark.asyncio
+async def test_memoria_backend_ttl(monkeypatch):
+    """Prueba que las entradas en memoria expiren con su ttl y que varios workers exijan Redis"""
+    from types import SimpleNamespace
+    from app.services import cache_backend as modulo
+
+    ahora = [1000.0]
+    monkeypatch.setattr(modulo, "time", SimpleNamespace(monotonic=lambda: ahora[0]))
+    backend = MemoriaBackend(max_bytes=10)
+
+    await backend.guardar("a", b"1234", ttl=60)
+    await backend.guardar("b", b"5678")
+    ahora[0] += 59
+    assert await backend.obtener("a") == b"1234"
+    ahora[0] += 1
+    assert await backend.obtener("a") is None
+    assert await backend.obtener("b") == b"5678"
+    assert backend.bytes == 4
+
+    await backend.iniciar()
+    with pytest.raises(RuntimeError, match="WEB_CONCURRENCY"):
+        await MemoriaBackend(max_bytes=10, procesos=2).iniciar()
+
+@pytest.mark.asyncio
+async def test_redis_backend_invalidacion_entre_procesos():
+    """Prueba que dos procesos con Redis comparten versiones, cuerpos e invalidaciones por pub/sub"""
+    import asyncio
+    fakeredis = pytest.importorskip("fakeredis")
+
+    servidor = fakeredis.FakeServer()
+    uno = RedisBackend(fakeredis.FakeAsyncRedis(server=servidor), prefijo="prueba")
+    otro = RedisBackend(fakeredis.FakeAsyncRedis(server=servidor), prefijo="prueba")
+    recibidos = []
+    otro.al_invalidar(lambda recurso, version: recibidos.append((recurso, version)))
+
+    await uno.iniciar()
+    await otro.iniciar()
+    try:
+        assert uno.generacion == otro.generacion
+
+        await uno.guardar("clave", b"valor", ttl=60)
+        assert await otro.obtener("clave") == b"valor"
+
+        assert await uno.invalidar("tipos_recargos") == 1
+        assert uno.version("tipos_recargos") == 1
+        for _ in range(50):
+            if recibidos:
+                break
+            await asyncio.sleep(0.01)
+        assert recibidos == [("tipos_recargos", 1)]
+        assert CacheRespuestas(uno, 60).etag("tipos_recargos") == CacheRespuestas(otro, 60).etag("tipos_recargos")
+    finally:
+        await uno.cerrar()
+        await otro.cerrar()
+
+@pytest.mark.asyncio
+async def test_etag_tipos_descuentos(engine, db_session: AsyncSession):
+    """Prueba que con el ETag vigente la ruta responde 304 sin consultar la base de datos"""
+    db_session.add(TipoDescuento(id=1, tipo="SALUD", valor=Decimal("0.04")))
+    await db_session.commit()
+    await cache_backend.invalidar("tipos_descuentos")
+
+    async def get_db_prueba():
+        yield db_session
+
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2])
+    app.dependency_overrides[get_db] = get_db_prueba
+    event.listen(engine.sync_engine, "before_cursor_execute", contar)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            respuesta = await cliente.get("/tipos_descuentos/")
+            assert respuesta.status_code == 200
+            assert respuesta.json() == [{"id": 1, "tipo": "SALUD", "valor": "0.04"}]
+            etag = respuesta.headers["etag"]
+
+            sentencias.clear()
+            respuesta = await cliente.get("/tipos_descuentos/", headers={"If-None-Match": etag})
+            assert respuesta.status_code == 304
+            respuesta = await cliente.get("/tipos_descuentos/")
+            assert respuesta.status_code == 200
+            assert sentencias == []
+
+            version_catalogo = catalogo_cache.version
+            respuesta = await cliente.put("/tipos_descuentos/1", json={"tipo": "SALUD", "valor": "0.05"})
+            assert respuesta.status_code == 200
+            # La invalidación del recurso también descarta el caché de catálogos de nómina
+            assert catalogo_cache.version > version_catalogo
+
+            respuesta = await cliente.get("/tipos_descuentos/", headers={"If-None-Match": etag})
+            assert respuesta.status_code == 200
+            assert respuesta.headers["etag"] != etag
+            assert respuesta.json()[0]["valor"] == "0.05"
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", contar)
+        app.dependency_overrides.clear()
+        await db_session.rollback()
+        await db_session.execute(TipoDescuento.__table__.delete())
+        await db_session.commit()
+
+@pytest.mark.asyncio
+async def test_if_none_match_comodin(db_session: AsyncSession):
+    """Prueba que If-None-Match: * responda 304 solo si el recurso existe"""
+    from uuid import uuid4
+
+    async def get_db_prueba():
+        yield db_session
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            respuesta = await cliente.get(f"/nominas/{uuid4()}", headers={"If-None-Match": "*"})
+            assert respuesta.status_code == 404
+            respuesta = await cliente.get("/tipos_descuentos/", headers={"If-None-Match": "*"})
+            assert respuesta.status_code == 304
+            assert respuesta.headers["etag"]
+    finally:
+        app.dependency_overrides.clear()
\ No newline at end of file
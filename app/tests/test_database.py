@@ -0,0 +1,28 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.database import opciones_motor
+
+def test_opciones_motor():
+    """Prueba las opciones del pool y de asyncpg que recibe create_async_engine"""
+    opciones = opciones_motor(pool_size=3, max_overflow=2, statement_cache_size=50, pgbouncer=False)
+
+    assert opciones["pool_size"] == 3
+    assert opciones["max_overflow"] == 2
+    assert opciones["connect_args"] == {"statement_cache_size": 50, "prepared_statement_cache_size": 50}
+
+    pgbouncer = opciones_motor(statement_cache_size=50, pgbouncer=True)["connect_args"]
+    assert pgbouncer["statement_cache_size"] == 0
+    assert pgbouncer["prepared_statement_cache_size"] == 0
+    assert pgbouncer["prepared_statement_name_func"]() != pgbouncer["prepared_statement_name_func"]()
+
+@pytest.mark.asyncio
+async def test_motor_modo_pgbouncer(engine):
+    """Prueba que el motor funciona sin sentencias preparadas en caché"""
+    motor = create_async_engine(engine.url, **opciones_motor(pool_size=1, max_overflow=0, pgbouncer=True))
+    try:
+        for _ in range(3):
+            async with motor.begin() as conn:
+                assert (await conn.execute(text("SELECT CAST(:valor AS integer)"), {"valor": 1})).scalar() == 1
+    finally:
+        await motor.dispose()
\ No newline at end of file
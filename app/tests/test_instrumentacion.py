@@ -0,0 +1,102 @@
+import pytest
+import httpx
+import json
+import logging
+from decimal import Decimal
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.main import app
+from app.db.database import get_db
+from app.db.models import Empleado
+from app.core.instrumentacion import contar_consultas, presupuesto_consultas
+
+@pytest.mark.asyncio
+async def test_presupuesto_consultas(db_session: AsyncSession):
+    """Prueba que los recolectores cuentan las sentencias y que el presupuesto falla al excederse"""
+    with presupuesto_consultas(2) as metricas:
+        await db_session.execute(text("SELECT 1"))
+        with contar_consultas() as internas:
+            await db_session.execute(text("SELECT pg_sleep(0.01)"))
+    assert (metricas.consultas, internas.consultas) == (2, 1)
+    assert metricas.sentencia_lenta == "SELECT pg_sleep(0.01)"
+    assert metricas.tiempo_db >= metricas.tiempo_sentencia_lenta >= 0.01
+
+    with pytest.raises(AssertionError, match="2 sentencias con un presupuesto de 1"):
+        with presupuesto_consultas(1):
+            await db_session.execute(text("SELECT 1"))
+            await db_session.execute(text("SELECT 2"))
+
+    # Fuera de un recolector las sentencias no se registran en ninguna parte
+    await db_session.execute(text("SELECT 1"))
+    assert metricas.consultas == 2
+
+@pytest.mark.asyncio
+async def test_server_timing_empleados(db_session: AsyncSession, caplog):
+    """Prueba la cabecera Server-Timing, el registro JSON y el presupuesto de una ruta"""
+    empleado = Empleado(cedula="5550001112", nombres="Rosa", apellidos="Díaz", salario_base=Decimal("1300000.00"))
+    db_session.add(empleado)
+    await db_session.commit()
+
+    async def get_db_prueba():
+        yield db_session
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            with caplog.at_level(logging.INFO, logger="app.core.instrumentacion"):
+                respuesta = await cliente.get("/empleados/", params={"cedula": "555"})
+            assert respuesta.status_code == 200
+            tiempos = {parte.split(";")[0].strip(): parte for parte in respuesta.headers["server-timing"].split(",")}
+            assert set(tiempos) == {"db", "db-lenta", "pool", "total"}
+            assert 'desc="1 consultas"' in tiempos["db"]
+
+            registro = json.loads(caplog.records[-1].getMessage())
+            assert (registro["metodo"], registro["ruta"], registro["estado"], registro["consultas"]) == ("GET", "/empleados/", 200, 1)
+            assert registro["sentencia_lenta"].startswith("SELECT")
+
+            datos = {"cedula": "5550001112", "nombres": "Rosa", "apellidos": "Díaz Ruiz", "salario_base": "1300000.00"}
+            with presupuesto_consultas(5):
+                respuesta = await cliente.put(f"/empleados/{empleado.id}", json=datos)
+            assert respuesta.status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+        await db_session.rollback()
+
+@pytest.mark.asyncio
+async def test_metricas_prometheus(db_session: AsyncSession):
+    """Prueba los histogramas por plantilla de ruta y el formato de texto de /metrics"""
+    from uuid import uuid4
+    from app.core.metricas import Histograma, nominas_calculadas
+
+    histograma = Histograma("prueba_segundos", "Prueba.", ("operacion",), cubetas=(0.1, 1.0))
+    for valor in (0.05, 0.5, 0.5, 3):
+        histograma.observar(valor, "a")
+    assert list(histograma.muestras()) == [
+        'prueba_segundos_bucket{operacion="a",le="0.1"} 1',
+        'prueba_segundos_bucket{operacion="a",le="1"} 3',
+        'prueba_segundos_bucket{operacion="a",le="+Inf"} 4',
+        'prueba_segundos_sum{operacion="a"} 4.05',
+        'prueba_segundos_count{operacion="a"} 4',
+    ]
+
+    async def get_db_prueba():
+        yield db_session
+
+    calculos = nominas_calculadas.valores.get(("individual",), 0)
+    nominas_calculadas.incrementar("individual")
+    app.dependency_overrides[get_db] = get_db_prueba
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            for _ in range(2):
+                assert (await cliente.get(f"/empleados/{uuid4()}")).status_code == 404
+            respuesta = await cliente.get("/metrics")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert respuesta.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lineas = respuesta.text.splitlines()
+    assert 'http_peticiones_duracion_segundos_count{metodo="GET",ruta="/empleados/{empleado_id}"} 2' in lineas
+    assert 'http_peticiones_total{metodo="GET",ruta="/empleados/{empleado_id}",estado="404"} 2' in lineas
+    assert f'nomina_calculos_total{{origen="individual"}} {calculos + 1}' in lineas
+    assert "# TYPE db_pool_en_uso gauge" in lineas
+    assert any(linea.startswith("db_pool_desborde ") for linea in lineas)
\ No newline at end of file
@@ -1,15 +1,16 @@
 import pytest
 from decimal import Decimal
 from uuid import uuid4
-from datetime import date
+from datetime import date, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import (
-    Empleado, ConfigSalario, TipoRecargo, 
+    Base, Empleado, ConfigSalario, TipoRecargo, 
     TipoDescuento, TipoSubsidio
 )
 from app.services.payroll import calcular_nomina
 from app.db.schemas import ReporteNominaCreate, QuincenaValorCreate
 from app.db.crud import crear_reporte_nomina
+from app.services.catalogo import catalogo_cache
 
 @pytest.fixture
 async def test_data(db_session: AsyncSession):
@@ -73,6 +74,8 @@ async def test_data(db_session: AsyncSession):
     ])
     await db_session.commit()
     await db_session.refresh(empleado)
+    # Los catálogos se insertaron sin pasar por las rutas, así que el caché se invalida a mano
+    catalogo_cache.invalidar()
     
     yield {
         "empleado_id": empleado.id,
@@ -82,8 +85,11 @@ async def test_data(db_session: AsyncSession):
         "subsidio": subsidio_transporte
     }
 
-    # Cleanup
+    # Cleanup: los datos se confirmaron, así que se borran para la siguiente prueba
     await db_session.rollback()
+    for tabla in reversed(Base.metadata.sorted_tables):
+        await db_session.execute(tabla.delete())
+    await db_session.commit()
 
 @pytest.mark.asyncio
 async def test_calculo_nomina_basica(db_session: AsyncSession, test_data):
@@ -232,4 +238,915 @@ async def test_calculo_nomina_sin_subsidio(db_session: AsyncSession, test_data):
     assert len(nomina_guardada.quincena_valores) == 1
     assert len(nomina_guardada.recargos) == 1
     assert len(nomina_guardada.descuentos) == 2
-    assert len(nomina_guardada.subsidios) == 0
\ No newline at end of file
+    assert len(nomina_guardada.subsidios) == 0
+
+@pytest.mark.asyncio
+async def test_calculo_nomina_lote(db_session: AsyncSession, test_data):
+    """Prueba cálculo y guardado de un lote de nóminas con un empleado inexistente"""
+    from app.services.payroll import calcular_nominas_lote
+    from app.db.crud import crear_reportes_nomina_lote
+
+    nominas = [
+        ReporteNominaCreate(
+            empleado_id=empleado_id,
+            fecha_inicio=date(2024, 2, 1),
+            fecha_fin=date(2024, 2, 15),
+            quincena_valores=[
+                QuincenaValorCreate(
+                    tipo_recargo_id=1,
+                    cantidad_dias=15,
+                    valor_quincena=Decimal("0.00")
+                )
+            ],
+            recargos=[1],
+            descuentos=[1, 2],
+            subsidios=[1]
+        )
+        for empleado_id in (test_data["empleado_id"], uuid4())
+    ]
+
+    calculadas = await calcular_nominas_lote(db_session, nominas)
+
+    assert calculadas[0][1] is None
+    assert calculadas[0][0].total_pagado > 0
+    assert calculadas[1] == (None, "Empleado no encontrado")
+
+    guardadas = await crear_reportes_nomina_lote(db_session, [calculadas[0][0]])
+
+    assert len(guardadas) == 1
+    assert guardadas[0]["total_pagado"] == calculadas[0][0].total_pagado
+
+@pytest.mark.asyncio
+async def test_contexto_nomina_una_consulta(db_session: AsyncSession, test_data):
+    """Prueba que calcular_nomina carga empleado y catálogos en una sola sentencia"""
+    from fastapi import HTTPException
+    from app.core.instrumentacion import presupuesto_consultas
+    from app.services.catalogo import cargar_catalogo, cargar_contexto_nomina
+    from app.services.payroll_engine import calcular
+
+    nomina_data = ReporteNominaCreate(
+        empleado_id=test_data["empleado_id"],
+        fecha_inicio=date(2024, 2, 1),
+        fecha_fin=date(2024, 2, 15),
+        quincena_valores=[QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=5, valor_quincena=Decimal("0.00"))],
+        recargos=[2],
+        descuentos=[1],
+        subsidios=[]
+    )
+
+    catalogo_cache.invalidar()
+    with presupuesto_consultas(1):
+        calculada = await calcular_nomina(db_session, nomina_data.model_copy(deep=True))
+    contexto = await cargar_contexto_nomina(db_session, nomina_data)
+
+    # Solo viajan los tipos referenciados y el resultado es el mismo que con el catálogo completo
+    assert (set(contexto.recargos), set(contexto.subsidios), set(contexto.descuentos)) == ({2}, set(), {1})
+    assert contexto.recargos[2].valor_hora == Decimal("7312.50")
+    completo = (await cargar_catalogo(db_session)).en_fecha(nomina_data.fecha_inicio)
+    assert calculada.total_pagado == calcular(completo.config_salario, completo, nomina_data).total_pagado
+
+    with pytest.raises(HTTPException) as error:
+        await calcular_nomina(db_session, nomina_data.model_copy(update={"empleado_id": uuid4()}))
+    assert (error.value.status_code, error.value.detail) == (404, "Empleado no encontrado")
+
+    with pytest.raises(HTTPException) as error:
+        await calcular_nomina(db_session, nomina_data.model_copy(update={"descuentos": [1, 99]}))
+    assert error.value.detail == "Tipo de descuento 99 no encontrado"
+
+
+@pytest.mark.asyncio
+async def test_resumen_nominas(db_session: AsyncSession, test_data):
+    """Prueba que el listado de nóminas sigue a las escrituras a través de reportes_nominas_resumen"""
+    from app.db.crud import actualizar_reporte_nomina, eliminar_reporte_nomina
+    from app.db.schemas import ReporteNominaUpdate
+    from app.services.reporte_payroll import obtener_reporte_nominas
+    from app.services.resumen_nominas import reconstruir_resumen
+
+    nomina_data = ReporteNominaCreate(
+        empleado_id=test_data["empleado_id"],
+        fecha_inicio=date(2024, 2, 1),
+        fecha_fin=date(2024, 2, 15),
+        quincena_valores=[
+            QuincenaValorCreate(
+                tipo_recargo_id=1,
+                cantidad_dias=15,
+                valor_quincena=Decimal("0")
+            )
+        ],
+        recargos=[1],
+        descuentos=[1],
+        subsidios=[]
+    )
+    nomina_calculada = await calcular_nomina(db_session, nomina_data)
+    reporte = await crear_reporte_nomina(db_session, nomina_calculada)
+
+    pagina = await obtener_reporte_nominas(db_session)
+    assert [item["id"] for item in pagina["items"]] == [reporte.id]
+    assert pagina["items"][0]["descuentos_aplicados"] == "SALUD"
+    assert pagina["items"][0]["subsidios_aplicados"] == "Sin subsidios"
+
+    actualizado = await actualizar_reporte_nomina(db_session, reporte.id, ReporteNominaUpdate(
+        empleado_id=test_data["empleado_id"],
+        fecha_inicio=date(2024, 2, 1),
+        fecha_fin=date(2024, 2, 15),
+        quincena_valores=nomina_data.quincena_valores,
+        recargos=[1],
+        descuentos=[1, 2],
+        subsidios=[1]
+    ))
+
+    item = (await obtener_reporte_nominas(db_session))["items"][0]
+    assert item["descuentos_aplicados"] == "PENSION\nSALUD"
+    assert item["subsidios_aplicados"] == "TRANSPORTE"
+    assert item["total_pagado"] == actualizado.total_pagado
+
+    # La reconstrucción completa produce el mismo resumen
+    assert await reconstruir_resumen(db_session) == 1
+    assert (await obtener_reporte_nominas(db_session))["items"] == [item]
+
+    await eliminar_reporte_nomina(db_session, reporte.id)
+    assert (await obtener_reporte_nominas(db_session))["items"] == []
+
+
+@pytest.mark.asyncio
+async def test_exportar_nominas(engine, db_session: AsyncSession, test_data):
+    """Prueba la exportación en CSV y NDJSON leída por bloques desde el resumen"""
+    import csv
+    import json
+    from sqlalchemy.orm import sessionmaker
+    from app.services import reporte_payroll
+    from app.services.reporte_payroll import exportar_reporte_nominas
+
+    for dia in (1, 16):
+        nomina_data = ReporteNominaCreate(
+            empleado_id=test_data["empleado_id"],
+            fecha_inicio=date(2024, 3, dia),
+            fecha_fin=date(2024, 3, dia + 14),
+            quincena_valores=[
+                QuincenaValorCreate(
+                    tipo_recargo_id=1,
+                    cantidad_dias=15,
+                    valor_quincena=Decimal("0")
+                )
+            ],
+            recargos=[1],
+            descuentos=[1, 2],
+            subsidios=[1]
+        )
+        await crear_reporte_nomina(db_session, await calcular_nomina(db_session, nomina_data))
+
+    # La exportación abre su propia sesión; se libera la única conexión del pool de pruebas
+    await db_session.close()
+    Sesion = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    reporte_payroll.FILAS_POR_BLOQUE_EXPORTACION = 1
+    try:
+        bloques = [bloque async for bloque in exportar_reporte_nominas(Sesion, "csv")]
+        lineas = [bloque async for bloque in exportar_reporte_nominas(Sesion, "ndjson", fecha_desde=date(2024, 3, 10))]
+    finally:
+        reporte_payroll.FILAS_POR_BLOQUE_EXPORTACION = 1000
+
+    filas = list(csv.DictReader("".join(bloques).splitlines(keepends=True)))
+    assert len(bloques) == 3  # encabezado y una fila por bloque
+    assert [fila["fecha_inicio"] for fila in filas] == ["2024-03-16", "2024-03-01"]
+    assert filas[0]["descuentos_aplicados"] == "PENSION\nSALUD"
+
+    assert len(lineas) == 1
+    registro = json.loads(lineas[0])
+    assert registro["fecha_inicio"] == "2024-03-16"
+    assert registro["cedula"] == "1234567890"
+
+
+@pytest.mark.asyncio
+async def test_crear_nominas_lote_copy(db_session: AsyncSession, test_data, monkeypatch):
+    """Prueba que los lotes grandes se cargan con COPY y quedan igual que con executemany"""
+    from sqlalchemy import select, func
+    from app.db import crud
+    from app.db.models import QuincenaValor, ReporteNominaDescuento
+    from app.services.reporte_payroll import obtener_reporte_nominas
+
+    monkeypatch.setattr(crud, "UMBRAL_COPY", 2)
+    nominas = [
+        ReporteNominaCreate(
+            empleado_id=test_data["empleado_id"],
+            fecha_inicio=date(2024, mes, 1),
+            fecha_fin=date(2024, mes, 15),
+            quincena_valores=[
+                QuincenaValorCreate(tipo_recargo_id=1, cantidad_dias=10, valor_quincena=Decimal("54166.70")),
+                QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=5, valor_quincena=Decimal("36562.50"))
+            ],
+            recargos=[1, 2],
+            descuentos=[1, 2],
+            subsidios=[],
+            total_pagado=Decimal("83475.00")
+        )
+        for mes in (4, 5, 6)
+    ]
+
+    guardadas = await crud.crear_reportes_nomina_lote(db_session, nominas)
+
+    assert len(guardadas) == 3
+    assert await db_session.scalar(select(func.count()).select_from(QuincenaValor)) == 6
+    assert await db_session.scalar(select(func.count()).select_from(ReporteNominaDescuento)) == 6
+    items = (await obtener_reporte_nominas(db_session))["items"]
+    assert [item["fecha_inicio"].month for item in items] == [6, 5, 4]
+    assert items[0]["recargos_y_valores"] == "NOCTURNA 5 días $ 36562.50\nORDINARIA 10 días $ 54166.70"
+
+
+@pytest.mark.asyncio
+async def test_actualizar_nomina_diferencias(engine, db_session: AsyncSession, test_data):
+    """Prueba que la actualización agrega, modifica y borra detalles con un número fijo de sentencias"""
+    from sqlalchemy import event, select
+    from app.db.crud import actualizar_reporte_nomina
+    from app.db.models import ReporteNomina, QuincenaValor, ReporteNominaRecargo, ReporteNominaDescuento
+    from app.db.schemas import ReporteNominaUpdate
+
+    nomina_data = ReporteNominaCreate(
+        empleado_id=test_data["empleado_id"],
+        fecha_inicio=date(2024, 2, 1),
+        fecha_fin=date(2024, 2, 15),
+        quincena_valores=[
+            QuincenaValorCreate(tipo_recargo_id=1, cantidad_dias=10, valor_quincena=Decimal("0")),
+            QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=5, valor_quincena=Decimal("0"))
+        ],
+        recargos=[1, 2],
+        descuentos=[1, 2],
+        subsidios=[1]
+    )
+    reporte = await crear_reporte_nomina(db_session, await calcular_nomina(db_session, nomina_data))
+
+    cambio = ReporteNominaUpdate(
+        empleado_id=test_data["empleado_id"],
+        fecha_inicio=date(2024, 2, 1),
+        fecha_fin=date(2024, 2, 15),
+        quincena_valores=[QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=8)],
+        recargos=[2],
+        descuentos=[1],
+        subsidios=[1]
+    )
+
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", contar)
+    try:
+        actualizado = await actualizar_reporte_nomina(db_session, reporte.id, cambio)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", contar)
+
+    # Reporte, empleado, UPDATE de los totales, acumulados del año, diferencias de detalles y resumen
+    assert len(sentencias) <= 6
+
+    quincena = (await db_session.execute(
+        select(QuincenaValor.tipo_recargo_id, QuincenaValor.cantidad_dias, QuincenaValor.valor_quincena)
+        .where(QuincenaValor.reporte_nomina_id == reporte.id)
+    )).all()
+    assert quincena == [(2, 8, Decimal("468000.00"))]
+    assert (await db_session.scalars(
+        select(ReporteNominaRecargo.tipo_recargo_id).where(ReporteNominaRecargo.reporte_nomina_id == reporte.id)
+    )).all() == [2]
+    assert (await db_session.scalars(
+        select(ReporteNominaDescuento.tipo_descuento_id).where(ReporteNominaDescuento.reporte_nomina_id == reporte.id)
+    )).all() == [1]
+    assert actualizado.total_pagado == await db_session.scalar(
+        select(ReporteNomina.total_pagado).where(ReporteNomina.id == reporte.id)
+    )
+
+    # Repetir la misma actualización no escribe nada
+    sentencias.clear()
+    event.listen(engine.sync_engine, "before_cursor_execute", contar)
+    try:
+        await actualizar_reporte_nomina(db_session, reporte.id, cambio)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", contar)
+    assert not any(sentencia.lstrip().upper().startswith("UPDATE") for sentencia in sentencias)
+    assert not any("reportes_nominas_resumen" in sentencia for sentencia in sentencias)
+
+
+@pytest.mark.asyncio
+async def test_eliminar_nominas_en_cascada(db_session: AsyncSession, test_data):
+    """Prueba el borrado por rango de fechas y por ID con los detalles borrados en cascada"""
+    from fastapi import HTTPException
+    from sqlalchemy import select, func
+    from app.db.crud import crear_reportes_nomina_lote, eliminar_reporte_nomina, eliminar_reportes_nomina
+    from app.db.models import QuincenaValor, ReporteNominaResumen
+
+    nominas = [
+        ReporteNominaCreate(
+            empleado_id=test_data["empleado_id"],
+            fecha_inicio=date(2024, mes, 1),
+            fecha_fin=date(2024, mes, 15),
+            quincena_valores=[
+                QuincenaValorCreate(tipo_recargo_id=1, cantidad_dias=15, valor_quincena=Decimal("650000.40"))
+            ],
+            recargos=[1],
+            descuentos=[1, 2],
+            subsidios=[1],
+            total_pagado=Decimal("738606.37")
+        )
+        for mes in (4, 5, 6)
+    ]
+    guardadas = await crear_reportes_nomina_lote(db_session, nominas)
+
+    with pytest.raises(HTTPException) as error:
+        await eliminar_reportes_nomina(db_session)
+    assert error.value.status_code == 400
+
+    resultado = await eliminar_reportes_nomina(db_session, fecha_desde=date(2024, 5, 1), fecha_hasta=date(2024, 6, 30))
+    assert resultado["eliminadas"] == 2
+    assert set(resultado["ids"]) == {guardadas[1]["id"], guardadas[2]["id"]}
+
+    await eliminar_reporte_nomina(db_session, guardadas[0]["id"])
+    with pytest.raises(HTTPException) as error:
+        await eliminar_reporte_nomina(db_session, guardadas[0]["id"])
+    assert error.value.status_code == 404
+
+    assert await db_session.scalar(select(func.count()).select_from(QuincenaValor)) == 0
+    assert await db_session.scalar(select(func.count()).select_from(ReporteNominaResumen)) == 0
+
+
+@pytest.mark.asyncio
+async def test_listado_empleados(db_session: AsyncSession, test_data):
+    """Prueba la paginación por cursor, los filtros y los campos parciales del listado de empleados"""
+    from fastapi import HTTPException
+    from app.services.empleados import obtener_empleados, campos_solicitados
+
+    db_session.add_all([
+        Empleado(cedula=cedula, nombres=nombres, apellidos=apellidos, salario_base=Decimal("1300000.00"))
+        for cedula, nombres, apellidos in [
+            ("1234500001", "Ana", "Álvarez"),
+            ("9876500002", "Luis_Ángel", "Zapata"),
+            ("1234500003", "María", "Gómez Ruiz"),
+        ]
+    ])
+    await db_session.commit()
+
+    vistos, cursor = [], None
+    while True:
+        pagina = await obtener_empleados(db_session, limite=2, cursor=cursor, campos=("id", "apellidos"))
+        assert all(set(item) == {"id", "apellidos"} for item in pagina["items"])
+        vistos.extend(item["apellidos"] for item in pagina["items"])
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    assert len(vistos) == 4 and len(set(vistos)) == 4
+
+    pagina = await obtener_empleados(db_session, cedula="123450", campos=("cedula",))
+    assert sorted(item["cedula"] for item in pagina["items"]) == ["1234500001", "1234500003"]
+
+    pagina = await obtener_empleados(db_session, nombre="maría gómez")
+    assert [item["nombres"] for item in pagina["items"]] == ["María"]
+    assert pagina["items"][0]["salario_base"] == Decimal("1300000.00")
+
+    # Los comodines de LIKE se buscan literalmente
+    pagina = await obtener_empleados(db_session, nombre="s_Á")
+    assert [item["nombres"] for item in pagina["items"]] == ["Luis_Ángel"]
+    assert (await obtener_empleados(db_session, cedula="%"))["items"] == []
+
+    assert campos_solicitados("nombres, id") == ("id", "nombres")
+    with pytest.raises(HTTPException):
+        campos_solicitados("id,clave")
+
+    # OpenAPI documenta la página real: ningún campo de los elementos es obligatorio
+    from app.main import app
+    esquemas = app.openapi()["components"]["schemas"]
+    respuesta = app.openapi()["paths"]["/empleados/"]["get"]["responses"]["200"]
+    assert respuesta["content"]["application/json"]["schema"]["$ref"].endswith("/EmpleadoPagina")
+    assert "required" not in esquemas["EmpleadoParcial"]
+
+@pytest.mark.asyncio
+async def test_cursor_alterado(db_session: AsyncSession):
+    """Prueba que un cursor con valores que no son texto se rechace con 400"""
+    import base64
+    from fastapi import HTTPException
+    from app.services.empleados import obtener_empleados
+    from app.services.reporte_payroll import obtener_reporte_nominas
+
+    def cursor(valores: str) -> str:
+        return base64.urlsafe_b64encode(valores.encode()).decode()
+
+    for consulta in (
+        obtener_reporte_nominas(db_session, cursor=cursor("[1, null]")),
+        obtener_empleados(db_session, cursor=cursor('["Gómez", 2, {}]')),
+    ):
+        with pytest.raises(HTTPException) as error:
+            await consulta
+        assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_importar_empleados(db_session: AsyncSession, test_data):
+    """Prueba la importación por cédula con COPY: altas, actualizaciones y errores por fila"""
+    from sqlalchemy import select
+    from app.db.models import ReporteNominaResumen
+    from app.services.importacion_empleados import importar_empleados
+
+    nomina_data = ReporteNominaCreate(
+        empleado_id=test_data["empleado_id"],
+        fecha_inicio=date(2024, 4, 1),
+        fecha_fin=date(2024, 4, 15),
+        quincena_valores=[QuincenaValorCreate(tipo_recargo_id=1, cantidad_dias=15, valor_quincena=Decimal("0"))],
+        recargos=[1],
+        descuentos=[],
+        subsidios=[]
+    )
+    reporte = await crear_reporte_nomina(db_session, await calcular_nomina(db_session, nomina_data))
+
+    async def trozos(contenido: str, tamaño: int = 7):
+        # El cuerpo llega partido en cualquier punto, también a mitad de línea
+        datos = contenido.encode()
+        for inicio in range(0, len(datos), tamaño):
+            yield datos[inicio:inicio + tamaño]
+
+    archivo = "\r\n".join([
+        "cedula,nombres,apellidos,telefono,puesto_trabajo,salario_base",
+        "1234567890,Test,Usuario Nuevo,1234567890,Analista,2000000.00",
+        "1112223334,Ana,Pérez,+573001234567,,1500000.50",
+        "12345,Corta,Cédula,,,1000000",
+        "1112223334,Ana,Repetida,,,1500000",
+        "5556667778,Sin,Columnas",
+        "5556667779,Luis,Ríos,abc,Cocina,1300000",
+        "",
+    ])
+    resultado = await importar_empleados(db_session, "csv", trozos(archivo))
+    assert (resultado["creados"], resultado["actualizados"], resultado["sin_cambios"], resultado["fallidos"]) == (1, 1, 0, 4)
+    assert [(error["fila"], error["cedula"]) for error in resultado["errores"]] == [
+        (4, "12345"), (5, "1112223334"), (6, None), (7, "5556667779")
+    ]
+    assert resultado["errores"][3]["errores"][0].startswith("telefono:")
+
+    nueva = await db_session.scalar(select(Empleado).where(Empleado.cedula == "1112223334"))
+    assert (nueva.apellidos, nueva.telefono, nueva.puesto_trabajo, nueva.salario_base) == (
+        "Pérez", "+573001234567", None, Decimal("1500000.50")
+    )
+    # Los datos del empleado actualizado llegan al resumen de sus nóminas
+    resumen = await db_session.get(ReporteNominaResumen, reporte.id)
+    await db_session.refresh(resumen)
+    assert resumen.apellidos == "Usuario Nuevo"
+
+    ndjson = "\n".join([
+        '{"cedula": "1112223334", "nombres": "Ana", "apellidos": "Pérez", "telefono": "+573001234567", "salario_base": "1500000.50"}',
+        '{"cedula": "9998887776", "nombres": "Eva", "apellidos": "Mora", "salario_base": 1400000}',
+        '{"cedula": "9998887775", "nombres": ',
+        '[1, 2]',
+    ])
+    resultado = await importar_empleados(db_session, "ndjson", trozos(ndjson, 50))
+    assert (resultado["creados"], resultado["actualizados"], resultado["sin_cambios"], resultado["fallidos"]) == (1, 0, 1, 2)
+    assert [error["fila"] for error in resultado["errores"]] == [3, 4]
+
+    # Una línea en otra codificación es un error de esa fila, no de todo el archivo
+    async def latin1():
+        yield '{"cedula": "7776665554", "nombres": "José", "apellidos": "Núñez", "salario_base": 1300000}\n'.encode("latin-1")
+        yield '{"cedula": "7776665553", "nombres": "Eva", "apellidos": "Luna", "salario_base": 1300000}'.encode()
+
+    resultado = await importar_empleados(db_session, "ndjson", latin1())
+    assert (resultado["creados"], resultado["fallidos"]) == (1, 1)
+    assert resultado["errores"] == [{"fila": 1, "cedula": None, "errores": ["La línea no es texto UTF-8 válido"]}]
+
+@pytest.mark.asyncio
+async def test_trabajos_nomina(engine, db_session: AsyncSession, test_data, monkeypatch):
+    """Prueba la cola de trabajos: bloques concurrentes, errores por empleado y trabajos retomados"""
+    import httpx
+    from sqlalchemy import select, func, update, insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.main import app
+    from app.db.database import get_db
+    from app.db.models import ReporteNomina, TrabajoNomina, TrabajoNominaBloque
+    from app.db.schemas import TrabajoNominaCreate
+    from app.services import trabajos_nomina
+    from app.services.cache_backend import cache_backend
+    from app.services.trabajos_nomina import (
+        encolar_trabajo, obtener_trabajo, procesar_pendientes, procesar_trabajo, tomar_trabajo, _registrar_bloque
+    )
+
+    # Los bloques concurrentes necesitan más de la conexión única del motor de pruebas
+    motor = create_async_engine(engine.url, pool_size=4, max_overflow=0)
+    Sesion = sessionmaker(bind=motor, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(trabajos_nomina, "TRABAJOS_TAMANO_BLOQUE", 2)
+
+    def nomina(empleado_id, quincena: int):
+        inicio = date(2024, 1, 1) + timedelta(days=15 * quincena)
+        return ReporteNominaCreate(
+            empleado_id=empleado_id, fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=14),
+            quincena_valores=[QuincenaValorCreate(tipo_recargo_id=1, cantidad_dias=15, valor_quincena=Decimal("0"))],
+            recargos=[1], descuentos=[1, 2], subsidios=[1]
+        )
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            # Sin caché compartido ningún trabajador podría ejecutarlo
+            assert (await cliente.post("/nominas/jobs", json={"tipo": "recalculo"})).status_code == 503
+            monkeypatch.setattr(cache_backend, "compartido", True)
+            respuesta = await cliente.post("/nominas/jobs", json={"tipo": "lote", "nominas": [
+                nomina(test_data["empleado_id"], q).model_dump(mode="json") for q in range(4)
+            ] + [nomina(uuid4(), 0).model_dump(mode="json")]})
+            assert respuesta.status_code == 202
+            trabajo_id = respuesta.json()["id"]
+            assert respuesta.json()["estado"] == "pendiente"
+            assert (await cliente.post("/nominas/jobs", json={"tipo": "lote"})).status_code == 422
+
+            assert await procesar_pendientes(Sesion, trabajador="prueba", concurrencia=2) == 1
+            estado = (await cliente.get(f"/nominas/jobs/{trabajo_id}")).json()
+            assert (await cliente.get(f"/nominas/jobs/{uuid4()}")).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+    assert (estado["estado"], estado["total"], estado["procesados"], estado["exitosos"], estado["fallidos"]) == (
+        "completado", 5, 5, 4, 1
+    )
+    assert estado["porcentaje"] == 100 and estado["por_segundo"] > 0
+    assert [error["indice"] for error in estado["errores"]] == [4]
+    assert estado["errores"][0]["error"] == "Empleado no encontrado"
+    assert await db_session.scalar(select(func.count()).select_from(ReporteNomina)) == 4
+
+    # Recálculo repartido por empleados
+    trabajo = await encolar_trabajo(db_session, TrabajoNominaCreate(tipo="recalculo"))
+    assert await procesar_pendientes(Sesion, trabajador="prueba") == 1
+    estado = await obtener_trabajo(db_session, trabajo["id"])
+    assert (estado["estado"], estado["total"], estado["procesados"], estado["fallidos"]) == ("completado", 1, 1, 0)
+
+    # Un trabajo tomado por un proceso que dejó de latir se retoma sin repetir sus bloques
+    trabajo = await encolar_trabajo(db_session, TrabajoNominaCreate(
+        tipo="lote", nominas=[nomina(test_data["empleado_id"], q) for q in (10, 11)]
+    ))
+    async with Sesion() as db:
+        assert (await tomar_trabajo(Sesion, "caido")).id == trabajo["id"]
+        parametros = (await db.get(TrabajoNomina, trabajo["id"])).parametros
+        await db.execute(update(TrabajoNomina).where(TrabajoNomina.id == trabajo["id"]).values(
+            parametros={**parametros, "tamano_bloque": 1}, total=2
+        ))
+        await db.execute(insert(TrabajoNominaBloque).values(
+            trabajo_id=trabajo["id"], bloque=0, procesados=1, exitosos=1, fallidos=0, errores=[]
+        ))
+        await db.commit()
+    # Mientras el latido esté vigente nadie más lo toma
+    assert await procesar_pendientes(Sesion, trabajador="prueba") == 0
+    async with Sesion() as db:
+        await db.execute(update(TrabajoNomina).where(TrabajoNomina.id == trabajo["id"]).values(
+            latido_en=func.now() - timedelta(hours=1)
+        ))
+        await db.commit()
+    assert await procesar_pendientes(Sesion, trabajador="prueba") == 1
+    estado = await obtener_trabajo(db_session, trabajo["id"])
+    assert (estado["estado"], estado["procesados"], estado["exitosos"]) == ("completado", 2, 2)
+    # Solo se creó la nómina del bloque que faltaba
+    assert await db_session.scalar(select(func.count()).select_from(ReporteNomina)) == 5
+    # Registrar de nuevo un bloque guardado no falla ni lo duplica
+    async with Sesion() as db:
+        await db.execute(update(TrabajoNomina).where(TrabajoNomina.id == trabajo["id"]).values(estado="en_proceso"))
+        assert not await _registrar_bloque(db, trabajo["id"], "prueba", 0, 1, 1, [])
+        await db.rollback()
+
+    # Un proceso lento que sigue vivo después de que otro retomó su trabajo no escribe nada
+    trabajo = await encolar_trabajo(db_session, TrabajoNominaCreate(
+        tipo="lote", nominas=[nomina(test_data["empleado_id"], q) for q in (12, 13)]
+    ))
+    tomado = await tomar_trabajo(Sesion, "lento")
+    async with Sesion() as db:
+        await db.execute(update(TrabajoNomina).where(TrabajoNomina.id == trabajo["id"]).values(
+            latido_en=func.now() - timedelta(hours=1)
+        ))
+        await db.commit()
+    retomado = await tomar_trabajo(Sesion, "prueba")
+    assert retomado.id == tomado.id == trabajo["id"]
+    await procesar_trabajo(Sesion, tomado.id, tomado.tipo, tomado.parametros, "lento")
+    estado = await obtener_trabajo(db_session, trabajo["id"])
+    assert (estado["estado"], estado["procesados"]) == ("en_proceso", 0)
+    await procesar_trabajo(Sesion, retomado.id, retomado.tipo, retomado.parametros, "prueba")
+    estado = await obtener_trabajo(db_session, trabajo["id"])
+    assert (estado["estado"], estado["procesados"], estado["exitosos"]) == ("completado", 2, 2)
+    assert await db_session.scalar(select(func.count()).select_from(ReporteNomina)) == 7
+
+    await db_session.rollback()
+    await motor.dispose()
+
+@pytest.mark.asyncio
+async def test_trabajador_exige_cache_compartido(monkeypatch):
+    """Prueba que el trabajador no arranque con el caché en memoria y se suscriba a las invalidaciones"""
+    import sys
+    from app.services import trabajos_nomina
+    from app.services.cache_backend import MemoriaBackend, RedisBackend
+    fakeredis = pytest.importorskip("fakeredis")
+
+    class MotorFalso:
+        async def dispose(self):
+            pass
+
+    suscrito = []
+    async def ejecutar_trabajador(**kwargs):
+        suscrito.append(trabajos_nomina.cache_backend._suscrito.is_set())
+
+    monkeypatch.setattr(sys, "argv", ["trabajos_nomina", "--una-vez"])
+    monkeypatch.setattr(trabajos_nomina, "engine", MotorFalso())
+    monkeypatch.setattr(trabajos_nomina, "ejecutar_trabajador", ejecutar_trabajador)
+
+    monkeypatch.setattr(trabajos_nomina, "cache_backend", MemoriaBackend(max_bytes=1000))
+    with pytest.raises(SystemExit):
+        await trabajos_nomina.main()
+    assert suscrito == []
+
+    monkeypatch.setattr(trabajos_nomina, "cache_backend", RedisBackend(fakeredis.FakeAsyncRedis(), prefijo="prueba"))
+    await trabajos_nomina.main()
+    assert suscrito == [True]
+    assert trabajos_nomina.cache_backend._tarea is None
+
+@pytest.mark.asyncio
+async def test_vigencias_entre_años(db_session: AsyncSession, test_data):
+    """Prueba que un lote que cruza de año use la configuración y las tarifas de cada periodo"""
+    import httpx
+    from app.main import app
+    from app.db.database import get_db
+    from app.db.schemas import RecalculoNominaRequest
+    from app.db.crud import crear_reportes_nomina_lote
+    from app.services.payroll import calcular_nominas_lote
+    from app.services.recalculo import recalcular_nominas
+
+    db_session.add(ConfigSalario(
+        año="2025", salario_minimo=Decimal("1423500.00"), horas_semana=46, horas_mes=184,
+        valor_hora=Decimal("6188.49"), horas_salario=7
+    ))
+    await db_session.commit()
+    catalogo_cache.invalidar()
+
+    def nomina(inicio: date):
+        return ReporteNominaCreate(
+            empleado_id=test_data["empleado_id"], fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=14),
+            quincena_valores=[QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=5, valor_quincena=Decimal("0"))],
+            recargos=[2], descuentos=[], subsidios=[]
+        )
+
+    fechas = [date(2024, 12, 16), date(2025, 1, 1)]
+    calculadas = await calcular_nominas_lote(db_session, [nomina(fecha) for fecha in fechas])
+    assert [n.total_pagado for n, _ in calculadas] == [Decimal("7312.50") * 5 * 8, Decimal("7312.50") * 5 * 7]
+    # El cálculo individual resuelve en SQL la misma vigencia que el índice en memoria
+    for fecha, (calculada, _) in zip(fechas, calculadas):
+        assert (await calcular_nomina(db_session, nomina(fecha))).total_pagado == calculada.total_pagado
+    assert (await calcular_nominas_lote(db_session, [nomina(date(2023, 12, 16))]))[0] == (None, "No hay configuración de salario vigente")
+    guardadas = await crear_reportes_nomina_lote(db_session, [n for n, _ in calculadas])
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            vigencia = {"vigente_desde": "2025-01-01", "porcentaje": "0.35", "valor_hora": "8000.00"}
+            respuesta = await cliente.post("/tipos_recargos/2/vigencias", json=vigencia)
+            assert respuesta.status_code == 201
+            assert (await cliente.post("/tipos_recargos/2/vigencias", json=vigencia)).status_code == 400
+            assert (await cliente.post("/tipos_recargos/9/vigencias", json=vigencia)).status_code == 404
+            assert [v["vigente_desde"] for v in (await cliente.get("/tipos_recargos/2/vigencias")).json()] == ["2025-01-01"]
+    finally:
+        app.dependency_overrides.clear()
+
+    # La tarifa nueva solo cambia el reporte de 2025
+    resultado = await recalcular_nominas(db_session, RecalculoNominaRequest())
+    assert [(d["reporte_nomina_id"], d["total_nuevo"]) for d in resultado["diferencias"]] == [
+        (guardadas[1]["id"], Decimal("280000.00"))
+    ]
+    assert (await calcular_nomina(db_session, nomina(fechas[1]))).total_pagado == Decimal("8000.00") * 5 * 7
+@pytest.mark.asyncio
+async def test_simular_nominas(db_session: AsyncSession, test_data):
+    """Prueba la simulación de escenarios: tarifas reemplazadas, errores por escenario y sin escrituras"""
+    import httpx
+    from sqlalchemy import select, func
+    from app.main import app
+    from app.db.database import get_db
+    from app.db.models import ReporteNomina
+    from app.core.instrumentacion import presupuesto_consultas
+
+    def escenario(nombre, valores, **extra):
+        return {
+            "nombre": nombre, "empleado_id": str(test_data["empleado_id"]),
+            "fecha_inicio": "2024-02-01", "fecha_fin": "2024-02-15",
+            "quincena_valores": [{"tipo_recargo_id": t, "cantidad_dias": d} for t, d in valores],
+            "recargos": [t for t, _ in valores], "descuentos": [1, 2], "subsidios": [1], **extra
+        }
+
+    escenarios = [
+        escenario("nocturnas", [(1, 10), (2, 5)]),
+        escenario("nocturnas con tarifa nueva", [(1, 10), (2, 5)], tarifas={"recargos": {"2": "8000.00"}}),
+        escenario("recargo inexistente", [(9, 1)]),
+    ]
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            respuesta = await cliente.post("/nominas/simular", json=escenarios)
+            assert respuesta.status_code == 200
+            # Con el caché de catálogos cargado, cientos de escenarios no consultan la base de datos
+            with presupuesto_consultas(0):
+                varios = await cliente.post("/nominas/simular", json=escenarios[:2] * 200)
+            assert varios.json()["exitosos"] == 400
+    finally:
+        app.dependency_overrides.clear()
+
+    datos = respuesta.json()
+    assert (datos["exitosos"], datos["fallidos"]) == (2, 1)
+    base, tarifa_nueva, error = datos["resultados"]
+    assert [linea["tipo_hora"] for linea in base["lineas"]] == ["ORDINARIA", "NOCTURNA"]
+    assert Decimal(tarifa_nueva["lineas"][1]["valor_quincena"]) == Decimal("8000.00") * 5 * 8
+    assert Decimal(tarifa_nueva["total_pagado"]) > Decimal(base["total_pagado"])
+    assert (error["indice"], error["nombre"], error["exito"]) == (2, "recargo inexistente", False)
+    assert error["error"] == "Tipo de recargo 9 no encontrado"
+    assert (await db_session.execute(select(func.count()).select_from(ReporteNomina))).scalar_one() == 0
+@pytest.mark.asyncio
+async def test_acumulados_nominas(db_session: AsyncSession, test_data):
+    """Prueba que las rutas de escritura mantengan los acumulados del año y el historial del empleado"""
+    import httpx
+    from sqlalchemy import select, func, extract, update
+    from app.main import app
+    from app.db.database import get_db
+    from app.db.models import ReporteNomina, NominaAcumuladoAnual
+    from app.db.schemas import ReporteNominaUpdate, RecalculoNominaRequest
+    from app.db.crud import (
+        crear_reportes_nomina_lote, actualizar_reporte_nomina, eliminar_reporte_nomina, eliminar_reportes_nomina
+    )
+    from app.services.recalculo import recalcular_nominas
+
+    def nomina(inicio: date, dias: int):
+        return ReporteNominaCreate(
+            empleado_id=test_data["empleado_id"], fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=14),
+            quincena_valores=[QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=dias, valor_quincena=Decimal("0"))],
+            recargos=[2], descuentos=[1, 2], subsidios=[1]
+        )
+
+    async def acumulados():
+        result = await db_session.execute(
+            select(NominaAcumuladoAnual.año, NominaAcumuladoAnual.reportes, NominaAcumuladoAnual.total_devengado,
+                   NominaAcumuladoAnual.total_subsidios, NominaAcumuladoAnual.total_descuentos, NominaAcumuladoAnual.total_pagado)
+            .where(NominaAcumuladoAnual.reportes > 0)
+        )
+        return {fila[0]: tuple(fila[1:]) for fila in result.all()}
+
+    async def sumas_reportes():
+        año = extract("year", ReporteNomina.fecha_inicio)
+        result = await db_session.execute(
+            select(año, func.count(), func.sum(ReporteNomina.total_devengado), func.sum(ReporteNomina.total_subsidios),
+                   func.sum(ReporteNomina.total_descuentos), func.sum(ReporteNomina.total_pagado))
+            .group_by(año)
+        )
+        return {int(fila[0]): tuple(fila[1:]) for fila in result.all()}
+
+    primera = await crear_reporte_nomina(db_session, await calcular_nomina(db_session, nomina(date(2024, 1, 1), 5)))
+    assert primera.total_devengado - primera.total_descuentos == primera.total_pagado
+    assert primera.total_subsidios > 0
+    lote = await crear_reportes_nomina_lote(db_session, [
+        await calcular_nomina(db_session, nomina(inicio, dias))
+        for inicio, dias in ((date(2024, 1, 16), 6), (date(2024, 2, 1), 7), (date(2025, 1, 1), 8))
+    ])
+    assert (await acumulados())[2024][0] == 3
+    assert await acumulados() == await sumas_reportes()
+
+    # Cambiar el periodo mueve el reporte de un año al otro
+    await actualizar_reporte_nomina(db_session, lote[1]["id"], ReporteNominaUpdate(**nomina(date(2025, 1, 16), 10).model_dump()))
+    assert [(await acumulados())[año][0] for año in (2024, 2025)] == [2, 2]
+    assert await acumulados() == await sumas_reportes()
+
+    # Un subsidio corregido cambia los totales guardados al recalcular
+    await db_session.execute(update(TipoSubsidio).where(TipoSubsidio.id == 1).values(valor=Decimal("200000.00")))
+    assert (await recalcular_nominas(db_session, RecalculoNominaRequest(dry_run=False)))["reportes_modificados"] == 4
+    assert await acumulados() == await sumas_reportes()
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            respuesta = await cliente.get(f"/empleados/{test_data['empleado_id']}/nominas", params={"limite": 3})
+            assert respuesta.status_code == 200
+            datos = respuesta.json()
+            assert [n["fecha_inicio"] for n in datos["items"]] == ["2025-01-16", "2025-01-01", "2024-01-16"]
+            assert datos["next_cursor"] is not None
+            assert [(a["año"], a["reportes"]) for a in datos["acumulados"]] == [(2025, 2), (2024, 2)]
+            assert Decimal(datos["acumulados"][1]["total_subsidios"]) == Decimal("400000.00")
+            siguiente = await cliente.get(
+                f"/empleados/{test_data['empleado_id']}/nominas", params={"limite": 3, "cursor": datos["next_cursor"]}
+            )
+            assert [n["id"] for n in siguiente.json()["items"]] == [str(primera.id)]
+            assert (await cliente.get(f"/empleados/{uuid4()}/nominas")).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+    await eliminar_reporte_nomina(db_session, primera.id)
+    await eliminar_reportes_nomina(db_session, ids=[lote[2]["id"]])
+    assert set(await acumulados()) == {2024, 2025}
+    assert await acumulados() == await sumas_reportes()
+    await eliminar_reportes_nomina(db_session, fecha_desde=date(2024, 1, 1), fecha_hasta=date(2024, 12, 31))
+    assert await acumulados() == await sumas_reportes()
+@pytest.mark.asyncio
+async def test_renombrar_tipos_refresca_listado(db_session: AsyncSession, test_data):
+    """Prueba que renombrar un recargo, descuento o subsidio se vea en el listado de nóminas"""
+    import httpx
+    from app.main import app
+    from app.db.database import get_db
+
+    nomina_data = ReporteNominaCreate(
+        empleado_id=test_data["empleado_id"], fecha_inicio=date(2024, 3, 1), fecha_fin=date(2024, 3, 15),
+        quincena_valores=[QuincenaValorCreate(tipo_recargo_id=2, cantidad_dias=3, valor_quincena=Decimal("0"))],
+        recargos=[2], descuentos=[1, 2], subsidios=[1]
+    )
+    await crear_reporte_nomina(db_session, await calcular_nomina(db_session, nomina_data))
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            assert (await cliente.get("/nominas/")).json()["items"][0]["descuentos_aplicados"] == "PENSION\nSALUD"
+            for ruta, datos in (
+                ("/tipos_descuentos/1", {"tipo": "EPS", "valor": "0.04"}),
+                ("/tipos_subsidios/1", {"tipo": "AUXILIO_TRANSPORTE", "valor": "140606.00"}),
+                ("/tipos_recargos/2", {"tipo_hora": "RECARGO_NOCTURNO", "porcentaje": "0.35", "valor_hora": "7312.50"}),
+            ):
+                assert (await cliente.put(ruta, json=datos)).status_code == 200
+            listado = (await cliente.get("/nominas/")).json()["items"][0]
+    finally:
+        app.dependency_overrides.clear()
+
+    assert listado["descuentos_aplicados"] == "EPS\nPENSION"
+    assert listado["subsidios_aplicados"] == "AUXILIO_TRANSPORTE"
+    assert listado["recargos_y_valores"].startswith("RECARGO_NOCTURNO 3 días")
+
+@pytest.mark.asyncio
+async def test_nomina_con_tipos_repetidos(db_session: AsyncSession, test_data):
+    """Prueba que un tipo repetido en una nómina se rechace con 422 sin guardar nada"""
+    import httpx
+    from sqlalchemy import select, func
+    from app.main import app
+    from app.db.database import get_db
+    from app.db.models import ReporteNomina
+
+    nomina = {
+        "empleado_id": str(test_data["empleado_id"]), "fecha_inicio": "2024-03-01", "fecha_fin": "2024-03-15",
+        "quincena_valores": [{"tipo_recargo_id": 1, "cantidad_dias": 15, "valor_quincena": "0"}],
+        "recargos": [1], "descuentos": [1, 2], "subsidios": [1]
+    }
+    repetidas = [
+        {**nomina, "descuentos": [1, 2, 1]},
+        {**nomina, "subsidios": [1, 1]},
+        {**nomina, "recargos": [1, 1]},
+        {**nomina, "quincena_valores": nomina["quincena_valores"] * 2},
+    ]
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            for datos in repetidas:
+                respuesta = await cliente.post("/nominas/", json=datos)
+                assert respuesta.status_code == 422
+                assert "repetidos" in respuesta.text
+            assert (await cliente.post("/nominas/batch", json=[nomina, repetidas[0]])).status_code == 422
+            reportes = (await db_session.execute(select(func.count()).select_from(ReporteNomina))).scalar()
+            assert reportes == 0
+            assert (await cliente.post("/nominas/batch", json=[nomina])).status_code == 201
+    finally:
+        app.dependency_overrides.clear()
+
+@pytest.mark.asyncio
+async def test_config_salario_vigencia(db_session: AsyncSession, test_data):
+    """Prueba que la vigencia por defecto solo se aplique al crear una configuración de salario"""
+    import httpx
+    from app.main import app
+    from app.db.database import get_db
+
+    config = {
+        "año": 2025, "salario_minimo": "1423500.00", "horas_semana": 46, "horas_mes": 184,
+        "valor_hora": "6188.49", "horas_salario": 7
+    }
+
+    async def get_db_prueba():
+        yield db_session
+
+    try:
+        app.dependency_overrides[get_db] = get_db_prueba
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+            creada = (await cliente.post("/config_salarios/", json=config)).json()
+            assert creada["vigente_desde"] == "2025-01-01"
+            assert (await cliente.post("/config_salarios/", json=config)).status_code == 400
+
+            config_2026 = {**config, "año": 2026}
+            mitad = (await cliente.post("/config_salarios/", json={**config_2026, "vigente_desde": "2026-07-01"})).json()
+            # Sin fecha en la actualización se conserva la guardada
+            respuesta = await cliente.put(f"/config_salarios/{mitad['id']}", json={**config_2026, "horas_salario": 8})
+            assert respuesta.status_code == 200
+            assert respuesta.json()["vigente_desde"] == "2026-07-01"
+            assert respuesta.json()["horas_salario"] == 8
+            # Una fecha que ya usa otra configuración se rechaza sin error del servidor
+            respuesta = await cliente.put(f"/config_salarios/{mitad['id']}", json={**config_2026, "vigente_desde": "2025-01-01"})
+            assert respuesta.status_code == 400
+            respuesta = await cliente.put(f"/config_salarios/{creada['id']}", json={**config, "vigente_desde": "2025-01-01"})
+            assert respuesta.status_code == 200
+    finally:
+        app.dependency_overrides.clear()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import pytest
+from decimal import Decimal
+from uuid import uuid4
+from datetime import date
+from app.db.schemas import ReporteNominaCreate, QuincenaValorCreate
+from app.services.payroll_engine import (
+    calcular, CatalogoSnapshot, ConfigSalarioInfo, RecargoInfo,
+    SubsidioInfo, DescuentoInfo, NominaInvalida, CatalogoNoEncontrado, indexar_vigencias, con_tarifas
+)
+
+@pytest.fixture
+def catalogo():
+    """Instantánea de catálogos equivalente a los datos de prueba de test_main"""
+    return CatalogoSnapshot(
+        version=1,
+        config_salario=ConfigSalarioInfo(
+            id=1, año="2024", salario_minimo=Decimal("1300000.00"), horas_semana=48,
+            horas_mes=192, valor_hora=Decimal("5416.67"), horas_salario=Decimal("8")
+        ),
+        recargos={
+            1: RecargoInfo(1, "ORDINARIA", Decimal("0.00"), Decimal("5416.67")),
+            2: RecargoInfo(2, "NOCTURNA", Decimal("0.35"), Decimal("7312.50")),
+            3: RecargoInfo(3, "EXTRA_DIURNA", Decimal("0.25"), Decimal("6770.84")),
+        },
+        subsidios={1: SubsidioInfo(1, "TRANSPORTE", Decimal("140606.00"))},
+        descuentos={
+            1: DescuentoInfo(1, "SALUD", Decimal("0.04")),
+            2: DescuentoInfo(2, "PENSION", Decimal("0.04")),
+        }
+    )
+
+def _nomina(quincena_valores, **kwargs):
+    datos = dict(
+        empleado_id=uuid4(),
+        fecha_inicio=date(2024, 2, 1),
+        fecha_fin=date(2024, 2, 15),
+        quincena_valores=[QuincenaValorCreate(tipo_recargo_id=t, cantidad_dias=d) for t, d in quincena_valores],
+        recargos=[t for t, _ in quincena_valores],
+        descuentos=[1, 2],
+        subsidios=[1]
+    )
+    datos.update(kwargs)
+    return ReporteNominaCreate(**datos)
+
+def test_calculo_con_recargos(catalogo):
+    """Prueba el cálculo de horas ordinarias, nocturnas y extras sin base de datos"""
+    nomina = _nomina([(1, 10), (2, 5), (3, 4)])
+
+    resultado = calcular(catalogo.config_salario, catalogo, nomina)
+
+    ordinario = Decimal("5416.67") * 10 * 8
+    nocturno = Decimal("7312.50") * 5 * 8
+    extra = Decimal("6770.84") * 4
+    devengado = ordinario + nocturno + extra + Decimal("140606.00")
+
+    assert [linea.valor_quincena for linea in resultado.lineas] == [ordinario, nocturno, extra]
+    assert resultado.total_devengado == devengado
+    assert resultado.total_descuentos == devengado * Decimal("0.08")
+    assert resultado.total_pagado == devengado - devengado * Decimal("0.08")
+    # La nómina recibida no se modifica
+    assert nomina.total_pagado == Decimal("0")
+    assert nomina.quincena_valores[0].valor_quincena is None
+
+def test_calculo_errores(catalogo):
+    """Prueba que los errores de validación no dependan de HTTP ni de la base de datos"""
+    with pytest.raises(NominaInvalida):
+        calcular(catalogo.config_salario, catalogo, _nomina([(1, 10)], fecha_inicio=date(2024, 2, 16)))
+
+    with pytest.raises(CatalogoNoEncontrado):
+        calcular(catalogo.config_salario, catalogo, _nomina([(9, 10)], recargos=[]))
+
+    with pytest.raises(CatalogoNoEncontrado):
+        calcular(catalogo.config_salario, catalogo, _nomina([(1, 10)], descuentos=[7]))
+
+    with pytest.raises(CatalogoNoEncontrado):
+        calcular(None, catalogo, _nomina([(1, 10)]))
+
+def test_indice_vigencias(catalogo):
+    """Prueba que cada fecha resuelva la configuración y las tarifas de su intervalo"""
+    from dataclasses import replace
+
+    config_2024 = replace(catalogo.config_salario, vigente_desde=date(2024, 1, 1))
+    config_2025 = replace(catalogo.config_salario, id=2, año="2025", horas_salario=Decimal("7"), vigente_desde=date(2025, 1, 1))
+    nocturna_2025 = RecargoInfo(2, "NOCTURNA", Decimal("0.35"), Decimal("8000.00"))
+    vigencias = indexar_vigencias(
+        1, [config_2025, config_2024], catalogo.recargos, catalogo.subsidios, catalogo.descuentos,
+        cambios=[
+            (date(2025, 1, 1), "recargos", nocturna_2025),
+            (date(2024, 7, 1), "subsidios", SubsidioInfo(1, "TRANSPORTE", Decimal("162000.00"))),
+        ]
+    )
+
+    assert vigencias.fechas == (date(2024, 1, 1), date(2024, 7, 1), date(2025, 1, 1))
+    assert vigencias.en_fecha(date(2023, 12, 31)).config_salario is None
+    assert vigencias.en_fecha(date(2024, 1, 1)).config_salario == config_2024
+    assert vigencias.en_fecha(date(2024, 6, 30)).subsidios[1].valor == Decimal("140606.00")
+    assert vigencias.en_fecha(date(2024, 12, 16)).subsidios[1].valor == Decimal("162000.00")
+    assert vigencias.en_fecha(date(2024, 12, 16)).recargos[2].valor_hora == Decimal("7312.50")
+
+    vigente = vigencias.en_fecha(date(2025, 1, 1))
+    assert (vigente.config_salario, vigente.recargos[2], vigente.subsidios[1].valor) == (config_2025, nocturna_2025, Decimal("162000.00"))
+    # Los cambios no alteran los catálogos de los intervalos anteriores ni los recibidos
+    assert catalogo.recargos[2].valor_hora == Decimal("7312.50")
+
+    resultado = calcular(vigente.config_salario, vigente, _nomina([(2, 5)], fecha_inicio=date(2025, 1, 1), fecha_fin=date(2025, 1, 15)))
+    assert resultado.lineas[0].valor_quincena == Decimal("8000.00") * 5 * 7
+
+def test_con_tarifas(catalogo):
+    """Prueba que los reemplazos de tarifas de una simulación no alteren el catálogo original"""
+    simulado = con_tarifas(catalogo, horas_salario=Decimal("7"), recargos={2: Decimal("8000.00")}, descuentos={1: Decimal("0")})
+
+    resultado = calcular(simulado.config_salario, simulado, _nomina([(2, 5)]))
+    devengado = Decimal("8000.00") * 5 * 7 + Decimal("140606.00")
+    assert resultado.total_pagado == devengado - devengado * Decimal("0.04")
+    assert (catalogo.config_salario.horas_salario, catalogo.recargos[2].valor_hora) == (Decimal("8"), Decimal("7312.50"))
+    assert con_tarifas(catalogo) == catalogo
+
+    with pytest.raises(CatalogoNoEncontrado, match="Tipo de subsidio 5 no encontrado"):
+        con_tarifas(catalogo, subsidios={5: Decimal("1")})
+
+def test_recalculo_vectorizado_igual_a_decimal(catalogo):
+    """Prueba que el recálculo en centavos enteros coincida con el cálculo en Decimal redondeado"""
+    import random
+    import numpy as np
+    from decimal import ROUND_HALF_UP
+    from app.services.payroll_engine import recalcular_centavos, TIPOS_HORA_JORNADA
+
+    aleatorio = random.Random(7)
+    centavo = Decimal("0.01")
+    recargos = {
+        i: RecargoInfo(i, tipo, Decimal("0"), Decimal(aleatorio.randint(100000, 2000000)).scaleb(-2))
+        for i, tipo in enumerate(["ORDINARIA", "NOCTURNA", "EXTRA_DIURNA", "EXTRA_DOMINICAL_NOCTURNA", "DOMINICAL"], 1)
+    }
+    catalogo = CatalogoSnapshot(1, catalogo.config_salario, recargos, catalogo.subsidios, catalogo.descuentos)
+    horas_c = int(catalogo.config_salario.horas_salario * 100)
+
+    nominas = [
+        _nomina(
+            [(t, aleatorio.randint(0, 15)) for t in aleatorio.sample(sorted(recargos), aleatorio.randint(1, 5))],
+            descuentos=aleatorio.sample([1, 2], aleatorio.randint(0, 2)),
+            subsidios=[1] if aleatorio.random() < 0.5 else []
+        )
+        for _ in range(200)
+    ]
+    lineas = [(i, v) for i, n in enumerate(nominas) for v in n.quincena_valores]
+
+    valores_c, totales_c, devengados_c = recalcular_centavos(
+        reporte_idx=np.array([i for i, _ in lineas]),
+        cantidad_dias=np.array([v.cantidad_dias for _, v in lineas]),
+        valor_hora_c=np.array([int(recargos[v.tipo_recargo_id].valor_hora * 100) for _, v in lineas]),
+        es_jornada=np.array([recargos[v.tipo_recargo_id].tipo_hora in TIPOS_HORA_JORNADA for _, v in lineas]),
+        horas_salario_c=horas_c,
+        subsidios_c=np.array([sum(int(catalogo.subsidios[s].valor * 100) for s in n.subsidios) for n in nominas]),
+        descuentos_c=np.array([sum(int(catalogo.descuentos[d].valor * 100) for d in n.descuentos) for n in nominas]),
+    )
+
+    esperados_lineas, esperados_totales, esperados_devengados = [], [], []
+    for nomina in nominas:
+        resultado = calcular(catalogo.config_salario, catalogo, nomina)
+        esperados_lineas += [l.valor_quincena.quantize(centavo, ROUND_HALF_UP) for l in resultado.lineas]
+        esperados_totales.append(resultado.total_pagado.quantize(centavo, ROUND_HALF_UP))
+        esperados_devengados.append(resultado.total_devengado.quantize(centavo, ROUND_HALF_UP))
+
+    assert [Decimal(int(c)).scaleb(-2) for c in valores_c] == esperados_lineas
+    assert [Decimal(int(c)).scaleb(-2) for c in totales_c] == esperados_totales
+    assert [Decimal(int(c)).scaleb(-2) for c in devengados_c] == esperados_devengados
@@ -0,0 +1,5 @@
+"""Benchmarks de las rutas críticas de nómina.
+
+Se ejecutan contra una base de datos Postgres desechable indicada en BENCH_DATABASE_URL
+(variable de entorno o archivo .env). Las tablas de esa base se borran y se vuelven a crear.
+"""
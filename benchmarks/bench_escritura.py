@@ -0,0 +1,114 @@
+"""Mide las sentencias por reporte al guardar nóminas: ORM objeto a objeto contra inserción masiva.
+
+Uso:
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_escritura --repeticiones 50 --lote 5000
+
+Para crear_reporte_nomina informa sentencias por reporte y tiempos según el número de líneas de
+quincena; para crear_reportes_nomina_lote compara INSERT de varias filas contra COPY.
+"""
+import argparse
+import asyncio
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from app.db import crud
+from app.db.models import ReporteNomina, QuincenaValor, ReporteNominaRecargo, ReporteNominaDescuento, ReporteNominaSubsidio
+from app.db.schemas import ReporteNominaCreate, QuincenaValorCreate
+from app.services.resumen_nominas import refrescar_resumen
+from .semilla import crear_motor, crear_sesiones, reiniciar_esquema, sembrar, medir, resumen_tiempos, ContadorConsultas
+
+async def crear_reporte_nomina_orm(db, nomina_data: ReporteNominaCreate):
+    """Ruta de escritura anterior: un objeto ORM por fila, flush, commit y refresh.
+
+    Incluye la actualización del resumen para comparar el mismo trabajo que la ruta actual.
+    """
+    nueva_nomina = ReporteNomina(
+        empleado_id=nomina_data.empleado_id,
+        fecha_inicio=nomina_data.fecha_inicio,
+        fecha_fin=nomina_data.fecha_fin,
+        total_pagado=nomina_data.total_pagado
+    )
+    db.add(nueva_nomina)
+    await db.flush()
+    for valor in nomina_data.quincena_valores:
+        db.add(QuincenaValor(reporte_nomina_id=nueva_nomina.id, tipo_recargo_id=valor.tipo_recargo_id,
+                             cantidad_dias=valor.cantidad_dias, valor_quincena=valor.valor_quincena))
+    for recargo_id in nomina_data.recargos:
+        db.add(ReporteNominaRecargo(reporte_nomina_id=nueva_nomina.id, tipo_recargo_id=recargo_id))
+    for descuento_id in nomina_data.descuentos:
+        db.add(ReporteNominaDescuento(reporte_nomina_id=nueva_nomina.id, tipo_descuento_id=descuento_id))
+    for subsidio_id in nomina_data.subsidios:
+        db.add(ReporteNominaSubsidio(reporte_nomina_id=nueva_nomina.id, tipo_subsidio_id=subsidio_id))
+    await db.flush()
+    await refrescar_resumen(db, [nueva_nomina.id])
+    await db.commit()
+    await db.refresh(nueva_nomina)
+    return nueva_nomina
+
+def _nomina(empleado_id, indice: int, lineas: int) -> ReporteNominaCreate:
+    inicio = date(2000, 1, 1) + timedelta(days=15 * indice)
+    return ReporteNominaCreate(
+        empleado_id=empleado_id,
+        fecha_inicio=inicio,
+        fecha_fin=inicio + timedelta(days=14),
+        quincena_valores=[
+            QuincenaValorCreate(tipo_recargo_id=recargo_id, cantidad_dias=2, valor_quincena=Decimal("10833.34"))
+            for recargo_id in range(1, lineas + 1)
+        ],
+        recargos=list(range(1, lineas + 1)),
+        descuentos=[1, 2],
+        subsidios=[1],
+        total_pagado=Decimal("100000.00")
+    )
+
+async def _medir_creacion(engine, Sesion, funcion, empleado_id, lineas, repeticiones):
+    contador = 0
+    async with Sesion() as db:
+        async def crear():
+            nonlocal contador
+            contador += 1
+            await funcion(db, _nomina(empleado_id, contador, lineas))
+
+        with ContadorConsultas(engine) as consultas:
+            tiempos = await medir(crear, repeticiones)
+    return {"sentencias_por_reporte": consultas.total / repeticiones, **resumen_tiempos(tiempos)}
+
+async def _medir_lote(Sesion, empleado_id, tamaño, umbral_copy):
+    crud.UMBRAL_COPY = umbral_copy
+    nominas = [_nomina(empleado_id, indice, 4) for indice in range(tamaño)]
+    async with Sesion() as db:
+        tiempos = await medir(lambda: crud.crear_reportes_nomina_lote(db, nominas), 1)
+    return resumen_tiempos(tiempos)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--lote", type=int, default=5000, help="Reportes del lote para INSERT de varias filas contra COPY")
+    args = parser.parse_args()
+
+    engine = crear_motor()
+    Sesion = crear_sesiones(engine)
+    await reiniciar_esquema(engine)
+    async with Sesion() as db:
+        datos = await sembrar(db, 1, 0, 1)
+    empleado_id = datos["empleados"][0]
+
+    resultados = {"parametros": vars(args), "crear_reporte_nomina": {}}
+    for lineas in (1, 2, 4, 8):
+        resultados["crear_reporte_nomina"][f"{lineas}_lineas"] = {
+            "orm": await _medir_creacion(engine, Sesion, crear_reporte_nomina_orm, empleado_id, lineas, args.repeticiones),
+            "masivo": await _medir_creacion(engine, Sesion, crud.crear_reporte_nomina, empleado_id, lineas, args.repeticiones),
+        }
+
+    umbral = crud.UMBRAL_COPY
+    resultados["crear_reportes_nomina_lote"] = {
+        "insert_valores": await _medir_lote(Sesion, empleado_id, args.lote, args.lote * 10),
+        "copy": await _medir_lote(Sesion, empleado_id, args.lote, 1),
+    }
+    crud.UMBRAL_COPY = umbral
+
+    print(json.dumps(resultados, indent=2, default=str))
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+"""Mide las rutas críticas de la nómina sobre datos sintéticos y guarda los resultados en JSON.
+
+Siembra ``--empleados`` × ``--quincenas`` reportes con ``--recargos`` líneas cada uno en una base
+Postgres desechable y mide calcular_nomina, crear_reporte_nomina, actualizar_reporte_nomina,
+obtener_reporte_nominas y obtener_reporte_nomina: percentiles de latencia y sentencias por llamada.
+
+Uso:
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_nomina --empleados 200 --quincenas 24 --recargos 4 \\
+        --salida resultados/actual.json --comparar resultados/base.json
+
+Con --comparar se informa la variación de p50, p95 y sentencias contra un resultado anterior y el
+proceso termina con código 1 si alguna operación empeora más que --tolerancia.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from app.db.crud import crear_reporte_nomina, actualizar_reporte_nomina
+from app.db.schemas import ReporteNominaCreate, ReporteNominaUpdate, QuincenaValorCreate
+from app.services.payroll import calcular_nomina
+from app.services.reporte_payroll import obtener_reporte_nominas, obtener_reporte_nomina
+from app.services.resumen_nominas import reconstruir_resumen
+from .semilla import crear_motor, crear_sesiones, reiniciar_esquema, sembrar, medir, resumen_tiempos, ContadorConsultas
+
+# Métricas que se comparan entre ejecuciones; en todas, más es peor
+METRICAS_COMPARADAS = ("p50_ms", "p95_ms", "sentencias_por_llamada")
+
+def _nomina(empleado_id, fecha_inicio: date, recargos: int, dias: int = 2) -> ReporteNominaCreate:
+    return ReporteNominaCreate(
+        empleado_id=empleado_id,
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_inicio + timedelta(days=14),
+        quincena_valores=[
+            QuincenaValorCreate(tipo_recargo_id=recargo_id, cantidad_dias=dias, valor_quincena=Decimal("0"))
+            for recargo_id in range(1, recargos + 1)
+        ],
+        recargos=list(range(1, recargos + 1)),
+        descuentos=[1, 2],
+        subsidios=[1]
+    )
+
+async def _medir_operacion(engine, funcion, repeticiones: int, calentamiento: int) -> dict:
+    """Tiempos y sentencias por llamada de ``funcion``, descartando las primeras ``calentamiento`` llamadas."""
+    await medir(funcion, calentamiento)
+    with ContadorConsultas(engine) as consultas:
+        tiempos = await medir(funcion, repeticiones)
+    return {"sentencias_por_llamada": round(consultas.total / repeticiones, 2), **resumen_tiempos(tiempos)}
+
+async def ejecutar(args) -> dict:
+    engine = crear_motor()
+    Sesion = crear_sesiones(engine)
+    await reiniciar_esquema(engine)
+    async with Sesion() as db:
+        datos = await sembrar(db, args.empleados, args.quincenas, args.recargos, args.semilla)
+        await reconstruir_resumen(db)
+
+    aleatorio = random.Random(args.semilla)
+    empleados, reportes = datos["empleados"], datos["reportes"]
+    # Las nóminas nuevas empiezan después de las sembradas para no repetir periodos
+    siguiente = [date(2020, 1, 1) + timedelta(days=15 * args.quincenas)]
+
+    async def calcular():
+        async with Sesion() as db:
+            await calcular_nomina(db, _nomina(aleatorio.choice(empleados), siguiente[0], args.recargos))
+
+    async def crear():
+        async with Sesion() as db:
+            nomina = await calcular_nomina(db, _nomina(aleatorio.choice(empleados), siguiente[0], args.recargos))
+            await crear_reporte_nomina(db, nomina)
+        siguiente[0] += timedelta(days=15)
+
+    async def actualizar():
+        # sembrar crea los reportes por empleado y quincena en orden, de ahí salen empleado y periodo.
+        # Los días cambian en cada llamada para que la actualización siempre tenga diferencias.
+        indice = aleatorio.randrange(len(reportes))
+        empleado_id = empleados[indice // args.quincenas]
+        fecha_inicio = date(2020, 1, 1) + timedelta(days=15 * (indice % args.quincenas))
+        cambios = _nomina(empleado_id, fecha_inicio, args.recargos, aleatorio.randint(1, 15))
+        async with Sesion() as db:
+            await actualizar_reporte_nomina(db, reportes[indice], ReporteNominaUpdate(**cambios.model_dump()))
+
+    async def listar():
+        async with Sesion() as db:
+            await obtener_reporte_nominas(db, limite=args.limite)
+
+    async def listar_empleado():
+        async with Sesion() as db:
+            await obtener_reporte_nominas(db, limite=args.limite, empleado_id=aleatorio.choice(empleados))
+
+    async def detalle():
+        async with Sesion() as db:
+            await obtener_reporte_nomina(db, aleatorio.choice(reportes))
+
+    operaciones = {
+        "calcular_nomina": calcular,
+        "crear_reporte_nomina": crear,
+        "actualizar_reporte_nomina": actualizar,
+        "obtener_reporte_nominas": listar,
+        "obtener_reporte_nominas_empleado": listar_empleado,
+        "obtener_reporte_nomina": detalle,
+    }
+    resultados = {
+        "commit": _commit_actual(),
+        "parametros": {**vars(args), "reportes_sembrados": len(reportes)},
+        "operaciones": {},
+    }
+    for nombre, funcion in operaciones.items():
+        resultados["operaciones"][nombre] = await _medir_operacion(engine, funcion, args.repeticiones, args.calentamiento)
+
+    await engine.dispose()
+    return resultados
+
+def _commit_actual() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(base: dict, actual: dict, tolerancia: float) -> tuple[dict, list[str]]:
+    """Variación relativa de cada métrica contra ``base`` y lista de operaciones que empeoraron."""
+    variaciones, regresiones = {}, []
+    for nombre, metricas in actual["operaciones"].items():
+        anteriores = base.get("operaciones", {}).get(nombre)
+        if not anteriores:
+            continue
+        variaciones[nombre] = {}
+        for metrica in METRICAS_COMPARADAS:
+            antes, despues = anteriores.get(metrica), metricas.get(metrica)
+            if not antes or despues is None:
+                continue
+            variacion = (despues - antes) / antes
+            variaciones[nombre][metrica] = round(variacion, 3)
+            if variacion > tolerancia:
+                regresiones.append(f"{nombre}.{metrica}: {antes} -> {despues}")
+    return variaciones, regresiones
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empleados", type=int, default=200)
+    parser.add_argument("--quincenas", type=int, default=24)
+    parser.add_argument("--recargos", type=int, default=4)
+    parser.add_argument("--limite", type=int, default=50, help="Tamaño de página del listado")
+    parser.add_argument("--repeticiones", type=int, default=100)
+    parser.add_argument("--calentamiento", type=int, default=5, help="Llamadas previas que no se miden")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", type=Path, help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", type=Path, help="Resultados JSON de una ejecución anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento relativo admitido con --comparar")
+    args = parser.parse_args()
+
+    resultados = await ejecutar(args)
+    regresiones = []
+    if args.comparar:
+        base = json.loads(args.comparar.read_text())
+        variaciones, regresiones = comparar(base, resultados, args.tolerancia)
+        resultados["comparacion"] = {"base": base.get("commit"), "variaciones": variaciones, "regresiones": regresiones}
+
+    salida = json.dumps(resultados, indent=2, default=str)
+    if args.salida:
+        args.salida.parent.mkdir(parents=True, exist_ok=True)
+        args.salida.write_text(salida)
+    print(salida)
+    if regresiones:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Compara las consultas de reportes con joins en abanico contra las versiones agregadas.
+
+El listado se mide en tres variantes: abanico, agregado por colección al vuelo y la lectura
+de reportes_nominas_resumen. El detalle compara abanico contra LATERAL.
+
+Uso:
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_reportes --empleados 50 --quincenas 24 --recargos 6
+
+Para cada consulta informa las filas procesadas según EXPLAIN ANALYZE (suma de filas reales
+por nodo) y los tiempos de ejecución.
+"""
+import argparse
+import asyncio
+import json
+from sqlalchemy import text
+from app.services.reporte_payroll import consulta_reporte_nominas, CONSULTA_REPORTE_NOMINA
+from app.services.resumen_nominas import consulta_agregada, reconstruir_resumen
+from .semilla import crear_motor, crear_sesiones, reiniciar_esquema, sembrar, medir, resumen_tiempos
+
+# Listado anterior: todas las colecciones unidas lado a lado y deduplicadas con DISTINCT
+CONSULTA_LISTADO_ABANICO = text("""
+    WITH pagina AS (
+        SELECT rn.id FROM reportes_nominas rn
+        ORDER BY rn.fecha_inicio DESC, rn.id DESC
+        LIMIT :limite
+    )
+    SELECT
+        rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos, e.telefono, e.puesto_trabajo,
+        rn.fecha_inicio, rn.fecha_fin,
+        COALESCE(STRING_AGG(DISTINCT td.tipo, '\n') FILTER (WHERE td.tipo IS NOT NULL), 'Sin descuentos') AS descuentos_aplicados,
+        COALESCE(STRING_AGG(DISTINCT ts.tipo, '\n') FILTER (WHERE ts.tipo IS NOT NULL), 'Sin subsidios') AS subsidios_aplicados,
+        COALESCE(
+            STRING_AGG(DISTINCT tr.tipo_hora || ' ' || qv.cantidad_dias::text || ' días $ ' || qv.valor_quincena::text, '\n')
+            FILTER (WHERE tr.tipo_hora IS NOT NULL), 'Sin recargos'
+        ) AS recargos_y_valores,
+        rn.total_pagado
+    FROM pagina
+    INNER JOIN reportes_nominas rn ON rn.id = pagina.id
+    INNER JOIN empleados e ON e.id = rn.empleado_id
+    LEFT JOIN reportes_nominas_descuentos rnd ON rn.id = rnd.reporte_nomina_id
+    LEFT JOIN tipos_descuentos td ON rnd.tipo_descuento_id = td.id
+    LEFT JOIN reportes_nominas_recargos rnr ON rn.id = rnr.reporte_nomina_id
+    LEFT JOIN tipos_recargos tr ON rnr.tipo_recargo_id = tr.id
+    LEFT JOIN quincena_valores qv ON rn.id = qv.reporte_nomina_id AND tr.id = qv.tipo_recargo_id
+    LEFT JOIN reportes_nominas_subsidios rns ON rn.id = rns.reporte_nomina_id
+    LEFT JOIN tipos_subsidios ts ON rns.tipo_subsidio_id = ts.id
+    GROUP BY rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos,
+        e.telefono, e.puesto_trabajo, rn.fecha_inicio, rn.fecha_fin, rn.total_pagado
+    ORDER BY rn.fecha_inicio DESC, rn.id DESC
+""")
+
+# Listado agregado por colección al vuelo, sin la tabla de resumen
+CONSULTA_LISTADO_AGREGADO = text(consulta_agregada(
+    "rn.id IN (SELECT id FROM reportes_nominas ORDER BY fecha_inicio DESC, id DESC LIMIT :limite)"
+) + " ORDER BY rn.fecha_inicio DESC, rn.id DESC")
+
+# Detalle anterior de un reporte con los mismos joins en abanico
+CONSULTA_DETALLE_ABANICO = text("""
+    SELECT
+        rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos, e.telefono, e.puesto_trabajo,
+        rn.fecha_inicio, rn.fecha_fin, rn.total_pagado,
+        COALESCE(JSONB_AGG(DISTINCT jsonb_build_object(
+            'tipo_recargo_id', qv.tipo_recargo_id, 'cantidad_dias', qv.cantidad_dias, 'valor_quincena', qv.valor_quincena
+        )) FILTER (WHERE qv.tipo_recargo_id IS NOT NULL), '[]'::jsonb) AS quincena_valores,
+        COALESCE(JSONB_AGG(DISTINCT tr.id) FILTER (WHERE tr.id IS NOT NULL), '[]'::jsonb) AS recargos,
+        COALESCE(JSONB_AGG(DISTINCT td.id) FILTER (WHERE td.id IS NOT NULL), '[]'::jsonb) AS descuentos,
+        COALESCE(JSONB_AGG(DISTINCT ts.id) FILTER (WHERE ts.id IS NOT NULL), '[]'::jsonb) AS subsidios
+    FROM reportes_nominas rn
+    INNER JOIN empleados e ON e.id = rn.empleado_id
+    LEFT JOIN reportes_nominas_descuentos rnd ON rn.id = rnd.reporte_nomina_id
+    LEFT JOIN tipos_descuentos td ON rnd.tipo_descuento_id = td.id
+    LEFT JOIN reportes_nominas_recargos rnr ON rn.id = rnr.reporte_nomina_id
+    LEFT JOIN tipos_recargos tr ON rnr.tipo_recargo_id = tr.id
+    LEFT JOIN quincena_valores qv ON rn.id = qv.reporte_nomina_id AND tr.id = qv.tipo_recargo_id
+    LEFT JOIN reportes_nominas_subsidios rns ON rn.id = rns.reporte_nomina_id
+    LEFT JOIN tipos_subsidios ts ON rns.tipo_subsidio_id = ts.id
+    WHERE rn.id = :nomina_id
+    GROUP BY rn.id, rn.empleado_id, e.cedula, e.nombres, e.apellidos,
+        e.telefono, e.puesto_trabajo, rn.fecha_inicio, rn.fecha_fin, rn.total_pagado
+""")
+
+def _filas_procesadas(plan: dict) -> int:
+    """Suma las filas reales producidas por cada nodo del plan (filas × iteraciones)."""
+    propias = int(plan.get("Actual Rows", 0) * plan.get("Actual Loops", 1))
+    return propias + sum(_filas_procesadas(hijo) for hijo in plan.get("Plans", []))
+
+async def _explicar(db, consulta, parametros) -> dict:
+    result = await db.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {consulta.text}"), parametros)
+    plan = result.scalar()
+    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    return {
+        "filas_procesadas": _filas_procesadas(plan["Plan"]),
+        "filas_resultado": plan["Plan"]["Actual Rows"],
+        "tiempo_ejecucion_ms": plan["Execution Time"],
+    }
+
+async def _comparar(Sesion, nombre, consultas, parametros, repeticiones):
+    resultados = {}
+    async with Sesion() as db:
+        for etiqueta, consulta in consultas.items():
+            plan = await _explicar(db, consulta, parametros)
+            tiempos = await medir(lambda: db.execute(consulta, parametros), repeticiones)
+            resultados[etiqueta] = {**plan, **resumen_tiempos(tiempos)}
+    return {nombre: resultados}
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empleados", type=int, default=50)
+    parser.add_argument("--quincenas", type=int, default=24)
+    parser.add_argument("--recargos", type=int, default=6)
+    parser.add_argument("--limite", type=int, default=500, help="Tamaño de página del listado")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = crear_motor()
+    Sesion = crear_sesiones(engine)
+    await reiniciar_esquema(engine)
+    async with Sesion() as db:
+        datos = await sembrar(db, args.empleados, args.quincenas, args.recargos)
+        await reconstruir_resumen(db)
+
+    resultados = {"parametros": vars(args)}
+    resultados.update(await _comparar(Sesion, "listado", {
+        "abanico": CONSULTA_LISTADO_ABANICO,
+        "agregado": CONSULTA_LISTADO_AGREGADO,
+        "resumen": consulta_reporte_nominas(),
+    }, {"limite": args.limite}, args.repeticiones))
+    resultados.update(await _comparar(Sesion, "detalle", {
+        "abanico": CONSULTA_DETALLE_ABANICO,
+        "lateral": CONSULTA_REPORTE_NOMINA,
+    }, {"nomina_id": datos["reportes"][0]}, args.repeticiones))
+
+    print(json.dumps(resultados, indent=2, default=str))
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
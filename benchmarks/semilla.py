@@ -0,0 +1,163 @@
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from dotenv import dotenv_values
+from sqlalchemy import insert, event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.orm import sessionmaker
+from app.db.models import (
+    Base, Empleado, ConfigSalario, TipoRecargo, TipoSubsidio, TipoDescuento,
+    ReporteNomina, QuincenaValor, ReporteNominaRecargo, ReporteNominaDescuento, ReporteNominaSubsidio
+)
+
+# Catálogo de recargos usado por los datos sintéticos: (tipo_hora, porcentaje, valor_hora)
+RECARGOS = [
+    ("ORDINARIA", Decimal("0.00"), Decimal("5416.67")),
+    ("NOCTURNA", Decimal("0.35"), Decimal("7312.50")),
+    ("EXTRA_DIURNA", Decimal("0.25"), Decimal("6770.84")),
+    ("EXTRA_NOCTURNA", Decimal("0.75"), Decimal("9479.17")),
+    ("DOMINICAL_DIURNA", Decimal("0.75"), Decimal("9479.17")),
+    ("DOMINICAL_NOCTURNA", Decimal("1.10"), Decimal("11375.01")),
+    ("EXTRA_DOMINICAL_DIURNA", Decimal("1.00"), Decimal("10833.34")),
+    ("EXTRA_DOMINICAL_NOCTURNA", Decimal("1.50"), Decimal("13541.68")),
+]
+
+# Filas por sentencia al sembrar
+TAMAÑO_BLOQUE = 5000
+
+def url_benchmark() -> str:
+    """URL de la base de datos desechable para los benchmarks."""
+    url = os.environ.get("BENCH_DATABASE_URL") or dotenv_values("./.env").get("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("Defina BENCH_DATABASE_URL con una base de datos Postgres desechable")
+    return url
+
+def crear_motor() -> AsyncEngine:
+    return create_async_engine(url_benchmark())
+
+def crear_sesiones(engine: AsyncEngine):
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+async def reiniciar_esquema(engine: AsyncEngine):
+    """Borra y vuelve a crear todas las tablas de los modelos."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+async def _insertar(db: AsyncSession, modelo, filas: list[dict]):
+    for inicio in range(0, len(filas), TAMAÑO_BLOQUE):
+        await db.execute(insert(modelo), filas[inicio:inicio + TAMAÑO_BLOQUE])
+
+async def sembrar_catalogos(db: AsyncSession):
+    """Inserta la configuración de salario y los catálogos de recargos, subsidios y descuentos."""
+    await _insertar(db, ConfigSalario, [{
+        "id": 1, "año": "2024", "salario_minimo": Decimal("1300000.00"), "horas_semana": 48,
+        "horas_mes": 192, "valor_hora": Decimal("5416.67"), "horas_salario": Decimal("8"),
+        # Rige para todas las fechas sintéticas de los benchmarks (desde 2000)
+        "vigente_desde": date(2000, 1, 1)
+    }])
+    await _insertar(db, TipoRecargo, [
+        {"id": i, "tipo_hora": tipo, "porcentaje": porcentaje, "valor_hora": valor_hora, "detalle": tipo}
+        for i, (tipo, porcentaje, valor_hora) in enumerate(RECARGOS, 1)
+    ])
+    await _insertar(db, TipoDescuento, [
+        {"id": 1, "tipo": "SALUD", "valor": Decimal("0.04")},
+        {"id": 2, "tipo": "PENSION", "valor": Decimal("0.04")},
+    ])
+    await _insertar(db, TipoSubsidio, [{"id": 1, "tipo": "TRANSPORTE", "valor": Decimal("140606.00")}])
+    await db.commit()
+
+async def sembrar(db: AsyncSession, empleados: int, quincenas: int, recargos: int, semilla: int = 0):
+    """Siembra ``empleados`` × ``quincenas`` reportes con ``recargos`` líneas cada uno.
+
+    Devuelve los IDs de empleados y de reportes creados.
+    """
+    if not 1 <= recargos <= len(RECARGOS):
+        raise ValueError(f"recargos debe estar entre 1 y {len(RECARGOS)}")
+
+    aleatorio = random.Random(semilla)
+    await sembrar_catalogos(db)
+
+    empleado_ids = [uuid.uuid4() for _ in range(empleados)]
+    await _insertar(db, Empleado, [{
+        "id": empleado_id,
+        "cedula": f"{i:010d}",
+        "nombres": f"Nombre{i}",
+        "apellidos": f"Apellido{i}",
+        "telefono": "3000000000",
+        "puesto_trabajo": aleatorio.choice(["Cocina", "Mesero", "Caja", "Aseo"]),
+        "salario_base": Decimal("1300000.00")
+    } for i, empleado_id in enumerate(empleado_ids)])
+
+    reportes, quincenas_valores, reportes_recargos, reportes_descuentos, reportes_subsidios = [], [], [], [], []
+    for empleado_id in empleado_ids:
+        for q in range(quincenas):
+            fecha_inicio = date(2020, 1, 1) + timedelta(days=15 * q)
+            reporte_id = uuid.uuid4()
+            reportes.append({
+                "id": reporte_id, "empleado_id": empleado_id, "fecha_inicio": fecha_inicio,
+                "fecha_fin": fecha_inicio + timedelta(days=14), "total_pagado": Decimal("0")
+            })
+            for tipo_recargo_id in range(1, recargos + 1):
+                quincenas_valores.append({
+                    "id": uuid.uuid4(), "reporte_nomina_id": reporte_id, "tipo_recargo_id": tipo_recargo_id,
+                    "cantidad_dias": aleatorio.randint(1, 15), "valor_quincena": Decimal("0")
+                })
+                reportes_recargos.append({"reporte_nomina_id": reporte_id, "tipo_recargo_id": tipo_recargo_id})
+            reportes_descuentos += [
+                {"reporte_nomina_id": reporte_id, "tipo_descuento_id": 1},
+                {"reporte_nomina_id": reporte_id, "tipo_descuento_id": 2},
+            ]
+            reportes_subsidios.append({"reporte_nomina_id": reporte_id, "tipo_subsidio_id": 1})
+
+    await _insertar(db, ReporteNomina, reportes)
+    await _insertar(db, QuincenaValor, quincenas_valores)
+    await _insertar(db, ReporteNominaRecargo, reportes_recargos)
+    await _insertar(db, ReporteNominaDescuento, reportes_descuentos)
+    await _insertar(db, ReporteNominaSubsidio, reportes_subsidios)
+    await db.commit()
+
+    return {"empleados": empleado_ids, "reportes": [r["id"] for r in reportes]}
+
+class ContadorConsultas:
+    """Cuenta las sentencias que el motor envía a la base de datos."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.total = 0
+        self._engine = engine.sync_engine
+
+    def _contar(self, *args):
+        self.total += 1
+
+    def __enter__(self):
+        self.total = 0
+        event.listen(self._engine, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self._engine, "before_cursor_execute", self._contar)
+
+def resumen_tiempos(tiempos: list[float]) -> dict:
+    """Mediana y percentiles en milisegundos de una lista de duraciones en segundos."""
+    ms = sorted(t * 1000 for t in tiempos)
+    percentil = lambda p: ms[min(len(ms) - 1, round(p / 100 * (len(ms) - 1)))]
+    return {
+        "n": len(ms),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(percentil(95), 3),
+        "p99_ms": round(percentil(99), 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+async def medir(funcion, repeticiones: int) -> list[float]:
+    """Ejecuta ``funcion`` (corrutina sin argumentos) y devuelve la duración de cada ejecución."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos